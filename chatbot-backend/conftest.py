@@ -0,0 +1,20 @@
+import json
+
+import pytest
+
+
+class FakeWebSocket:
+    # Records the frames a session sends, decoded
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def websocket():
+    return FakeWebSocket()
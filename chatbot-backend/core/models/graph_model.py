@@ -32,4 +32,13 @@ class Flow(BaseDTO):
     data: Dict[str, NodeData]
 
 class Root(BaseDTO):
-    drawflow: Dict[str,Flow]
\ No newline at end of file
+    drawflow: Dict[str,Flow]
+
+class FlowIssue(BaseDTO):
+    code: str
+    message: str
+    nodes: List[str] = []
+
+class FlowReport(BaseDTO):
+    errors: List[FlowIssue] = []
+    warnings: List[FlowIssue] = []
@@ -45,6 +45,8 @@ class DocumentQuery(BaseDTO):
     question: str = None
     generate: bool = True
     num_results: int = 5
+    # Documents returned by an earlier query with generate=False, skips the search
+    documents: Optional[List[DocumentDTO]] = None
     
 
     
@@ -2,6 +2,7 @@ from pydantic import ValidationError
 from pathlib import Path
 from pydantic_settings import BaseSettings,  SettingsConfigDict
 from dotenv import load_dotenv
+from typing import Dict
 import os
 
 
@@ -52,6 +53,10 @@ class KnowledgeBaseSettings(CoreSettings):
   
   CHATBOT_KB_URL: str = "http://localhost:8000/api/v1"
   CHATBOT_KB_TOKEN: str = "token"
+  # Forward LLM answers to the websocket chunk by chunk while they are generated
+  CHATBOT_KB_STREAMING: bool = False
+  # Search the knowledge base while the decider classifies a listen -> decider -> qa answer
+  CHATBOT_KB_PREFETCH: bool = True
 
 class FreshDeskSettings(CoreSettings):
   FRESHDESK_API_KEY: str = "key"
@@ -62,6 +67,154 @@ class ChatbotChatlogSettings(CoreSettings):
   CHATBOT_CHATLOG_URL: str = "http://localhost:8000/api/v1"
   CHATBOT_CHATLOG_TOKEN: str = "token"
 
+class HTTPClientSettings(CoreSettings):
+  """
+  Settings for the shared async HTTP clients, one connection pool per target.
+
+  Attributes:
+      HTTP_CONNECT_TIMEOUT (float): Seconds to wait for a connection to be established.
+      HTTP_KB_TIMEOUT (float): Read timeout for the knowledge base, LLM calls are slow.
+      HTTP_CHATLOG_TIMEOUT (float): Read timeout for the chatlog service.
+      HTTP_FRESHDESK_TIMEOUT (float): Read timeout for the Freshdesk API.
+      HTTP_*_MAX_CONNECTIONS (int): Maximum concurrent connections to each target.
+      HTTP_MAX_KEEPALIVE_CONNECTIONS (int): Idle connections kept open per target.
+  """
+  HTTP_CONNECT_TIMEOUT: float = 5.0
+  HTTP_KB_TIMEOUT: float = 60.0
+  HTTP_CHATLOG_TIMEOUT: float = 10.0
+  HTTP_FRESHDESK_TIMEOUT: float = 20.0
+  HTTP_KB_MAX_CONNECTIONS: int = 50
+  HTTP_CHATLOG_MAX_CONNECTIONS: int = 20
+  HTTP_FRESHDESK_MAX_CONNECTIONS: int = 5
+  HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+
+class IntentClassifierSettings(CoreSettings):
+  """
+  Settings for the intent classifier used by decider nodes.
+
+  Attributes:
+      INTENT_BATCH_MAX_SIZE (int): Maximum number of utterances classified in one forward pass.
+      INTENT_BATCH_MAX_WAIT_MS (float): How long the batcher waits for more requests before running a batch.
+      INTENT_CACHE_MAX_SIZE (int): Number of cached predictions, 0 disables the cache.
+      INTENT_CACHE_TTL_S (float): Seconds a cached prediction stays valid.
+      INTENT_BACKEND (str): Inference backend, "torch" or "onnx" (quantized ONNX Runtime model).
+      INTENT_ONNX_MODEL_DIR (str): Directory written by scripts/export_intent_onnx.py.
+      INTENT_ONNX_MODEL_FILE (str): ONNX model file inside INTENT_ONNX_MODEL_DIR.
+      INTENT_ONNX_INTRA_OP_THREADS (int): ONNX Runtime intra-op threads, 0 uses all physical cores.
+      INTENT_CASCADE_ENABLED (bool): Try the sentence-embedding tier before the NLI model.
+      INTENT_EMBEDDING_MODEL (str): Sentence-embedding model of the first tier.
+      INTENT_EMBEDDING_MARGIN (float): Minimum cosine gap between the top two labels to answer in the first tier.
+      INTENT_EMBEDDING_MIN_SCORE (float): Minimum cosine similarity of the top label to answer in the first tier.
+      INTENT_WARMUP_BACKOFF_S (float): Delay before retrying a failed model warm-up, doubled on each retry.
+      INTENT_WARMUP_BACKOFF_MAX_S (float): Upper bound of the warm-up retry delay.
+  """
+  INTENT_BATCH_MAX_SIZE: int = 16
+  INTENT_BATCH_MAX_WAIT_MS: float = 5.0
+  INTENT_CACHE_MAX_SIZE: int = 4096
+  INTENT_CACHE_TTL_S: float = 3600
+  INTENT_BACKEND: str = "torch"
+  INTENT_ONNX_MODEL_DIR: str = str(Path(__file__).parent.parent / "v1/models/onnx")
+  INTENT_ONNX_MODEL_FILE: str = "model.int8.onnx"
+  INTENT_ONNX_INTRA_OP_THREADS: int = 0
+  INTENT_CASCADE_ENABLED: bool = False
+  INTENT_EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+  INTENT_EMBEDDING_MARGIN: float = 0.15
+  INTENT_EMBEDDING_MIN_SCORE: float = 0.5
+  INTENT_WARMUP_BACKOFF_S: float = 1.0
+  INTENT_WARMUP_BACKOFF_MAX_S: float = 60.0
+
+class OutboxSettings(CoreSettings):
+  """
+  Settings for the write-behind outbox that saves chat messages to the chatlog.
+
+  Attributes:
+      OUTBOX_MAX_BATCH_SIZE (int): Maximum number of messages sent in one bulk insert.
+      OUTBOX_FLUSH_INTERVAL_MS (float): How long the outbox waits for more messages before sending a batch.
+      OUTBOX_MAX_QUEUE_SIZE (int): Messages held while the chatlog is unreachable, newer ones are dropped.
+      OUTBOX_MAX_RETRIES (int): Retries of a failed batch before it is dropped.
+      OUTBOX_RETRY_BACKOFF_S (float): Delay before the first retry, doubled on each retry.
+      OUTBOX_RETRY_BACKOFF_MAX_S (float): Upper bound of the retry delay.
+      OUTBOX_DRAIN_TIMEOUT_S (float): Seconds given to the outbox to flush on shutdown.
+  """
+  OUTBOX_MAX_BATCH_SIZE: int = 200
+  OUTBOX_FLUSH_INTERVAL_MS: float = 500.0
+  OUTBOX_MAX_QUEUE_SIZE: int = 50000
+  OUTBOX_MAX_RETRIES: int = 5
+  OUTBOX_RETRY_BACKOFF_S: float = 0.5
+  OUTBOX_RETRY_BACKOFF_MAX_S: float = 30.0
+  OUTBOX_DRAIN_TIMEOUT_S: float = 10.0
+
+class SessionStoreSettings(CoreSettings):
+  """
+  Settings for the session state: the store shared by the uvicorn workers of a host,
+  hibernation, history and listen timeouts.
+
+  Attributes:
+      SESSION_STORE (str): "memory" for a single worker, "sqlite" to run several workers.
+      SESSION_STORE_PATH (str): SQLite database file, must be on a local disk shared by the workers.
+      SESSION_STORE_MAX_AGE_S (float): Sessions not updated for this long are pruned on startup.
+      SESSION_HIBERNATE_AFTER_S (float): Seconds a session waits on a listen node before its
+          tracker is moved to the store, 0 disables hibernation.
+      SESSION_HISTORY_MAX_SIZE (int): USER/AI messages kept in memory per session, older ones
+          are only in the chatlog. 0 keeps the whole conversation.
+      LISTEN_TIMER_RESOLUTION_S (float): Tick of the timer wheel tracking listen timeouts and hibernation.
+  """
+  SESSION_STORE: str = "memory"
+  SESSION_STORE_PATH: str = "/tmp/chatbot_sessions.db"
+  SESSION_STORE_MAX_AGE_S: float = 3600
+  SESSION_HIBERNATE_AFTER_S: float = 30
+  SESSION_HISTORY_MAX_SIZE: int = 0
+  LISTEN_TIMER_RESOLUTION_S: float = 0.25
+
+class WebSocketSettings(CoreSettings):
+  """
+  Settings for the websocket server started by server.py.
+
+  Attributes:
+      WS_DEFLATE_ENABLED (bool): Offer permessage-deflate compression to clients.
+      WS_DEFLATE_LEVEL (int): zlib compression level, 1 is fastest, 9 compresses most.
+      WS_DEFLATE_MIN_SIZE (int): Messages smaller than this many bytes are sent uncompressed.
+      WS_DEFLATE_MAX_WINDOW_BITS (int): zlib window of the server, lower values use less memory per connection.
+      WS_DEFLATE_MEM_LEVEL (int): zlib memory level, lower values use less memory per connection.
+  """
+  WS_DEFLATE_ENABLED: bool = True
+  WS_DEFLATE_LEVEL: int = 6
+  WS_DEFLATE_MIN_SIZE: int = 256
+  WS_DEFLATE_MAX_WINDOW_BITS: int = 15
+  WS_DEFLATE_MEM_LEVEL: int = 8
+
+class MetricsSettings(CoreSettings):
+  """
+  Settings for the Prometheus metrics exposed at /metrics and the event loop watchdog.
+
+  Attributes:
+      METRICS_LOOP_LAG_INTERVAL_S (float): How often the event loop lag is probed.
+      WATCHDOG_ENABLED (bool): Capture the stack of code blocking the event loop.
+      WATCHDOG_THRESHOLD_MS (float): Stalls longer than this are reported.
+      WATCHDOG_INTERVAL_MS (float): Heartbeat and check period of the watchdog.
+  """
+  METRICS_LOOP_LAG_INTERVAL_S: float = 0.5
+  WATCHDOG_ENABLED: bool = False
+  WATCHDOG_THRESHOLD_MS: float = 100
+  WATCHDOG_INTERVAL_MS: float = 20
+
+class FlowSettings(CoreSettings):
+  """
+  Settings for the flows run by each origin (tenant) of the websocket path.
+
+  Attributes:
+      FLOW_DEFAULT_FILE (str): Flow file in v1/src/flows for origins missing from the registry.
+      FLOW_REGISTRY (dict): Origin to flow file, e.g. '{"tenantev": "flow_tenantev_v3.json"}'.
+      FLOW_CACHE_MAX_MB (float): Compiled flows kept in memory per worker, measured by the size
+          of their serialised artifact; the least recently used ones are dropped first.
+      FLOW_ARTIFACT_KEY (str): Secret signing the precompiled flow artifacts, shared by the
+          workers. Artifacts are only written and loaded when it is set.
+  """
+  FLOW_DEFAULT_FILE: str = "flow_production.json"
+  FLOW_REGISTRY: Dict[str, str] = {}
+  FLOW_CACHE_MAX_MB: float = 64
+  FLOW_ARTIFACT_KEY: str = ""
+
 class Settings(CoreSettings):
 
     api: APISettings = APISettings()
@@ -70,6 +223,13 @@ class Settings(CoreSettings):
     kb: KnowledgeBaseSettings = KnowledgeBaseSettings()
     freshdesk: FreshDeskSettings = FreshDeskSettings()
     chatlog: ChatbotChatlogSettings = ChatbotChatlogSettings()
+    http: HTTPClientSettings = HTTPClientSettings()
+    intent: IntentClassifierSettings = IntentClassifierSettings()
+    outbox: OutboxSettings = OutboxSettings()
+    store: SessionStoreSettings = SessionStoreSettings()
+    ws: WebSocketSettings = WebSocketSettings()
+    metrics: MetricsSettings = MetricsSettings()
+    flows: FlowSettings = FlowSettings()
 try:
     # Creating an instance of Settings to be imported by other modules
     settings = Settings()
@@ -2,20 +2,53 @@
 import json
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Cookie, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from v1.src.session import SessionManager
-from v1.src.flows import Flow
+from v1.src.flows import flow_cache
 from core.settings import settings
 from fastapi.staticfiles import StaticFiles
 from v1 import v1
 from core.models.chat_message_model import ApplicationData
 from v1.src.logger import logger
+from v1.src.clients import http_clients
+from v1.src.outbox import chatlog_outbox
+from v1.src.frames import negotiate_batching
+from v1.src.timers import listen_timers
+from v1.src.metrics import loop_lag_monitor, track_sessions
+from v1.src.watchdog import loop_watchdog
+from v1.models.intent_batcher import intent_batcher
+from v1.models.intent_cascade import intent_cascade
+from contextlib import asynccontextmanager
+import asyncio as aio
 
 
 origins = settings.api.ORIGINS
 
 
-api = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Models load in the background, /api/v1/health/ready reports when they are done
+    warmup_task = aio.create_task(intent_cascade.warmup())
+    await manager.store.prune(settings.store.SESSION_STORE_MAX_AGE_S)
+    loop_lag_monitor.start()
+    if settings.metrics.WATCHDOG_ENABLED:
+        loop_watchdog.start()
+    yield
+    await loop_watchdog.shutdown()
+    await loop_lag_monitor.shutdown()
+    warmup_task.cancel()
+    # Flush the chat messages still waiting in the outbox before the pools close
+    await chatlog_outbox.drain()
+    # Close the pooled keep-alive connections to the KB, chatlog and Freshdesk
+    await http_clients.close()
+    await intent_batcher.shutdown()
+    await listen_timers.shutdown()
+    intent_cascade.shutdown()
+    manager.store.close()
+
+
+api = FastAPI(lifespan=lifespan)
 
 api.add_middleware(
     CORSMiddleware,
@@ -74,12 +107,24 @@ html = """
 
 
 manager = SessionManager()
+track_sessions(manager.get_stats)
 
 @api.get("/")
 async def get():
     return HTMLResponse(html)
 
 
+@api.get("/metrics")
+async def metrics():
+    # Each uvicorn worker reports its own sessions and timings
+    return Response(generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+@api.get("/sessions/stats")
+async def session_stats():
+    return manager.get_stats()
+
+
 @api.put("/{session_id}/data")
 async def update_session(session_id: str,
                          data:ApplicationData, token:str = Cookie()):
@@ -98,15 +143,16 @@ async def websocket_endpoint(
     origin: str,
     session_id: str, 
     user_agent: str | None = Header(None)):
-    await websocket.accept()
-    flow = Flow.from_json()
+    subprotocol = negotiate_batching(websocket)
+    await websocket.accept(subprotocol=subprotocol)
+    flow = await flow_cache.aget_for_origin(origin)
     graph = flow.graph
-    user_session = manager.create_session(session_id=session_id, graph=graph,origin=origin)
+    user_session = manager.create_session(session_id=session_id, graph=graph,origin=origin, nodes=flow.nodes)
     user_session.tracker["user_agent"] = user_agent
     
     
     try:
-        await user_session.start_flow(websocket)
+        await user_session.start_flow(websocket, batch=subprotocol is not None)
         await manager.save(session_id)
     except WebSocketDisconnect as e:
         logger.error(e)
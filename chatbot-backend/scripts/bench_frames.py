@@ -0,0 +1,66 @@
+"""
+Measures the per-frame cost of Session.send_message against what each frame
+cost before it dumped the message once: a model_dump for the history, another
+for send_json and stdlib json inside Starlette. Nothing is sent on the wire.
+
+Usage (from chatbot-backend/):
+    python scripts/bench_frames.py --frames 2000
+"""
+import argparse
+import asyncio as aio
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.models.chat_message_model import ChatMessage, Elements
+from v1.src.outbox import chatlog_outbox
+from v1.src.session import Session
+
+
+class NullWebSocket:
+    async def send_json(self, data):
+        json.dumps(data, separators=(",", ":"))
+
+    async def send_text(self, data):
+        pass
+
+
+def make_message():
+    elements = [Elements(type="button", label="Yes", value="yes"), Elements(type="button", label="No", value="no")]
+    return ChatMessage(text="Hello, how can I help you today? " * 4, elements=elements, user="AI", session_id="s1")
+
+
+async def send_before(websocket, history, message):
+    history.append(message.model_dump(by_alias=True))
+    await websocket.send_json(message.model_dump(by_alias=True))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=2000)
+    args = parser.parse_args()
+
+    # The frames are not conversation messages worth saving
+    chatlog_outbox.put = lambda message: None
+    websocket = NullWebSocket()
+    message = make_message()
+    session = Session()
+    session.init(240, 0)
+    history = []
+
+    async def run(send):
+        start = timeit.default_timer()
+        for _ in range(args.frames):
+            await send()
+        return (timeit.default_timer() - start) / args.frames * 1e6
+
+    before = await run(lambda: send_before(websocket, history, message))
+    after = await run(lambda: session.send_message(websocket, message))
+    print(f"per-frame cost: before {before:.1f} us, after {after:.1f} us")
+
+
+if __name__ == "__main__":
+    aio.run(main())
@@ -0,0 +1,133 @@
+"""
+Exports the intent classifier to ONNX, quantizes it to int8 and checks that the
+quantized model agrees with the PyTorch one.
+
+Usage (from chatbot-backend/):
+    python scripts/export_intent_onnx.py --output v1/models/onnx
+
+Then run the backend with INTENT_BACKEND=onnx.
+"""
+import argparse
+import inspect
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from core.settings import settings
+from v1.models.intent_classifier import (
+    MODEL_NAME,
+    OnnxNLIBackend,
+    TorchNLIBackend,
+    predict_batch,
+    prediction_cache,
+)
+
+# Utterances and label sets in the style of the production flow's decider nodes
+VALIDATION_SET = [
+    ("Yes, I do", ["yes", "no"]),
+    ("No, I do not", ["yes", "no"]),
+    ("yeah sure", ["yes", "no"]),
+    ("nope", ["yes", "no"]),
+    ("hi there", ["help", "greeting", "goodbye"]),
+    ("bye, thanks", ["help", "greeting", "goodbye"]),
+    ("how do I reset my password?", ["help", "greeting", "goodbye"]),
+    ("I need to talk with a person", ["ticket", "question", "other"]),
+    ("what documents do I need for the application", ["ticket", "question", "other"]),
+    ("my report is wrong, please open a case", ["ticket", "question", "other"]),
+    ("I'm a landlord", ["owner", "applicant", "realtor"]),
+    ("I am looking to rent an apartment", ["owner", "applicant", "realtor"]),
+    ("I'm an agent", ["owner", "applicant", "realtor"]),
+]
+
+
+def export(model_name: str, output: Path, opset: int):
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    # The tokenizer and config are loaded from the same directory at runtime
+    tokenizer.save_pretrained(output)
+    model.config.save_pretrained(output)
+
+    sample = tokenizer(["hello"], ["This example is greeting."], return_tensors="pt")
+    # Inputs are passed positionally, so they must follow the forward() order
+    forward_params = inspect.signature(model.forward).parameters
+    input_names = [name for name in forward_params if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    fp32_path = output / "model.onnx"
+    export_kwargs = {}
+    # Newer torch releases default to the dynamo exporter, the TorchScript one
+    # is what the dynamic_axes export below is written for
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs["dynamo"] = False
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            **export_kwargs,
+        )
+    return fp32_path
+
+
+def quantize(fp32_path: Path, int8_path: Path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+
+
+def validate(model_name: str, output: Path, model_file: str, min_agreement: float) -> bool:
+    torch_backend = TorchNLIBackend(model_name)
+    onnx_backend = OnnxNLIBackend(str(output), model_file)
+    prediction_cache.max_size = 0
+    expected = predict_batch(VALIDATION_SET, backend=torch_backend)
+    actual = predict_batch(VALIDATION_SET, backend=onnx_backend)
+
+    agreement = 0
+    max_diff = 0.0
+    for (text, _), torch_result, onnx_result in zip(VALIDATION_SET, expected, actual):
+        torch_scores = dict(zip(torch_result["labels"], torch_result["scores"]))
+        onnx_scores = dict(zip(onnx_result["labels"], onnx_result["scores"]))
+        diff = max(abs(torch_scores[label] - onnx_scores[label]) for label in torch_scores)
+        max_diff = max(max_diff, diff)
+        same = torch_result["labels"][0] == onnx_result["labels"][0]
+        agreement += same
+        print(f"{'ok ' if same else 'BAD'} {text!r}: torch={torch_result['labels'][0]} onnx={onnx_result['labels'][0]} diff={diff:.3f}")
+
+    rate = agreement / len(VALIDATION_SET)
+    print(f"Top-1 agreement {rate:.1%}, max score difference {max_diff:.3f}")
+    return rate >= min_agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--output", default=settings.intent.INTENT_ONNX_MODEL_DIR)
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--min-agreement", type=float, default=0.95)
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    int8_path = output / settings.intent.INTENT_ONNX_MODEL_FILE
+
+    fp32_path = export(args.model, output, args.opset)
+    quantize(fp32_path, int8_path)
+    fp32_path.unlink()
+    print(f"Wrote {int8_path} ({int8_path.stat().st_size / 2**20:.1f} MiB)")
+
+    if not validate(args.model, output, int8_path.name, args.min_agreement):
+        sys.exit("Quantized model disagrees with the PyTorch model")
+
+
+if __name__ == "__main__":
+    main()
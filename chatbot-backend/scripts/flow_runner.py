@@ -0,0 +1,227 @@
+"""
+Runs a flow without a browser: N concurrent simulated websocket clients talk to
+the session engine in-process, with the knowledge base, chatlog and Freshdesk
+replaced by local fakes.
+
+At each listen node a client answers with the next scripted utterance, or
+samples one at random: a button of the listen node when it has any, otherwise
+one of --utterances. With --fake-intents decider nodes pick a random label
+instead of running the intent model, so sessions random-walk the flow.
+
+Reports turn latency percentiles (user message until the session listens again),
+frames per second and the peak RSS of the process.
+
+Usage (from chatbot-backend/):
+    python scripts/flow_runner.py --flow flow_production.json --clients 200 --turns 8 --fake-intents
+    python scripts/flow_runner.py --clients 1 --script "Hi" "yes" "I want to apply" --verbose
+"""
+import argparse
+import asyncio as aio
+import json
+import random
+import resource
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from fastapi import WebSocketDisconnect
+
+from v1.models.intent_batcher import intent_batcher
+from v1.models.intent_cascade import intent_cascade
+from v1.src.clients import http_clients
+from v1.src.flows import Flow
+from v1.src.outbox import chatlog_outbox
+from v1.src.session import SessionManager
+from v1.src.timers import listen_timers
+
+DEFAULT_UTTERANCES = [
+    "Hi",
+    "yes",
+    "no",
+    "I want to apply for a unit",
+    "How long does the application take?",
+    "I need to talk with a person",
+    "thanks, bye",
+]
+
+
+def create_fake_targets(kb_latency: float) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if request.url.host.endswith("freshdesk.com"):
+            return httpx.Response(201, json={"id": random.randint(1, 10**6)})
+        if "/kb/" in path or path.endswith("/generate") or path.endswith("/generate/stream"):
+            await aio.sleep(kb_latency)
+            answer = "This is a generated answer from the fake knowledge base."
+            if path.endswith("/stream"):
+                events = [{"type": "documents", "documents": [{"page_content": "doc", "metadata": {}, "score": 0.9}]}]
+                events += [{"type": "chunk", "text": word + " "} for word in answer.split()]
+                events.append({"type": "end", "answer": answer})
+                return httpx.Response(200, text="".join(json.dumps(event) + "\n" for event in events))
+            if path.endswith("/generate"):
+                return httpx.Response(200, json={"human_prompt": "", "answer": answer})
+            return httpx.Response(200, json={
+                "question": "",
+                "answer": answer,
+                "documents": [{"page_content": "doc", "metadata": {}, "score": 0.9}],
+            })
+        # Chatlog: messages, sessions and tickets
+        return httpx.Response(200, json=[])
+    return httpx.MockTransport(handler)
+
+
+async def fake_classify(text, labels, **kwargs):
+    scores = [random.random() for _ in labels]
+    total = sum(scores)
+    scores = [score / total for score in scores]
+    ranked = sorted(zip(labels, scores), key=lambda item: item[1], reverse=True)
+    # Answered like the embedding tier, so the decider takes the top label
+    return {
+        "sequence": text,
+        "labels": [label for label, _ in ranked],
+        "scores": [score for _, score in ranked],
+        "tier": "embedding",
+    }
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.turn_latencies: List[float] = []
+        self.frames = 0
+        self.sessions = 0
+        self.errors = 0
+
+
+class SimulatedClient:
+    """
+    Stands in for the websocket of one session. `receive_json` is called when
+    the session listens, so the time between the answer it returns and the next
+    call is the latency of the turn.
+    """
+    def __init__(self, stats: Stats, script: List[str], utterances: List[str], turns: int, think_time: float, verbose: bool) -> None:
+        self.stats = stats
+        self.script = list(script)
+        self.utterances = utterances
+        self.turns = turns
+        self.think_time = think_time
+        self.verbose = verbose
+        self.elements: Optional[list] = None
+        self.sent_at: Optional[float] = None
+
+    def receive_frame(self, message: dict):
+        self.stats.frames += 1
+        if message["user"] == "listen_signal":
+            self.elements = message.get("elements")
+        if self.verbose and message.get("text"):
+            print(f"{message['user']:>5}: {message['text']}")
+
+    async def send_text(self, data: str):
+        messages = json.loads(data)
+        for message in messages if isinstance(messages, list) else [messages]:
+            self.receive_frame(message)
+
+    async def send_json(self, data: dict):
+        self.receive_frame(data)
+
+    def next_utterance(self) -> str:
+        if self.script:
+            return self.script.pop(0)
+        if self.elements:
+            return random.choice(self.elements)["value"]
+        return random.choice(self.utterances)
+
+    async def receive_json(self) -> dict:
+        if self.sent_at is not None:
+            self.stats.turn_latencies.append(time.perf_counter() - self.sent_at)
+        if self.turns <= 0:
+            raise WebSocketDisconnect(code=1000)
+        self.turns -= 1
+        if self.think_time:
+            await aio.sleep(random.expovariate(1 / self.think_time))
+        text = self.next_utterance()
+        if self.verbose:
+            print(f" USER> {text}")
+        self.sent_at = time.perf_counter()
+        return {"text": text}
+
+    async def close(self, *args, **kwargs):
+        pass
+
+
+async def run_client(manager: SessionManager, flow: Flow, stats: Stats, args):
+    for _ in range(args.rounds):
+        client = SimulatedClient(stats, args.script, args.utterances, args.turns, args.think_time, args.verbose)
+        session_id = str(uuid.uuid4())
+        session = manager.create_session(session_id=session_id, graph=flow.graph, origin="runner", nodes=flow.nodes)
+        session.tracker["user_agent"] = "flow-runner"
+        try:
+            await session.start_flow(client, batch=args.batch)
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            stats.errors += 1
+            print(f"Session {session_id} failed: {e!r}", file=sys.stderr)
+        await manager.save(session_id)
+        await manager.delete_session(session_id)
+        stats.sessions += 1
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--flow", default="flow_production.json", help="Flow file in v1/src/flows")
+    parser.add_argument("--clients", type=int, default=10, help="Concurrent simulated clients")
+    parser.add_argument("--rounds", type=int, default=1, help="Sessions run by each client, one after the other")
+    parser.add_argument("--turns", type=int, default=10, help="User messages per session before disconnecting")
+    parser.add_argument("--script", nargs="*", default=[], help="Utterances sent first, in order")
+    parser.add_argument("--utterances", nargs="*", default=DEFAULT_UTTERANCES, help="Pool sampled after the script")
+    parser.add_argument("--think-time", type=float, default=0, help="Mean seconds a client waits before answering")
+    parser.add_argument("--kb-latency", type=float, default=0.05, help="Seconds the fake knowledge base takes")
+    parser.add_argument("--fake-intents", action="store_true", help="Random decider labels instead of the model")
+    parser.add_argument("--batch", action="store_true", help="Clients negotiate batched frames")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="Print the conversation")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    await http_clients.set_transport(create_fake_targets(args.kb_latency))
+    if args.fake_intents:
+        intent_cascade.classify = fake_classify
+
+    flow = Flow.from_json(args.flow)
+    manager = SessionManager()
+    stats = Stats()
+    start = time.perf_counter()
+    await aio.gather(*(run_client(manager, flow, stats, args) for _ in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    await chatlog_outbox.drain()
+    await http_clients.close()
+    await intent_batcher.shutdown()
+    await listen_timers.shutdown()
+
+    latencies = [latency * 1000 for latency in stats.turn_latencies]
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"sessions: {stats.sessions} ({stats.errors} failed) in {elapsed:.2f}s")
+    if latencies:
+        print(
+            f"turn latency ms: p50 {percentile(latencies, 50):.1f}  p90 {percentile(latencies, 90):.1f}  "
+            f"p99 {percentile(latencies, 99):.1f}  max {max(latencies):.1f}  mean {statistics.mean(latencies):.1f}"
+        )
+    print(f"turns: {len(latencies)}  frames: {stats.frames}  frames/sec: {stats.frames / elapsed:.0f}")
+    print(f"peak RSS: {peak_rss:.0f} MB")
+
+
+if __name__ == "__main__":
+    aio.run(main())
@@ -0,0 +1,97 @@
+"""
+Measures the bytes on the wire of chat sessions against a running backend, with
+and without permessage-deflate, for the production flow.
+
+The client answers every listen signal with the next scripted reply, or with the
+value of the first button when the replies run out, until the flow ends.
+
+Usage (from chatbot-backend/, with the backend started by server.py):
+    python scripts/measure_ws_bytes.py --url ws://localhost:8000/ws/tenantev --sessions 5 \
+        --replies "Hi" "I want to apply for a unit" "no"
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import uuid
+from typing import List
+
+import websockets
+from websockets.legacy.client import WebSocketClientProtocol
+
+
+class CountingProtocol(WebSocketClientProtocol):
+    # Bytes received from the socket, frame headers and handshake included
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bytes_received = 0
+
+    def data_received(self, data: bytes) -> None:
+        self.bytes_received += len(data)
+        super().data_received(data)
+
+
+def get_messages(frame: str) -> List[dict]:
+    data = json.loads(frame)
+    # Batched connections receive a list of messages per frame
+    return data if isinstance(data, list) else [data]
+
+
+async def run_session(url: str, replies: List[str], compression: bool, batch: bool, max_turns: int):
+    replies = list(replies)
+    frames = 0
+    async with websockets.connect(
+        f"{url}/{uuid.uuid4()}",
+        compression="deflate" if compression else None,
+        subprotocols=["chatbot.batch.v1"] if batch else None,
+        create_protocol=CountingProtocol,
+        max_size=None,
+        ) as ws:
+        turns = 0
+        try:
+            async for frame in ws:
+                frames += 1
+                for message in get_messages(frame):
+                    if message["user"] == "end_signal":
+                        return ws.bytes_received, frames
+                    if message["user"] != "listen_signal":
+                        continue
+                    turns += 1
+                    if turns > max_turns:
+                        return ws.bytes_received, frames
+                    if replies:
+                        text = replies.pop(0)
+                    elif message.get("elements"):
+                        text = message["elements"][0]["value"]
+                    else:
+                        text = "hello"
+                    await ws.send(json.dumps({"text": text}))
+        except websockets.ConnectionClosed:
+            pass
+        return ws.bytes_received, frames
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:8000/ws/tenantev")
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--replies", nargs="*", default=[])
+    parser.add_argument("--max-turns", type=int, default=20)
+    parser.add_argument("--batch", action="store_true", help="Negotiate batched frames")
+    args = parser.parse_args()
+
+    results = {}
+    for compression in (False, True):
+        sizes = []
+        for _ in range(args.sessions):
+            size, frames = await run_session(args.url, args.replies, compression, args.batch, args.max_turns)
+            sizes.append(size)
+        results[compression] = statistics.mean(sizes)
+        label = "deflate" if compression else "raw"
+        print(f"{label:>8}: {results[compression]:.0f} bytes/session ({frames} frames)")
+    if results[False]:
+        print(f"   ratio: {results[True] / results[False]:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,33 @@
+"""
+Runs the backend with uvicorn and the tunable permessage-deflate websocket
+protocol (see v1/src/compression.py and the WS_DEFLATE_* settings).
+
+Usage:
+    python server.py --host 0.0.0.0 --port 8000 --workers 1
+"""
+import argparse
+
+import uvicorn
+
+from core.settings import settings
+from v1.src.compression import CompressedWebSocketProtocol
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    uvicorn.run(
+        "main:api",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        ws=CompressedWebSocketProtocol,
+        ws_per_message_deflate=settings.ws.WS_DEFLATE_ENABLED,
+    )
+
+
+if __name__ == "__main__":
+    main()
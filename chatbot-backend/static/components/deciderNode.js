@@ -6,6 +6,12 @@ const component = `
   <div class="box">
     <p>Intent list</p>
     <textarea df-intents></textarea>
+    <p>Embedding margin (empty for default)</p>
+    <input type="text" df-embedding_margin>
+    <p>Embedding min score (empty for default)</p>
+    <input type="text" df-embedding_min_score>
+    <p>Prototypes (Dict like {"yes": ["sure", "ok"]})</p>
+    <textarea df-prototypes></textarea>
   </div>
 </div>
 `;
@@ -17,7 +23,7 @@ ondragstart="drag(event)"
 data-node="${nodeName}">
 ${icon}<span> Decision Node!</span>
 <div id="description_${nodeName}" style="display: none;">
-    <p>Makes a decision based on the list (List like ["yes","no","fail"]. If elements provided, it shows the strings as buttons in the UI. If text provided, displays an specific text</p>
+    <p>Makes a decision based on the list (List like ["yes","no","fail"]. If elements provided, it shows the strings as buttons in the UI. If text provided, displays an specific text. When the embedding cascade is enabled, the margin, min score and example utterances per intent tune when the fast embedding model answers without the NLI model</p>
 </div>
 </div>`
 ;
@@ -51,7 +57,10 @@ export const addDeciderNode = (editor, pos_x, pos_y) => {
     pos_y,
     nodeName,
     { 
-      intents: "" 
+      intents: "",
+      embedding_margin: "",
+      embedding_min_score: "",
+      prototypes: ""
     },
     component
   );
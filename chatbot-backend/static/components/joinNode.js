@@ -0,0 +1,60 @@
+const nodeName = "joinNode";
+const icon = '<i class="fas fa-compress-arrows-alt"></i>';
+const tittleClass = "join";
+const tittle = "Join branches";
+
+const component = `
+<div>
+  <div class="title-box ${tittleClass}">${icon}${tittle}</div>
+  <div class="box">
+    <p>Continues once every parallel branch has finished</p>
+    </div>
+</div>
+`;
+
+
+const menuIcon = `<div
+class="drag-drawflow"
+draggable="true"
+ondragstart="drag(event)"
+data-node="${nodeName}">
+${icon}<span> ${tittle}</span>
+<div id="description_${nodeName}" style="display: none;">
+    <p>Waits for the branches started by a Run in parallel node</p>
+</div>
+</div>`
+;
+
+export const initJoinNode = () => {
+  const menu = document.getElementById("menu-container");
+  menu.insertAdjacentHTML("beforeend", menuIcon);
+  // Add event listener to show description when dropdown button is clicked
+  var descriptionDiv = document.getElementById(`description_${nodeName}`);
+
+    // Get a reference to the element you want to click on
+    var element = document.querySelector(`div.drag-drawflow[data-node="${nodeName}"]`);
+
+    // Add a click event listener to the element
+    element.addEventListener("click", function () {
+        // Toggle the display of the description div
+        if (descriptionDiv.style.display === "none") {
+            descriptionDiv.style.display = "block";
+        } else {
+            descriptionDiv.style.display = "none";
+        }
+    });
+};
+
+export const addJoinNode = (editor, pos_x, pos_y) => {
+  editor.addNode(
+    nodeName,
+    1,
+    1,
+    pos_x,
+    pos_y,
+    nodeName,
+    { 
+    },
+    component
+  );
+};
@@ -0,0 +1,62 @@
+const nodeName = "parallelNode";
+const icon = '<i class="fas fa-code-branch"></i>';
+const tittleClass = "parallel";
+const tittle = "Run in parallel";
+
+const component = `
+<div>
+  <div class="title-box ${tittleClass}">${icon}${tittle}</div>
+  <div class="box">
+    <p>Branch timeout (seconds, empty waits for every branch)</p>
+    <input type="number" df-branch_timeout>
+    </div>
+</div>
+`;
+
+
+const menuIcon = `<div
+class="drag-drawflow"
+draggable="true"
+ondragstart="drag(event)"
+data-node="${nodeName}">
+${icon}<span> ${tittle}</span>
+<div id="description_${nodeName}" style="display: none;">
+    <p>Runs every connected branch at the same time until they reach a Join node. Variables written by several branches keep the value of the lowest branch on the canvas</p>
+</div>
+</div>`
+;
+
+export const initParallelNode = () => {
+  const menu = document.getElementById("menu-container");
+  menu.insertAdjacentHTML("beforeend", menuIcon);
+  // Add event listener to show description when dropdown button is clicked
+  var descriptionDiv = document.getElementById(`description_${nodeName}`);
+
+    // Get a reference to the element you want to click on
+    var element = document.querySelector(`div.drag-drawflow[data-node="${nodeName}"]`);
+
+    // Add a click event listener to the element
+    element.addEventListener("click", function () {
+        // Toggle the display of the description div
+        if (descriptionDiv.style.display === "none") {
+            descriptionDiv.style.display = "block";
+        } else {
+            descriptionDiv.style.display = "none";
+        }
+    });
+};
+
+export const addParallelNode = (editor, pos_x, pos_y) => {
+  editor.addNode(
+    nodeName,
+    1,
+    1,
+    pos_x,
+    pos_y,
+    nodeName,
+    { 
+        branch_timeout: 10
+    },
+    component
+  );
+};
@@ -0,0 +1,112 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.models.graph_model import Root
+from v1.routers import workflow
+from v1.src.analysis import analyze_flow
+
+NODE_DATA = {
+    "startNode": {"text": "hi"},
+    "textNode": {"text": "text"},
+    "listenerNode": {"saving_keys": "[\"last_utterance\"]", "elements": "[]", "timeout": "timeout"},
+    "deciderNode": {"intents": "[\"yes\", \"no\"]"},
+    "intentNode": {"intent": "yes"},
+    "endNode": {"text": "bye"},
+}
+
+
+def build_flow(nodes, edges):
+    """
+    `nodes` maps a drawflow id to (class, data overrides), `edges` lists
+    (from, to) pairs.
+    """
+    data = {}
+    for node_id, (node_class, overrides) in nodes.items():
+        data[str(node_id)] = {
+            "id": node_id,
+            "name": node_class,
+            "data": {**NODE_DATA[node_class], **overrides},
+            "class": node_class,
+            "html": node_class,
+            "typenode": False,
+            "inputs": {"input_1": {"connections": []}},
+            "outputs": {"output_1": {"connections": []}},
+            "pos_x": 0,
+            "pos_y": 0,
+        }
+    for source, target in edges:
+        data[str(source)]["outputs"]["output_1"]["connections"].append({"node": str(target), "output": "input_1"})
+        if str(target) in data:
+            data[str(target)]["inputs"]["input_1"]["connections"].append({"node": str(source), "input": "output_1"})
+    return Root(**{"drawflow": {"Home": {"data": data}}})
+
+
+def codes(issues):
+    return sorted(issue.code for issue in issues)
+
+
+def test_valid_flow_has_no_issues():
+    flow = build_flow(
+        {1: ("startNode", {}), 2: ("listenerNode", {}), 3: ("deciderNode", {}),
+         4: ("intentNode", {"intent": "yes"}), 5: ("intentNode", {"intent": "no"}),
+         6: ("intentNode", {"intent": "fail"}), 7: ("endNode", {})},
+        [(1, 2), (2, 3), (3, 4), (3, 5), (3, 6), (4, 7), (5, 2), (6, 2)],
+    )
+    report = analyze_flow(flow)
+    assert report.errors == []
+    assert report.warnings == []
+
+
+def test_missing_intent_branch_is_an_error():
+    flow = build_flow(
+        {1: ("startNode", {}), 2: ("listenerNode", {}), 3: ("deciderNode", {}),
+         4: ("intentNode", {"intent": "yes "}), 5: ("intentNode", {"intent": "fail"}), 6: ("endNode", {})},
+        [(1, 2), (2, 3), (3, 4), (3, 5), (4, 6), (5, 6)],
+    )
+    report = analyze_flow(flow)
+    assert codes(report.errors) == ["missing_intent_branch", "missing_intent_branch"]
+    assert "'yes '" in report.errors[0].message
+    assert codes(report.warnings) == ["unused_intent_branch"]
+
+
+def test_loop_without_listener():
+    endless = build_flow(
+        {1: ("startNode", {}), 2: ("textNode", {}), 3: ("textNode", {})},
+        [(1, 2), (2, 3), (3, 2)],
+    )
+    report = analyze_flow(endless)
+    assert codes(report.errors) == ["endless_cycle"]
+    assert report.errors[0].nodes == ["2", "3"]
+
+    with_listener = build_flow(
+        {1: ("startNode", {}), 2: ("textNode", {}), 3: ("listenerNode", {})},
+        [(1, 2), (2, 3), (3, 2)],
+    )
+    assert analyze_flow(with_listener).errors == []
+
+
+def test_unreachable_dangling_and_unknown_nodes():
+    flow = build_flow(
+        {1: ("startNode", {}), 2: ("textNode", {}), 3: ("endNode", {})},
+        [(1, 2), (1, 99)],
+    )
+    report = analyze_flow(flow)
+    assert codes(report.errors) == ["dangling_edge"]
+    # Reported on the start node by its drawflow id
+    assert report.errors[0].nodes == ["1"]
+    assert [(issue.code, issue.nodes) for issue in report.warnings] == [
+        ("unreachable", ["3"]),
+        ("dangling_output", ["2"]),
+    ]
+
+
+def test_publish_rejects_flow_with_errors():
+    app = FastAPI()
+    app.include_router(workflow.router)
+    flow = build_flow(
+        {1: ("startNode", {}), 2: ("textNode", {}), 3: ("textNode", {})},
+        [(1, 2), (2, 3), (3, 2)],
+    )
+    response = TestClient(app).post("/workflow/publish", json=flow.model_dump(by_alias=True))
+    assert response.status_code == 422
+    assert response.json()["detail"]["errors"][0]["code"] == "endless_cycle"
@@ -0,0 +1,53 @@
+import httpx
+import pytest
+
+from v1.src.clients import HTTPClients, http_clients
+from v1.src.handler import QaHandler, AIHandler
+
+
+def kb_fake(request: httpx.Request) -> httpx.Response:
+    if request.url.path.endswith("/generate"):
+        return httpx.Response(200, json={"human_prompt": "hi", "answer": "generated"})
+    return httpx.Response(200, json={
+        "question": "hi",
+        "answer": "from the kb",
+        "documents": [{"page_content": "doc", "metadata": {}, "score": 0.9}],
+    })
+
+
+@pytest.fixture
+def fake_kb(monkeypatch):
+    monkeypatch.setattr(http_clients, "transport", httpx.MockTransport(kb_fake))
+    monkeypatch.setattr(http_clients, "clients", {})
+
+
+@pytest.mark.asyncio
+async def test_clients_are_pooled_per_target():
+    clients = HTTPClients()
+    kb = clients.get("kb")
+    assert clients.get("kb") is kb
+    assert clients.get("chatlog") is not kb
+    await clients.close()
+    assert clients.get("kb") is not kb
+    await clients.close()
+
+
+def test_unknown_target():
+    with pytest.raises(ValueError):
+        HTTPClients().get("mongo")
+
+
+@pytest.mark.asyncio
+async def test_qa_handler_is_awaitable(fake_kb):
+    handler = QaHandler()
+    text, intent = await handler.run(None, {"last_utterance": "hi"})
+    assert text == "from the kb"
+    assert intent == "success"
+
+
+@pytest.mark.asyncio
+async def test_ai_handler_is_awaitable(fake_kb):
+    handler = AIHandler(instruction="{last_utterance}", system_message="be nice")
+    text, intent = await handler.run(None, {"last_utterance": "hi"})
+    assert text == "generated"
+    assert intent == "success"
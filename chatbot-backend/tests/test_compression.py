@@ -0,0 +1,38 @@
+import json
+
+from websockets import frames
+from websockets.extensions.permessage_deflate import PerMessageDeflate
+
+from v1.src.compression import ThresholdPerMessageDeflate, create_deflate_factory
+
+
+def text_frame(size):
+    message = {"user": "AI", "text": "Hello, how can I help you today? " * size}
+    return frames.Frame(frames.OP_TEXT, json.dumps(message).encode())
+
+
+def test_small_frames_are_sent_raw():
+    extension = ThresholdPerMessageDeflate(False, False, 15, 15, {"level": 6}, min_size=256)
+    small = text_frame(1)
+    assert extension.encode(small) == small
+
+
+def test_large_frames_are_compressed():
+    extension = ThresholdPerMessageDeflate(False, False, 15, 15, {"level": 6}, min_size=256)
+    client = PerMessageDeflate(False, False, 15, 15)
+    large = text_frame(50)
+    encoded = extension.encode(large)
+    assert encoded.rsv1
+    assert len(encoded.data) < len(large.data)
+    assert client.decode(encoded).data == large.data
+    # Raw frames in between keep the compression context usable
+    assert client.decode(extension.encode(text_frame(1))).data == text_frame(1).data
+    assert client.decode(extension.encode(large)).data == large.data
+
+
+def test_factory_negotiates_threshold_extension():
+    factory = create_deflate_factory(level=1, min_size=128)
+    _, extension = factory.process_request_params([], [])
+    assert isinstance(extension, ThresholdPerMessageDeflate)
+    assert extension.min_size == 128
+    assert extension.compress_settings["level"] == 1
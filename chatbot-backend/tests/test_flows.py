@@ -0,0 +1,199 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from core.settings import settings
+from v1.src import artifact as artifact_module
+from v1.src import flows
+from v1.src.flows import Flow, FlowCache, FlowRegistry
+
+PRODUCTION_FLOW = Path(flows.__file__).parent / "flows/flow_production.json"
+
+
+@pytest.fixture
+def flows_dir(tmp_path, monkeypatch):
+    shutil.copy(PRODUCTION_FLOW, tmp_path / "flow_production.json")
+    monkeypatch.setattr(flows, "FLOWS_DIR", tmp_path)
+    monkeypatch.setattr(settings.flows, "FLOW_ARTIFACT_KEY", "test-key")
+    return tmp_path
+
+
+def test_flow_cache_reuses_compiled_flow(flows_dir):
+    cache = FlowCache()
+    flow = cache.get()
+    assert isinstance(flow, Flow)
+    assert cache.get() is flow
+
+
+@pytest.mark.asyncio
+async def test_flow_cache_hits_do_not_wait_for_compilation(flows_dir):
+    cache = FlowCache()
+    flow = cache.get()
+    # A publish or warmup compiling another flow holds the lock
+    with cache._lock:
+        assert cache.get() is flow
+        assert await cache.aget_for_origin("unknown") is flow
+
+
+def test_flow_cache_reloads_replaced_file(flows_dir):
+    cache = FlowCache()
+    flow = cache.get()
+    target = flows_dir / "flow_production.json"
+    shutil.copy(PRODUCTION_FLOW, flows_dir / "new.json")
+    os.replace(flows_dir / "new.json", target)
+    assert cache.get() is not flow
+
+
+def test_flow_cache_invalidate(flows_dir):
+    cache = FlowCache()
+    flow = cache.get()
+    cache.invalidate("flow_production.json")
+    assert cache.get() is not flow
+
+
+def test_compiled_transitions_follow_intent_labels():
+    flow = Flow.from_json()
+    deciders = [node for node in flow.nodes.values() if node.type == "decider"]
+    assert deciders
+    for decider in deciders:
+        for label, child in decider.transitions.items():
+            assert flow.nodes[child].handler.label == label
+            assert decider.get_next_node(label) == child
+        with pytest.raises(KeyError):
+            decider.get_next_node("not-a-label")
+
+
+def test_compiled_node_single_child():
+    flow = Flow.from_json()
+    start = flow.nodes["start00000000"]
+    assert start.transitions is None
+    assert start.get_next_node() == list(flow.graph.neighbors("start00000000"))[0]
+
+
+def test_flow_artifact_is_written_and_reused(flows_dir, monkeypatch):
+    flow = Flow.load()
+    assert (flows_dir / "flow_production.flow").exists()
+
+    def compile_json(*args, **kwargs):
+        raise AssertionError("the artifact should have been used")
+
+    monkeypatch.setattr(Flow, "from_workflow", compile_json)
+    loaded = Flow.load()
+    assert loaded.nodes.keys() == flow.nodes.keys()
+    assert sorted(loaded.graph.edges) == sorted(flow.graph.edges)
+    assert loaded.nodes["start00000000"].get_next_node() == flow.nodes["start00000000"].get_next_node()
+
+
+def test_stale_or_broken_artifact_falls_back_to_json(flows_dir):
+    Flow.load()
+    target = flows_dir / "flow_production.json"
+    target.write_text(target.read_text() + "\n")
+    artifact = flows_dir / "flow_production.flow"
+    written = artifact.read_bytes()
+    # Changed JSON: compiled again and the artifact is rewritten
+    Flow.load()
+    assert artifact.read_bytes() != written
+
+    artifact.write_bytes(b"not an artifact")
+    flow = Flow.load()
+    assert "start00000000" in flow.nodes
+
+
+def test_unsigned_artifact_is_not_loaded(flows_dir, monkeypatch):
+    Flow.load()
+    artifact = flows_dir / "flow_production.flow"
+    data = artifact.read_bytes()
+    json_path = flows_dir / "flow_production.json"
+    source = json_path.read_bytes()
+    loads = []
+    monkeypatch.setattr(artifact_module.pickle, "loads", lambda body: loads.append(body))
+    # Tampered body
+    artifact.write_bytes(data[:-1] + bytes([data[-1] ^ 1]))
+    assert artifact_module.read_artifact(str(json_path), source) is None
+    # Signed with another key
+    artifact.write_bytes(data)
+    monkeypatch.setattr(settings.flows, "FLOW_ARTIFACT_KEY", "other-key")
+    assert artifact_module.read_artifact(str(json_path), source) is None
+    assert loads == []
+
+
+def test_no_artifact_without_key(flows_dir, monkeypatch):
+    monkeypatch.setattr(settings.flows, "FLOW_ARTIFACT_KEY", "")
+    flow = Flow.load()
+    assert not (flows_dir / "flow_production.flow").exists()
+    assert "start00000000" in flow.nodes
+
+
+def test_flow_cache_drops_least_recently_used(flows_dir):
+    for name in ("a.json", "b.json", "c.json"):
+        shutil.copy(PRODUCTION_FLOW, flows_dir / name)
+    cache = FlowCache()
+    flow_a = cache.get("a.json")
+    # Room for two flows
+    cache.max_bytes = flow_a.size * 2
+    cache.get("b.json")
+    assert cache.get("a.json") is flow_a
+    cache.get("c.json")
+    assert list(cache.flows) == ["a.json", "c.json"]
+    assert cache.get_size() <= cache.max_bytes
+
+
+def test_flow_registry_routes_origins(flows_dir, monkeypatch):
+    shutil.copy(PRODUCTION_FLOW, flows_dir / "tenant_v2.json")
+    registry = FlowRegistry({"tenant": "tenant_v2.json"}, default="flow_production.json")
+    assert registry.get_file("tenant") == "tenant_v2.json"
+    assert registry.get_file("unknown") == "flow_production.json"
+    with pytest.raises(ValueError):
+        FlowRegistry({"tenant": "../secrets.json"})
+
+    monkeypatch.setattr(flows, "flow_registry", registry)
+    cache = FlowCache()
+    assert cache.get_for_origin("tenant") is cache.get("tenant_v2.json")
+
+
+def test_warmup_compiles_registered_flows(flows_dir, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from v1.routers import workflow
+
+    shutil.copy(PRODUCTION_FLOW, flows_dir / "tenant_v2.json")
+    registry = FlowRegistry({"tenant": "tenant_v2.json", "broken": "missing.json"})
+    cache = FlowCache()
+    monkeypatch.setattr(workflow, "flow_registry", registry)
+    monkeypatch.setattr(workflow, "flow_cache", cache)
+    app = FastAPI()
+    app.include_router(workflow.router)
+
+    response = TestClient(app).post("/workflow/warmup")
+    assert response.status_code == 200
+    flows_report = response.json()["flows"]
+    assert flows_report["tenant"]["file"] == "tenant_v2.json"
+    assert flows_report["tenant"]["nodes"] > 0
+    assert "error" in flows_report["broken"]
+    assert "tenant_v2.json" in cache.flows
+
+
+def test_editor_round_trip_for_origin(flows_dir, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from v1.routers import workflow
+
+    shutil.copy(PRODUCTION_FLOW, flows_dir / "tenant_v2.json")
+    monkeypatch.setattr(workflow, "flow_registry", FlowRegistry({"tenant": "tenant_v2.json"}))
+    monkeypatch.setattr(workflow, "flow_cache", FlowCache())
+    app = FastAPI()
+    app.include_router(workflow.router)
+    client = TestClient(app)
+    flow = json.loads(PRODUCTION_FLOW.read_text())
+
+    # No autosave yet, the editor starts from the published flow
+    assert client.get("/workflow/fetch/latest", params={"origin": "tenant"}).status_code == 200
+    assert client.post("/workflow/autosave", params={"origin": "tenant"}, json=flow).status_code == 200
+    assert (flows_dir / "tenant_v2_latest.json").exists()
+    assert not (flows_dir / "flow_latest.json").exists()
+    response = client.get("/workflow/fetch/latest", params={"origin": "tenant"})
+    assert response.json() == json.loads((flows_dir / "tenant_v2_latest.json").read_text())
+    assert client.get("/workflow/fetch/prod", params={"origin": "unknown"}).status_code == 404
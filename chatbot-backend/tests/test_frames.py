@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from core.models.chat_message_model import ChatMessage, Elements
+from v1.src.compiler import CompiledNode
+from v1.src.frames import BATCH_SUBPROTOCOL, negotiate_batching
+from v1.src.handler import EndHandler, ListenHandler, TextHandler
+from v1.src.session import Session
+
+
+def make_message():
+    elements = [Elements(type="button", label="Yes", value="yes"), Elements(type="button", label="No", value="no")]
+    return ChatMessage(text="Hello, how can I help you today? " * 4, elements=elements, user="AI", session_id="s1")
+
+
+@pytest.mark.asyncio
+async def test_frame_matches_send_json():
+    frames = []
+
+    class RecordingWebSocket:
+        async def send_text(self, data):
+            frames.append(data)
+
+    session = Session()
+    session.init(240, 0)
+    message = make_message()
+    message.user = "listen_signal"
+    await session.send_message(RecordingWebSocket(), message)
+    assert json.loads(frames[0]) == json.loads(json.dumps(message.model_dump(by_alias=True)))
+
+
+class TurnWebSocket:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.sent = []
+        self.closed = False
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+    async def receive_json(self):
+        return {"text": self.replies.pop(0)}
+
+    async def close(self):
+        self.closed = True
+
+
+def make_flow_session():
+    nodes = {
+        Session.starter_node: CompiledNode(id=Session.starter_node, handler=TextHandler(text="Hi!"), next_node="listen"),
+        "listen": CompiledNode(id="listen", handler=ListenHandler(), next_node="echo"),
+        "echo": CompiledNode(id="echo", handler=TextHandler(text="You said {last_utterance}"), next_node="end"),
+        "end": CompiledNode(id="end", handler=EndHandler(text="Bye")),
+    }
+    return Session(nodes=nodes)
+
+
+@pytest.mark.asyncio
+async def test_unbatched_frames():
+    websocket = TurnWebSocket(["hello"])
+    await make_flow_session().start_flow(websocket)
+    assert all(isinstance(frame, dict) for frame in websocket.sent)
+    assert websocket.closed
+
+
+@pytest.mark.asyncio
+async def test_batched_turns():
+    websocket = TurnWebSocket(["hello"])
+    await make_flow_session().start_flow(websocket, batch=True)
+
+    # One frame before waiting for the user, one for the rest of the conversation
+    assert len(websocket.sent) == 2
+    first, second = websocket.sent
+    assert [frame["user"] for frame in first] == ["AI", "listen_signal"]
+    assert [frame["user"] for frame in second][:2] == ["USER", "ai_signal"]
+    assert second[-1]["user"] == "end_signal"
+    assert websocket.closed
+
+
+@pytest.mark.asyncio
+async def test_batch_subprotocol_negotiation():
+    class Scope:
+        def __init__(self, subprotocols):
+            self.scope = {"subprotocols": subprotocols}
+
+    assert negotiate_batching(Scope([BATCH_SUBPROTOCOL])) == BATCH_SUBPROTOCOL
+    assert negotiate_batching(Scope([])) is None
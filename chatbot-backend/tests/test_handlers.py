@@ -23,9 +23,10 @@ def test_end_handler():
     assert text == "Goodbye!"
     assert intent is None
     
-def test_decider_handler(vars):
+@pytest.mark.asyncio
+async def test_decider_handler(vars):
     handler = DeciderHandler(labels=["greeting", "bye"])
-    text, intent = handler.execute(vars=vars)
+    text, intent = await handler.run(None, vars=vars)
     assert intent == "greeting"
     assert text is None
     
@@ -40,9 +41,10 @@ def test_intent_handler():
     (AIHandler, "success"),
     (ValidatorHandler, "valid"),
     ])
-def test_success_handlers(handler_class, expected, vars):
+@pytest.mark.asyncio
+async def test_success_handlers(handler_class, expected, vars):
     handler = handler_class()
-    text, intent = handler.execute(vars=vars)
+    text, intent = await handler.run(None, vars=vars)
     assert intent == expected
 
 def test_set_value_handler():
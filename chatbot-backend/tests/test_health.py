@@ -0,0 +1,26 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from v1.models.intent_cascade import intent_cascade
+from v1.routers import healtcheck
+
+app = FastAPI()
+app.include_router(healtcheck.router)
+client = TestClient(app)
+
+
+def test_health():
+    assert client.get("/health/").json() == {"status": "OK"}
+
+
+def test_not_ready_until_models_are_warm(monkeypatch):
+    monkeypatch.setattr(intent_cascade, "is_ready", lambda: False)
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json() == {"status": "LOADING"}
+
+
+def test_ready(monkeypatch):
+    monkeypatch.setattr(intent_cascade, "is_ready", lambda: True)
+    response = client.get("/health/ready")
+    assert response.status_code == 200
@@ -0,0 +1,40 @@
+import pytest
+
+from core.models.chat_message_model import ChatMessage
+from v1.src.handler import TicketHandler
+from v1.src.history import HistoryRecord, add_record
+from v1.src.session import Session
+
+
+@pytest.mark.asyncio
+async def test_signals_are_not_stored(websocket):
+    session = Session()
+    session.init(240, 0)
+    users = ["listen_signal", "USER", "ai_signal", "AI", "timeout_signal"]
+    for user in users:
+        await session.send_message(websocket, ChatMessage(text=user.lower(), user=user, session_id="s1"))
+    assert [frame["user"] for frame in websocket.sent] == users
+
+    history = session.tracker["history"]
+    assert [record.user for record in history] == ["USER", "AI"]
+    assert all(isinstance(record, HistoryRecord) for record in history)
+    assert history[1].text == "ai"
+
+
+def test_history_cap():
+    history = []
+    for i in range(5):
+        add_record(history, HistoryRecord(str(i), None, "USER", str(i)), max_size=3)
+    assert [record.message_id for record in history] == ["2", "3", "4"]
+
+
+def test_ticket_report_from_records():
+    data = {
+        "name": "Jane",
+        "email": "jane@example.com",
+        "role": "Owner",
+        "history": [HistoryRecord("1", None, "USER", "hi"), HistoryRecord("2", None, "AI", "**hello**")],
+    }
+    html = TicketHandler().parse_session_chats(data)
+    assert "<b>USER</b>: hi" in html
+    assert "<b>AI</b>: <strong>hello</strong>" in html
@@ -0,0 +1,50 @@
+import asyncio as aio
+
+import pytest
+
+from v1.models.intent_batcher import IntentBatcher
+
+
+class FakeClassifier:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, requests):
+        self.batches.append(requests)
+        return [
+            {"sequence": text, "labels": labels, "scores": [1 / len(labels)] * len(labels)}
+            for text, labels in requests
+        ]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_batched():
+    classifier = FakeClassifier()
+    batcher = IntentBatcher(classifier, max_batch_size=8, max_wait_ms=20)
+    texts = [f"utterance {i}" for i in range(5)]
+    results = await aio.gather(*[batcher.predict(text, ["yes", "no"]) for text in texts])
+    assert [result["sequence"] for result in results] == texts
+    assert [len(batch) for batch in classifier.batches] == [5]
+    await batcher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_batches_respect_max_size():
+    classifier = FakeClassifier()
+    batcher = IntentBatcher(classifier, max_batch_size=2, max_wait_ms=5)
+    await aio.gather(*[batcher.predict(str(i), ["a", "b", "c"]) for i in range(5)])
+    assert [len(batch) for batch in classifier.batches] == [2, 2, 1]
+    await batcher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_batch_errors_reach_every_caller():
+    def failing(requests):
+        raise RuntimeError("model crashed")
+
+    batcher = IntentBatcher(failing, max_batch_size=4, max_wait_ms=5)
+    results = await aio.gather(
+        batcher.predict("a", ["x"]), batcher.predict("b", ["y"]), return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+    await batcher.shutdown()
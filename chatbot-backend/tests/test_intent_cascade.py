@@ -0,0 +1,83 @@
+import pytest
+
+from v1.models.intent_cascade import CascadeClassifier
+from v1.models.intent_classifier import PredictionCache
+
+
+class FakeEmbedder:
+    def __init__(self, scores):
+        self.scores = scores
+
+    def classify(self, text, labels, prototypes=None):
+        order = sorted(labels, key=lambda label: self.scores[label], reverse=True)
+        return {"sequence": text, "labels": order, "scores": [self.scores[label] for label in order]}
+
+
+class FakeBatcher:
+    def __init__(self):
+        self.calls = 0
+
+    async def predict(self, text, labels, check_cache=True):
+        self.calls += 1
+        return {"sequence": text, "labels": list(labels), "scores": [0.8] + [0.2 / (len(labels) - 1)] * (len(labels) - 1)}
+
+
+def cascade(scores, **kwargs):
+    return CascadeClassifier(FakeEmbedder(scores), FakeBatcher(), enabled=True, margin=0.15, min_score=0.5, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_clear_margin_is_answered_by_embeddings():
+    classifier = cascade({"yes": 0.9, "no": 0.3})
+    result = await classifier.classify("yes please", ["yes", "no"])
+    assert result["tier"] == "embedding"
+    assert result["labels"][0] == "yes"
+    assert classifier.batcher.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_ambiguous_utterance_falls_through_to_nli():
+    classifier = cascade({"yes": 0.6, "no": 0.55})
+    result = await classifier.classify("maybe", ["yes", "no"])
+    assert result["tier"] == "nli"
+    assert classifier.batcher.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_per_node_thresholds_override_defaults():
+    classifier = cascade({"yes": 0.6, "no": 0.55})
+    result = await classifier.classify("maybe", ["yes", "no"], margin=0.01, min_score=0.1)
+    assert result["tier"] == "embedding"
+
+
+@pytest.mark.asyncio
+async def test_cached_predictions_skip_both_tiers():
+    cache = PredictionCache(max_size=8)
+    cache.set("hi", ["yes", "no"], {"labels": ["no", "yes"], "scores": [0.7, 0.3]})
+    classifier = cascade({"yes": 0.9, "no": 0.1}, cache=cache)
+    result = await classifier.classify("hi", ["yes", "no"])
+    assert result["tier"] == "cache"
+    assert classifier.tier_counts == {"cache": 1, "embedding": 0, "nli": 0}
+
+
+@pytest.mark.asyncio
+async def test_failed_warmup_is_retried(monkeypatch):
+    from v1.models import intent_cascade
+
+    attempts = []
+    ready = []
+
+    def flaky_warmup():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OSError("model download failed")
+        ready.append(True)
+
+    monkeypatch.setattr(intent_cascade, "warmup", flaky_warmup)
+    monkeypatch.setattr(intent_cascade, "is_ready", lambda: bool(ready))
+    classifier = cascade({"yes": 0.9}, warmup_backoff_s=0.001, warmup_backoff_max_s=0.002)
+    classifier.batcher.executor = None
+    classifier.embedder.warmup = lambda: None
+    await classifier.warmup()
+    assert len(attempts) == 3
+    assert classifier.is_ready()
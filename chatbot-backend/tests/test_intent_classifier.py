@@ -0,0 +1,78 @@
+import time
+
+import numpy as np
+import pytest
+
+from v1.models.intent_classifier import PredictionCache, load_backend, prediction_cache, predict_batch
+
+
+def result(labels, scores):
+    return {"sequence": "", "labels": labels, "scores": scores}
+
+
+def test_cache_key_ignores_case_spacing_and_label_order():
+    cache = PredictionCache(max_size=8, ttl=60)
+    cache.set("Yes", ["yes", "no"], result(["yes", "no"], [0.9, 0.1]))
+    cached = cache.get("  yes! ", ["no", "yes"])
+    assert cached["labels"] == ["yes", "no"]
+    assert cached["sequence"] == "  yes! "
+    assert cache.get("yes", ["yes", "no", "help"]) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PredictionCache(max_size=2, ttl=60)
+    cache.set("a", ["x"], result(["x"], [1.0]))
+    cache.set("b", ["x"], result(["x"], [1.0]))
+    cache.get("a", ["x"])
+    cache.set("c", ["x"], result(["x"], [1.0]))
+    assert cache.get("b", ["x"]) is None
+    assert cache.get("a", ["x"]) is not None
+    assert cache.stats()["size"] == 2
+
+
+def test_cache_entries_expire():
+    cache = PredictionCache(max_size=2, ttl=0.01)
+    cache.set("a", ["x"], result(["x"], [1.0]))
+    time.sleep(0.02)
+    assert cache.get("a", ["x"]) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_cached_results_are_copies():
+    cache = PredictionCache(max_size=2, ttl=60)
+    cache.set("a", ["x", "y"], result(["x", "y"], [0.7, 0.3]))
+    cache.get("a", ["x", "y"])["scores"].append(1.0)
+    assert cache.get("a", ["x", "y"])["scores"] == [0.7, 0.3]
+
+
+def test_disabled_cache():
+    cache = PredictionCache(max_size=0)
+    cache.set("a", ["x"], result(["x"], [1.0]))
+    assert cache.get("a", ["x"]) is None
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        load_backend("tensorflow")
+
+
+class FakeNLIBackend:
+    # Contradiction wins for "no", entailment for every other label
+    def nli_logits(self, premises, hypotheses):
+        return np.array([[2.0, 0.0] if "no" in hypothesis else [0.0, 2.0] for hypothesis in hypotheses])
+
+
+def test_single_label_is_scored_against_contradiction():
+    prediction_cache.clear()
+    backend = FakeNLIBackend()
+    [unlikely, likely, several] = predict_batch(
+        [("hi", ["no"]), ("hi", ["yes"]), ("hi", ["no", "yes"])],
+        backend=backend,
+        )
+    assert unlikely["scores"][0] < 0.5
+    assert likely["scores"][0] > 0.5
+    # Several labels still share the entailment softmax
+    assert several["labels"] == ["yes", "no"]
+    assert sum(several["scores"]) == pytest.approx(1)
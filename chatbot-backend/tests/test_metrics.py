@@ -0,0 +1,47 @@
+import asyncio as aio
+
+import pytest
+from prometheus_client import REGISTRY, generate_latest
+
+from v1.src.compiler import CompiledNode
+from v1.src.handler import TextHandler
+from v1.src.metrics import LoopLagMonitor
+from v1.src.session import SessionManager
+
+
+@pytest.mark.asyncio
+async def test_node_execution_is_timed():
+    node = CompiledNode(id="metrics-text", handler=TextHandler(text="hi"), next_node=None)
+    session = SessionManager().create_session(session_id="m1", nodes={"metrics-text": node})
+    session.init(240, 0)
+    labels = {"node_type": node.type, "node_id": "metrics-text"}
+    before = REGISTRY.get_sample_value("chatbot_node_duration_seconds_count", labels) or 0
+
+    await session.execute(value=None, keys=["last_response"], current_node="metrics-text")
+
+    assert REGISTRY.get_sample_value("chatbot_node_duration_seconds_count", labels) == before + 1
+
+
+@pytest.mark.asyncio
+async def test_session_gauges():
+    manager = SessionManager()
+    manager.create_session(session_id="m1")
+    listening = manager.create_session(session_id="m2")
+    listening.listening = True
+    assert manager.get_stats() == {"resident": 2, "active": 1, "listening": 1, "hibernated": 0}
+
+
+@pytest.mark.asyncio
+async def test_loop_lag_is_recorded():
+    before = REGISTRY.get_sample_value("chatbot_event_loop_lag_seconds_count") or 0
+    monitor = LoopLagMonitor(interval=0.01)
+    monitor.start()
+    await aio.sleep(0.05)
+    await monitor.shutdown()
+    assert REGISTRY.get_sample_value("chatbot_event_loop_lag_seconds_count") > before
+
+
+def test_exposition_format():
+    text = generate_latest().decode()
+    assert "# TYPE chatbot_node_duration_seconds histogram" in text
+    assert "# TYPE chatbot_intents_total counter" in text
@@ -0,0 +1,84 @@
+import json
+
+import httpx
+import pytest
+
+from v1.src.clients import http_clients
+from v1.src.outbox import ChatlogOutbox
+
+
+class FakeChatlog:
+    def __init__(self, failures=0, status_code=503):
+        self.failures = failures
+        self.status_code = status_code
+        self.batches = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if self.failures > 0:
+            self.failures -= 1
+            return httpx.Response(self.status_code)
+        self.batches.append(json.loads(request.content))
+        return httpx.Response(200, json=[])
+
+
+@pytest.fixture
+def fake_chatlog(monkeypatch):
+    def install(**kwargs):
+        chatlog = FakeChatlog(**kwargs)
+        monkeypatch.setattr(http_clients, "transport", httpx.MockTransport(chatlog))
+        monkeypatch.setattr(http_clients, "clients", {})
+        return chatlog
+    return install
+
+
+def message(i, session_id="s1"):
+    return {"message_id": str(i), "exchange": f"hi {i}", "message_type": "USER", "session_id": session_id}
+
+
+@pytest.mark.asyncio
+async def test_batches_across_sessions(fake_chatlog):
+    chatlog = fake_chatlog()
+    outbox = ChatlogOutbox(max_batch_size=3, flush_interval_ms=10, retry_backoff_s=0)
+    for i in range(7):
+        outbox.put(message(i, session_id=f"s{i % 2}"))
+    await outbox.drain(timeout=5)
+
+    assert [len(batch) for batch in chatlog.batches] == [3, 3, 1]
+    assert [m["message_id"] for batch in chatlog.batches for m in batch] == [str(i) for i in range(7)]
+    assert outbox.stats["sent"] == 7
+    assert outbox.stats["batches"] == 3
+
+
+@pytest.mark.asyncio
+async def test_retries_with_backoff(fake_chatlog):
+    chatlog = fake_chatlog(failures=2)
+    outbox = ChatlogOutbox(flush_interval_ms=0, retry_backoff_s=0.001)
+    outbox.put(message(1))
+    await outbox.drain(timeout=5)
+
+    assert chatlog.batches == [[message(1)]]
+    assert outbox.stats["retries"] == 2
+    assert outbox.stats["dropped"] == 0
+
+
+@pytest.mark.asyncio
+async def test_gives_up_on_client_errors(fake_chatlog):
+    chatlog = fake_chatlog(failures=1, status_code=422)
+    outbox = ChatlogOutbox(flush_interval_ms=0, retry_backoff_s=0.001)
+    outbox.put(message(1))
+    await outbox.drain(timeout=5)
+
+    assert chatlog.batches == []
+    assert outbox.stats["retries"] == 0
+    assert outbox.stats["dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_messages(fake_chatlog):
+    fake_chatlog()
+    outbox = ChatlogOutbox(max_queue_size=2, flush_interval_ms=0)
+    for i in range(3):
+        outbox.put(message(i))
+    assert outbox.stats["dropped"] == 1
+    await outbox.drain(timeout=5)
+    assert outbox.stats["sent"] == 2
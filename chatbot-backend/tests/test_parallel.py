@@ -0,0 +1,116 @@
+import asyncio as aio
+
+import networkx as nx
+import pytest
+
+from v1.src.compiler import compile_graph
+from v1.src.handler import BaseHandler, JoinHandler, ListenHandler, ParallelHandler, TextHandler
+from v1.src.session import Session
+
+
+class SlowHandler(BaseHandler):
+    type = "slow"
+    show = True
+
+    def __init__(self, text, delay, saving_keys=["last_response"]) -> None:
+        super().__init__()
+        self.text = text
+        self.delay = delay
+        self.saving_keys = saving_keys
+
+    async def execute(self, value=None, vars=None):
+        await aio.sleep(self.delay)
+        return self.text, None
+
+
+class HandshakeHandler(BaseHandler):
+    type = "handshake"
+    show = True
+
+    def __init__(self, text, mine, other, saving_keys=["last_response"]) -> None:
+        super().__init__()
+        self.text = text
+        self.mine = mine
+        self.other = other
+        self.saving_keys = saving_keys
+
+    async def execute(self, value=None, vars=None):
+        # Only returns once the other branch has started too
+        self.mine.set()
+        await aio.wait_for(self.other.wait(), 1)
+        return self.text, None
+
+
+def build_graph(branches, branch_timeout=None):
+    graph = nx.DiGraph()
+    graph.add_node("fork", handler=ParallelHandler(branch_timeout=branch_timeout))
+    graph.add_node("join", handler=JoinHandler())
+    graph.add_node("after", handler=TextHandler(text="done"))
+    graph.add_edge("join", "after")
+    for i, (name, handler) in enumerate(branches):
+        graph.add_node(name, handler=handler, pos_x=0, pos_y=100 * i)
+        graph.add_edge("fork", name)
+        graph.add_edge(name, "join")
+    return graph
+
+
+def test_compiled_branches_follow_canvas_order():
+    graph = build_graph([("b", TextHandler(text="b")), ("a", TextHandler(text="a"))])
+    nodes = compile_graph(graph)
+    fork = nodes["fork"]
+    assert fork.branches == ["b", "a"]
+    assert fork.join == "join"
+    assert fork.get_next_node() == "join"
+
+
+def test_branch_with_listen_node_is_rejected():
+    graph = build_graph([("a", TextHandler(text="a")), ("l", ListenHandler())])
+    with pytest.raises(ValueError):
+        compile_graph(graph)
+
+
+def test_branch_with_loop_is_rejected():
+    graph = build_graph([("a", TextHandler(text="a")), ("b", TextHandler(text="b"))])
+    graph.add_node("retry", handler=TextHandler(text="again"))
+    graph.remove_edge("b", "join")
+    graph.add_edge("b", "retry")
+    graph.add_edge("retry", "b")
+    with pytest.raises(ValueError, match="loops"):
+        compile_graph(graph)
+
+
+@pytest.mark.asyncio
+async def test_branches_run_concurrently_and_merge_in_order(websocket):
+    kb_started, ai_started = aio.Event(), aio.Event()
+    graph = build_graph([
+        ("kb", HandshakeHandler("kb answer", kb_started, ai_started, saving_keys=["last_response", "kb_answer"])),
+        ("ai", HandshakeHandler("rewrite", ai_started, kb_started, saving_keys=["last_response", "rewrite"])),
+    ])
+    session = Session(graph=graph)
+    session.init(240, 0)
+    session.tracker["current_node"] = "fork"
+
+    await session.handle_parallel_node(websocket, "fork")
+
+    assert session.tracker["kb_answer"] == "kb answer"
+    assert session.tracker["rewrite"] == "rewrite"
+    # Both branches wrote it, the last branch wins
+    assert session.tracker["last_response"] == "rewrite"
+    assert [frame["text"] for frame in websocket.sent] == ["kb answer", "rewrite"]
+    assert session.tracker["current_node"] == "join"
+
+
+@pytest.mark.asyncio
+async def test_slow_branch_times_out_alone(websocket):
+    graph = build_graph([
+        ("fast", SlowHandler("fast", 0, saving_keys=["fast"])),
+        ("slow", SlowHandler("slow", 5, saving_keys=["slow"])),
+    ], branch_timeout=0.2)
+    session = Session(graph=graph)
+    session.init(240, 0)
+
+    await session.handle_parallel_node(websocket, "fork")
+
+    assert session.tracker["fast"] == "fast"
+    assert "slow" not in session.tracker
+    assert [frame["text"] for frame in websocket.sent] == ["fast"]
@@ -0,0 +1,104 @@
+import asyncio as aio
+import json
+
+import httpx
+import networkx as nx
+import pytest
+from prometheus_client import REGISTRY
+
+from v1.src.clients import http_clients
+from v1.src.compiler import compile_graph
+from v1.src.handler import BaseHandler, IntentHandler, QaHandler, TextHandler
+from v1.src.session import Session
+
+DOCUMENTS = [{"page_content": "doc", "metadata": {"answer": "yes"}, "score": 0.9}]
+
+
+class FakeDecider(BaseHandler):
+    type = "decider"
+    show = False
+
+    def __init__(self, intent, labels=["help", "other"]) -> None:
+        super().__init__()
+        self.saving_keys = ["current_intent"]
+        self.intent = intent
+        self.labels = labels
+
+    async def execute(self, value=None, vars=None):
+        await aio.sleep(0.05)
+        return None, self.intent
+
+
+@pytest.fixture
+def kb_requests(monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        requests.append(payload)
+        answer = "from the kb" if payload["generate"] else None
+        return httpx.Response(200, json={**payload, "answer": answer, "documents": DOCUMENTS})
+
+    monkeypatch.setattr(http_clients, "transport", httpx.MockTransport(handler))
+    monkeypatch.setattr(http_clients, "clients", {})
+    return requests
+
+
+def build_graph(intent, help_label="help"):
+    graph = nx.DiGraph()
+    graph.add_node("start00000000", handler=TextHandler(text="hi"))
+    graph.add_node("decider", handler=FakeDecider(intent))
+    graph.add_node("help", handler=IntentHandler(label=help_label))
+    graph.add_node("other", handler=IntentHandler(label="other"))
+    graph.add_node("qa", handler=QaHandler(collection="faqs", question_text="{last_response}"))
+    graph.add_node("bye", handler=TextHandler(text="bye"))
+    graph.add_edges_from([
+        ("start00000000", "decider"),
+        ("decider", "help"),
+        ("decider", "other"),
+        ("help", "qa"),
+        ("other", "bye"),
+    ])
+    return graph
+
+
+def prefetches(outcome):
+    return REGISTRY.get_sample_value("chatbot_kb_prefetch_total", {"outcome": outcome}) or 0
+
+
+def test_decider_with_qa_branch_is_marked():
+    nodes = compile_graph(build_graph("help"))
+    assert nodes["decider"].prefetch == "qa"
+    assert nodes["decider"].prefetch_path == {"help"}
+    assert nodes["start00000000"].prefetch is None
+
+
+def test_branch_the_decider_never_takes_is_not_prefetched():
+    # The intent label has a trailing space, the decider emits "help"
+    nodes = compile_graph(build_graph("help", help_label="help "))
+    assert nodes["decider"].prefetch is None
+
+
+@pytest.mark.asyncio
+async def test_prefetched_documents_are_reused(kb_requests, websocket):
+    hits = prefetches("hit")
+    session = Session(graph=build_graph("help"))
+    await session.start_flow(websocket)
+
+    assert [request["generate"] for request in kb_requests] == [False, True]
+    assert kb_requests[0]["question"] == "hi"
+    assert kb_requests[1]["documents"] == DOCUMENTS
+    assert "from the kb" in [frame["text"] for frame in websocket.sent]
+    assert prefetches("hit") == hits + 1
+
+
+@pytest.mark.asyncio
+async def test_prefetch_is_discarded_on_other_branch(kb_requests, websocket):
+    misses = prefetches("miss")
+    session = Session(graph=build_graph("other"))
+    await session.start_flow(websocket)
+
+    assert [request["generate"] for request in kb_requests] == [False]
+    assert "bye" in [frame["text"] for frame in websocket.sent]
+    assert prefetches("miss") == misses + 1
+    assert session.prefetch is None
@@ -0,0 +1,125 @@
+import asyncio as aio
+
+import pytest
+
+from core.settings import settings
+
+from v1.src.history import HistoryRecord
+from v1.src.session import SessionManager
+from v1.src.timers import listen_timers
+from v1.src.store import MemorySessionStore, SQLiteSessionStore, create_session_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        store = MemorySessionStore()
+    else:
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    yield store
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_tracker_roundtrip(store):
+    tracker = {"current_node": "n1", "history": [{"user": "AI", "text": "hi"}]}
+    await store.save("s1", tracker)
+    assert await store.load("s1") == tracker
+    await store.delete("s1")
+    assert await store.load("s1") is None
+
+
+@pytest.mark.asyncio
+async def test_mailbox(store):
+    assert not await store.post_application_data("s1", {"sub": "a@b.c"})
+    await store.save("s1", {})
+    assert await store.post_application_data("s1", {"sub": "a@b.c"})
+    assert await store.pop_application_data("s1") == {"sub": "a@b.c"}
+    assert await store.pop_application_data("s1") is None
+
+
+@pytest.mark.asyncio
+async def test_application_data_routed_to_owner(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    owner = SessionManager(store=SQLiteSessionStore(path, worker_id="w1"))
+    other = SessionManager(store=SQLiteSessionStore(path, worker_id="w2"))
+    session = owner.create_session(session_id="s1")
+    session.init(240, 0)
+    await session.checkpoint()
+
+    await other.add_application_data("s1", {"sub": "a@b.c"})
+    assert session.tracker["application_data"] == {}
+    await session.receive_application_data()
+    assert session.tracker["application_data"] == {"sub": "a@b.c"}
+
+    with pytest.raises(KeyError):
+        await other.add_application_data("unknown", {})
+    owner.store.close()
+    other.store.close()
+
+
+def test_unknown_store():
+    with pytest.raises(ValueError):
+        create_session_store("redis")
+
+
+class SlowWebSocket:
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def receive_json(self):
+        await aio.sleep(self.delay)
+        return {"text": "hi"}
+
+
+@pytest.mark.asyncio
+async def test_idle_session_hibernates(monkeypatch):
+    monkeypatch.setattr(settings.store, "SESSION_HIBERNATE_AFTER_S", 0.01)
+    monkeypatch.setattr(listen_timers, "resolution", 0.005)
+    manager = SessionManager(store=MemorySessionStore())
+    session = manager.create_session(session_id="s1")
+    session.init(240, 0)
+    session.tracker["history"].append(HistoryRecord("m1", None, "AI", "hello"))
+    await session.checkpoint()
+
+    receive = aio.ensure_future(session.receive_message(SlowWebSocket(0.2), timeout=1))
+    await aio.sleep(0.1)
+    assert session.hibernated
+    assert session.tracker == {}
+    assert manager.get_stats() == {"resident": 0, "active": 0, "listening": 0, "hibernated": 1}
+    await manager.add_application_data("s1", {"sub": "a@b.c"})
+
+    assert await receive == {"text": "hi"}
+    assert not session.hibernated
+    assert session.tracker["history"] == [HistoryRecord("m1", None, "AI", "hello")]
+    assert manager.get_stats() == {"resident": 1, "active": 1, "listening": 0, "hibernated": 0}
+    await session.receive_application_data()
+    assert session.tracker["application_data"] == {"sub": "a@b.c"}
+
+
+@pytest.mark.asyncio
+async def test_hibernated_session_wakes_on_timeout(monkeypatch):
+    monkeypatch.setattr(settings.store, "SESSION_HIBERNATE_AFTER_S", 0.01)
+    monkeypatch.setattr(listen_timers, "resolution", 0.005)
+    session = SessionManager(store=MemorySessionStore()).create_session(session_id="s1")
+    session.init(240, 0)
+    with pytest.raises(aio.TimeoutError):
+        await session.receive_message(SlowWebSocket(1), timeout=0.05)
+    assert not session.hibernated
+    assert session.tracker["timeout_iters"] == 0
+
+
+@pytest.mark.asyncio
+async def test_lost_hibernated_session_ends(monkeypatch):
+    monkeypatch.setattr(settings.store, "SESSION_HIBERNATE_AFTER_S", 0.01)
+    monkeypatch.setattr(listen_timers, "resolution", 0.005)
+    store = MemorySessionStore()
+    session = SessionManager(store=store).create_session(session_id="s1")
+    session.init(240, 0)
+
+    async def lose(session_id):
+        return None
+
+    monkeypatch.setattr(store, "load", lose)
+    with pytest.raises(RuntimeError, match="lost while hibernated"):
+        await session.receive_message(SlowWebSocket(1), timeout=0.05)
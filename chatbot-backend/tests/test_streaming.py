@@ -0,0 +1,110 @@
+import json
+
+import httpx
+import pytest
+
+from core.settings import settings
+from v1.src.clients import http_clients
+from v1.src.compiler import CompiledNode
+from v1.src.handler import QaHandler, AIHandler, TextHandler
+from v1.src.session import Session
+
+
+def ndjson(*events):
+    return "".join(json.dumps(event) + "\n" for event in events)
+
+
+def kb_stream_fake(request: httpx.Request) -> httpx.Response:
+    if request.url.path.endswith("/generate/stream"):
+        body = ndjson(
+            {"type": "chunk", "text": "Hel"},
+            {"type": "chunk", "text": "lo"},
+            {"type": "end", "answer": "Hello"},
+        )
+    elif "broken" in request.url.path:
+        body = ndjson(
+            {"type": "documents", "documents": [{"page_content": "doc", "metadata": {}, "score": 0.9}]},
+            {"type": "chunk", "text": "from "},
+            {"type": "error", "detail": "model overloaded"},
+        )
+    elif "empty" in request.url.path:
+        body = ndjson({"type": "documents", "documents": []})
+    else:
+        body = ndjson(
+            {"type": "documents", "documents": [{"page_content": "doc", "metadata": {}, "score": 0.9}]},
+            {"type": "chunk", "text": "from "},
+            {"type": "chunk", "text": "the kb"},
+            {"type": "end", "answer": "from the kb"},
+        )
+    return httpx.Response(200, text=body, headers={"content-type": "application/x-ndjson"})
+
+
+@pytest.fixture
+def fake_kb(monkeypatch):
+    monkeypatch.setattr(http_clients, "transport", httpx.MockTransport(kb_stream_fake))
+    monkeypatch.setattr(http_clients, "clients", {})
+
+
+@pytest.mark.asyncio
+async def test_ai_handler_streams_chunks(fake_kb):
+    chunks = []
+
+    async def on_chunk(chunk):
+        chunks.append(chunk)
+
+    handler = AIHandler(instruction="{last_utterance}", system_message="be nice")
+    text, intent = await handler.stream(None, {"last_utterance": "hi"}, on_chunk)
+    assert chunks == ["Hel", "lo"]
+    assert text == "Hello"
+    assert intent == "success"
+
+
+@pytest.mark.asyncio
+async def test_qa_handler_stream_without_documents(fake_kb):
+    chunks = []
+
+    async def on_chunk(chunk):
+        chunks.append(chunk)
+
+    handler = QaHandler(collection="empty", if_fail="no idea")
+    text, intent = await handler.stream(None, {"last_utterance": "hi"}, on_chunk)
+    assert chunks == []
+    assert text == "no idea"
+    assert intent == "success"
+
+
+@pytest.mark.asyncio
+async def test_session_forwards_chunks(fake_kb, monkeypatch, websocket):
+    monkeypatch.setattr(settings.kb, "CHATBOT_KB_STREAMING", True)
+    handler = QaHandler()
+    session = Session(nodes={"qa": CompiledNode(id="qa", handler=handler)})
+    session.init(240, 0)
+    await session.handle_other_node(websocket, ["last_response"], True, None, True, "qa")
+
+    chunks = [frame for frame in websocket.sent if frame["user"] == "ai_chunk"]
+    final = websocket.sent[-1]
+    assert [frame["text"] for frame in chunks] == ["from ", "the kb"]
+    assert final["user"] == "AI"
+    assert final["text"] == "from the kb"
+    assert all(frame["messageID"] == final["messageID"] for frame in chunks)
+    assert [message.user for message in session.tracker["history"]] == ["AI"]
+    assert session.tracker["last_response"] == "from the kb"
+
+
+@pytest.mark.asyncio
+async def test_failed_stream_is_aborted(fake_kb, monkeypatch, websocket):
+    monkeypatch.setattr(settings.kb, "CHATBOT_KB_STREAMING", True)
+    handler = QaHandler(collection="broken")
+    session = Session(nodes={"qa": CompiledNode(id="qa", handler=handler)})
+    session.init(240, 0)
+    await session.handle_other_node(websocket, ["last_response"], True, None, True, "qa")
+
+    assert [frame["user"] for frame in websocket.sent] == ["ai_chunk", "ai_abort"]
+    assert websocket.sent[0]["messageID"] == websocket.sent[1]["messageID"]
+    assert session.tracker["history"] == []
+
+
+def test_only_shown_answers_stream():
+    assert CompiledNode(id="qa", handler=QaHandler()).streaming
+    assert not CompiledNode(id="ai", handler=AIHandler(instruction="", system_message="", show=False)).streaming
+    assert not CompiledNode(id="text", handler=TextHandler(text="hi")).streaming
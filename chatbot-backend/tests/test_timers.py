@@ -0,0 +1,52 @@
+import asyncio as aio
+
+import pytest
+
+from v1.src.timers import Timer, TimerWheel
+
+
+@pytest.mark.parametrize("deadline", [1, 3, 4, 5, 15, 16, 17, 40, 63, 64, 100])
+def test_timers_fire_on_their_tick(deadline):
+    # 4 slots and 2 levels cover 16 ticks, later deadlines go through the overflow
+    wheel = TimerWheel(resolution=1, slots=4, levels=2)
+    fired_at = []
+    timer = Timer(deadline, lambda: fired_at.append(wheel.current_tick))
+    wheel.insert(timer)
+    for _ in range(deadline + 20):
+        wheel.fire(wheel.advance())
+    assert fired_at == [deadline]
+    assert timer.fired
+    assert len(wheel) == 0
+
+
+def test_cancelled_timers_never_fire():
+    wheel = TimerWheel(resolution=1, slots=4, levels=2)
+    fired = []
+    timers = [Timer(deadline, lambda deadline=deadline: fired.append(deadline)) for deadline in (2, 9, 30)]
+    for timer in timers:
+        wheel.insert(timer)
+    timers[1].cancel()
+    for _ in range(40):
+        wheel.fire(wheel.advance())
+    assert fired == [2, 30]
+
+
+def test_expired_timers_fire_in_one_batch():
+    wheel = TimerWheel(resolution=1, slots=4, levels=2)
+    for _ in range(100):
+        wheel.insert(Timer(6, lambda: None))
+    expired = set()
+    for _ in range(6):
+        expired = wheel.advance()
+    assert len(expired) == 100
+
+
+@pytest.mark.asyncio
+async def test_schedule_on_the_loop():
+    wheel = TimerWheel(resolution=0.01)
+    done = aio.Event()
+    wheel.schedule(0.03, done.set)
+    cancelled = wheel.schedule(0.03, lambda: pytest.fail("cancelled timer fired"))
+    cancelled.cancel()
+    await aio.wait_for(done.wait(), timeout=1)
+    await wheel.shutdown()
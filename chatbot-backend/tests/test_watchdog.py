@@ -0,0 +1,50 @@
+import asyncio as aio
+import time
+
+import pytest
+
+from v1.src.compiler import CompiledNode
+from v1.src.handler import BaseHandler
+from v1.src.session import Session
+from v1.src.watchdog import LoopWatchdog
+
+
+class BlockingHandler(BaseHandler):
+    type = "blocking"
+    show = False
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.saving_keys = ["last_response"]
+
+    def execute(self, value=None, vars=None):
+        time.sleep(0.3)
+        return None, None
+
+
+@pytest.mark.asyncio
+async def test_blocking_node_is_reported():
+    watchdog = LoopWatchdog(threshold_ms=100, interval_ms=10)
+    watchdog.start()
+    await aio.sleep(0.05)
+    session = Session(nodes={"slow-node": CompiledNode(id="slow-node", handler=BlockingHandler())})
+    session.init(240, 0)
+    await session.execute(value=None, keys=["last_response"], current_node="slow-node")
+    await aio.sleep(0.05)
+    await watchdog.shutdown()
+
+    assert len(watchdog.stalls) == 1
+    stall = watchdog.stalls[0]
+    assert stall["node_id"] == "slow-node"
+    assert stall["handler"] == "BlockingHandler"
+    assert stall["stalled_ms"] >= 100
+    assert any("time.sleep" in line for line in stall["stack"])
+
+
+@pytest.mark.asyncio
+async def test_idle_loop_is_not_reported():
+    watchdog = LoopWatchdog(threshold_ms=100, interval_ms=10)
+    watchdog.start()
+    await aio.sleep(0.2)
+    await watchdog.shutdown()
+    assert len(watchdog.stalls) == 0
@@ -0,0 +1,97 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio as aio
+
+from core.settings import settings
+from v1.models.intent_classifier import PredictionCache, predict_batch, prediction_cache
+from v1.src.logger import logger
+
+
+class IntentBatcher:
+    """
+    Micro-batching front end for the intent classifier.
+
+    Decider nodes of concurrent sessions submit (text, labels) requests; a single
+    worker task gathers whatever arrives within `max_wait_ms` (up to
+    `max_batch_size` requests), runs them as one padded forward pass on a
+    dedicated inference thread and resolves each caller's future. The event loop
+    only ever waits on futures, never on the model. Utterances already in the
+    prediction cache are answered directly without queueing.
+    """
+    def __init__(
+        self,
+        predict_batch: Callable[[List[Tuple[str, List[str]]]], List[Dict]],
+        max_batch_size: int = settings.intent.INTENT_BATCH_MAX_SIZE,
+        max_wait_ms: float = settings.intent.INTENT_BATCH_MAX_WAIT_MS,
+        cache: Optional[PredictionCache] = None,
+        ) -> None:
+        self.predict_batch = predict_batch
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="intent-classifier")
+        self.queue: Optional[aio.Queue] = None
+        self.worker: Optional[aio.Task] = None
+        self.loop: Optional[aio.AbstractEventLoop] = None
+
+    def ensure_started(self):
+        loop = aio.get_running_loop()
+        if self.worker is not None and not self.worker.done() and self.loop is loop:
+            return
+        self.loop = loop
+        self.queue = aio.Queue()
+        self.worker = loop.create_task(self.run())
+
+    async def predict(self, text: str, labels: List[str], check_cache: bool = True) -> Dict:
+        if self.cache is not None and check_cache:
+            cached = self.cache.get(text, labels)
+            if cached is not None:
+                return cached
+        self.ensure_started()
+        future = self.loop.create_future()
+        self.queue.put_nowait((text, list(labels), future))
+        return await future
+
+    def drain(self, batch: List):
+        while len(batch) < self.max_batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            self.drain(batch)
+            if len(batch) < self.max_batch_size and self.max_wait > 0:
+                await aio.sleep(self.max_wait)
+                self.drain(batch)
+            await self.process(batch)
+
+    async def process(self, batch: List):
+        # Callers that went away (websocket closed) don't need a slot in the batch
+        batch = [item for item in batch if not item[2].done()]
+        if not batch:
+            return
+        requests = [(text, labels) for text, labels, _ in batch]
+        try:
+            results = await self.loop.run_in_executor(self.executor, self.predict_batch, requests)
+        except Exception as e:
+            logger.error(f"Intent batch of {len(batch)} failed: {e}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def shutdown(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except (aio.CancelledError, RuntimeError):
+                pass
+            self.worker = None
+        self.executor.shutdown(wait=False)
+
+
+intent_batcher = IntentBatcher(predict_batch, cache=prediction_cache)
@@ -0,0 +1,180 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import asyncio as aio
+import threading
+
+import numpy as np
+
+from core.settings import settings
+from v1.models.intent_batcher import IntentBatcher, intent_batcher
+from v1.models.intent_classifier import PredictionCache, prediction_cache, is_ready, warmup
+from v1.src.logger import logger
+
+
+class EmbeddingClassifier:
+    """
+    Scores labels by cosine similarity between sentence embeddings.
+
+    Each label is represented by its own text plus optional example utterances
+    (prototypes); a label's score is its best prototype similarity. Prototype
+    embeddings are computed once and cached, so classifying an utterance costs a
+    single forward pass of a small bi-encoder. The model is loaded on first use.
+    """
+    def __init__(self, model_name: str = settings.intent.INTENT_EMBEDDING_MODEL) -> None:
+        self.model_name = model_name
+        self.tokenizer = None
+        self.model = None
+        self.lock = threading.Lock()
+        self.prototype_embeddings: Dict[Tuple[str, Tuple[str, ...]], np.ndarray] = {}
+
+    def load(self):
+        with self.lock:
+            if self.model is not None:
+                return
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+
+            self.torch = torch
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            model = AutoModel.from_pretrained(self.model_name)
+            model.eval()
+            self.model = model
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        self.load()
+        inputs = self.tokenizer(texts, padding=True, truncation=True, return_tensors="pt")
+        with self.torch.no_grad():
+            hidden = self.model(**inputs).last_hidden_state
+        # Mean pooling over real tokens, then L2 normalisation so dot = cosine
+        mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+        pooled = self.torch.nn.functional.normalize(pooled, dim=-1)
+        return pooled.numpy()
+
+    def label_embeddings(self, label: str, prototypes: Tuple[str, ...] = ()) -> np.ndarray:
+        key = (label, prototypes)
+        embeddings = self.prototype_embeddings.get(key)
+        if embeddings is None:
+            embeddings = self.embed([label, *prototypes])
+            self.prototype_embeddings[key] = embeddings
+        return embeddings
+
+    def warmup(self):
+        self.embed(["hello"])
+
+    def classify(self, text: str, labels: List[str], prototypes: Optional[Dict[str, List[str]]] = None) -> Dict:
+        prototypes = prototypes or {}
+        utterance = self.embed([text])[0]
+        scores = [
+            float((self.label_embeddings(label, tuple(prototypes.get(label, []))) @ utterance).max())
+            for label in labels
+        ]
+        order = sorted(range(len(labels)), key=lambda i: scores[i], reverse=True)
+        return {
+            "sequence": text,
+            "labels": [labels[i] for i in order],
+            "scores": [scores[i] for i in order],
+        }
+
+
+class CascadeClassifier:
+    """
+    Two-tier intent classifier used by decider nodes.
+
+    Cached predictions are returned first. Otherwise a sentence-embedding model
+    answers directly when the top label is both similar enough (`min_score`) and
+    clearly ahead of the runner-up (`margin`); ambiguous utterances fall through
+    to the NLI cross-encoder via the micro-batcher. Every result carries a
+    "tier" key ("cache", "embedding" or "nli") saying which tier answered.
+    """
+    def __init__(
+        self,
+        embedder: EmbeddingClassifier,
+        batcher: IntentBatcher,
+        cache: Optional[PredictionCache] = None,
+        enabled: bool = settings.intent.INTENT_CASCADE_ENABLED,
+        margin: float = settings.intent.INTENT_EMBEDDING_MARGIN,
+        min_score: float = settings.intent.INTENT_EMBEDDING_MIN_SCORE,
+        warmup_backoff_s: float = settings.intent.INTENT_WARMUP_BACKOFF_S,
+        warmup_backoff_max_s: float = settings.intent.INTENT_WARMUP_BACKOFF_MAX_S,
+        ) -> None:
+        self.embedder = embedder
+        self.batcher = batcher
+        self.cache = cache
+        self.enabled = enabled
+        self.margin = margin
+        self.min_score = min_score
+        self.warmup_backoff = warmup_backoff_s
+        self.warmup_backoff_max = warmup_backoff_max_s
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="intent-embedding")
+        self.tier_counts = {"cache": 0, "embedding": 0, "nli": 0}
+        self.embedder_ready = not enabled
+
+    def answer(self, result: Dict, tier: str) -> Dict:
+        self.tier_counts[tier] += 1
+        result["tier"] = tier
+        return result
+
+    async def classify(
+        self,
+        text: str,
+        labels: List[str],
+        margin: Optional[float] = None,
+        min_score: Optional[float] = None,
+        prototypes: Optional[Dict[str, List[str]]] = None,
+        ) -> Dict:
+        if self.cache is not None:
+            cached = self.cache.get(text, labels)
+            if cached is not None:
+                return self.answer(cached, "cache")
+
+        if self.enabled and len(labels) > 1:
+            margin = self.margin if margin is None else margin
+            min_score = self.min_score if min_score is None else min_score
+            loop = aio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(
+                    self.executor, self.embedder.classify, text, labels, prototypes
+                )
+            except Exception as e:
+                logger.error(f"Embedding tier failed, falling back to NLI: {e}")
+            else:
+                top, runner_up = result["scores"][0], result["scores"][1]
+                if top >= min_score and top - runner_up >= margin:
+                    return self.answer(result, "embedding")
+
+        result = await self.batcher.predict(text, labels, check_cache=False)
+        return self.answer(dict(result), "nli")
+
+    async def warmup(self):
+        """
+        Loads every tier's model on the thread that will run it, with a dummy
+        inference each. Meant to run as a background task at startup; failures
+        are retried with exponential backoff until every tier is ready, so a
+        transient error doesn't leave the worker unready for good.
+        """
+        loop = aio.get_running_loop()
+        attempt = 0
+        while True:
+            try:
+                if not is_ready():
+                    await loop.run_in_executor(self.batcher.executor, warmup)
+                if not self.embedder_ready:
+                    await loop.run_in_executor(self.executor, self.embedder.warmup)
+                    self.embedder_ready = True
+                break
+            except Exception as e:
+                backoff = min(self.warmup_backoff_max, self.warmup_backoff * 2 ** attempt)
+                logger.error(f"Intent classifier warm-up failed (attempt {attempt + 1}), retrying in {backoff:.1f}s: {e}")
+                attempt += 1
+                await aio.sleep(backoff)
+        logger.info("Intent classifier ready")
+
+    def is_ready(self) -> bool:
+        return is_ready() and self.embedder_ready
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+intent_cascade = CascadeClassifier(EmbeddingClassifier(), intent_batcher, cache=prediction_cache)
@@ -1,12 +1,288 @@
-from transformers import pipeline
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import numpy as np
+import threading
+import time
 
-#loads the model in memory
-INTENT_CLASSIFIER = pipeline("zero-shot-classification", model="MoritzLaurer/DeBERTa-v3-base-mnli-fever-anli", from_pt=True)
+from core.settings import settings
+
+MODEL_NAME = "MoritzLaurer/DeBERTa-v3-base-mnli-fever-anli"
+
+# Same template the zero-shot pipeline uses to turn a label into an NLI hypothesis
+HYPOTHESIS_TEMPLATE = "This example is {}."
+
+
+def get_entailment_id(config) -> int:
+    for label, label_id in config.label2id.items():
+        if label.lower().startswith("entail"):
+            return label_id
+    return -1
+
+
+def get_nli_ids(config) -> List[int]:
+    # Columns of the [contradiction, entailment] logits, picked like the pipeline does
+    entailment_id = get_entailment_id(config)
+    contradiction_id = -1 if entailment_id == 0 else 0
+    return [contradiction_id, entailment_id]
+
+
+class TorchNLIBackend:
+    """Runs the NLI cross-encoder with PyTorch."""
+    name = "torch"
+
+    def __init__(self, model_name: str = MODEL_NAME) -> None:
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        self.model.eval()
+        self.nli_ids = get_nli_ids(self.model.config)
+
+    def nli_logits(self, premises: List[str], hypotheses: List[str]) -> np.ndarray:
+        # One [contradiction, entailment] row per pair
+        inputs = self.tokenizer(
+            premises,
+            hypotheses,
+            padding=True,
+            truncation="only_first",
+            return_tensors="pt",
+        )
+        with self.torch.no_grad():
+            logits = self.model(**inputs).logits
+        return logits[:, self.nli_ids].numpy()
+
+
+class OnnxNLIBackend:
+    """
+    Runs an exported, int8 dynamically quantized copy of the NLI model through
+    ONNX Runtime (see scripts/export_intent_onnx.py). The model directory holds
+    the .onnx file next to the tokenizer and config saved at export time.
+    """
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_dir: str = settings.intent.INTENT_ONNX_MODEL_DIR,
+        model_file: str = settings.intent.INTENT_ONNX_MODEL_FILE,
+        intra_op_threads: int = settings.intent.INTENT_ONNX_INTRA_OP_THREADS,
+        ) -> None:
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # One batch runs at a time on the inference thread, so all cores go to
+        # intra-op parallelism; 0 lets ONNX Runtime use the physical core count
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            str(Path(model_dir) / model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.nli_ids = get_nli_ids(AutoConfig.from_pretrained(model_dir))
+
+    def nli_logits(self, premises: List[str], hypotheses: List[str]) -> np.ndarray:
+        # One [contradiction, entailment] row per pair
+        inputs = self.tokenizer(
+            premises,
+            hypotheses,
+            padding=True,
+            truncation="only_first",
+            return_tensors="np",
+        )
+        feed = {name: value.astype(np.int64) for name, value in inputs.items() if name in self.input_names}
+        logits = self.session.run(["logits"], feed)[0]
+        return logits[:, self.nli_ids]
+
+
+def load_backend(name: str = settings.intent.INTENT_BACKEND):
+    if name == "onnx":
+        return OnnxNLIBackend()
+    if name == "torch":
+        return TorchNLIBackend()
+    raise ValueError("INTENT_BACKEND must be torch or onnx")
+
+
+# The model is loaded by `warmup` (app startup) or on first use, so importing
+# the backend packages doesn't pull in torch and the model weights
+NLI_BACKEND = None
+BACKEND_LOCK = threading.Lock()
+READY = threading.Event()
+
+
+def get_backend():
+    global NLI_BACKEND
+    if NLI_BACKEND is None:
+        with BACKEND_LOCK:
+            if NLI_BACKEND is None:
+                NLI_BACKEND = load_backend()
+    return NLI_BACKEND
+
+
+def warmup():
+    """
+    Loads the NLI model and runs a dummy inference so weights are paged in and
+    kernels/buffers allocated before the first user request. Marks the
+    classifier as ready when done.
+    """
+    backend = get_backend()
+    backend.nli_logits(["hello"] * 2, [HYPOTHESIS_TEMPLATE.format("greeting"), HYPOTHESIS_TEMPLATE.format("goodbye")])
+    READY.set()
+
+
+def is_ready() -> bool:
+    return READY.is_set()
+
+
+class PredictionCache:
+    """
+    Bounded, thread-safe LRU cache of zero-shot predictions.
+
+    Keys are the normalised utterance plus the frozenset of candidate labels, so
+    "Yes!" and "yes" asked with ["no", "yes"] or ["yes", "no"] share an entry.
+    Entries expire after `ttl` seconds; `max_size` of 0 disables the cache.
+    """
+    def __init__(self, max_size: int = 4096, ttl: float = 3600) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalise(text: str) -> str:
+        return " ".join(str(text).lower().split()).strip(" .,!?")
+
+    def key(self, text: str, labels: List[str]) -> Tuple[str, FrozenSet[str]]:
+        return self.normalise(text), frozenset(labels)
+
+    def get(self, text: str, labels: List[str], record: bool = True) -> Optional[Dict]:
+        if self.max_size <= 0:
+            return None
+        key = self.key(text, labels)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += record
+                return None
+            self.entries.move_to_end(key)
+            self.hits += record
+        result = entry[1]
+        return {"sequence": text, "labels": list(result["labels"]), "scores": list(result["scores"])}
+
+    def set(self, text: str, labels: List[str], result: Dict):
+        if self.max_size <= 0:
+            return
+        key = self.key(text, labels)
+        value = {"labels": tuple(result["labels"]), "scores": tuple(result["scores"])}
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.entries),
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+prediction_cache = PredictionCache(
+    max_size=settings.intent.INTENT_CACHE_MAX_SIZE,
+    ttl=settings.intent.INTENT_CACHE_TTL_S,
+)
 
 
 def predict(text,labels):
-    
-    output = INTENT_CLASSIFIER(text,labels, multi_label=False)
-    return output
\ No newline at end of file
+    output = prediction_cache.get(text, labels)
+    if output is not None:
+        return output
+    return predict_batch([(text, labels)])[0]
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    exp = np.exp(logits - logits.max())
+    return exp / exp.sum()
+
+
+def predict_batch(requests: List[Tuple[str, List[str]]], backend=None) -> List[Dict]:
+    """
+    Classifies several utterances, each with its own label set, in one forward pass.
+
+    Every (utterance, hypothesis) pair of every request is tokenized into a single
+    padded batch. Scores are the softmax of the entailment logits over each
+    request's labels; a single label is scored entailment against contradiction
+    instead, as the zero-shot pipeline does with `multi_label=False`.
+    Cached predictions are reused and identical requests are only run once.
+
+    Args:
+        requests: List of (text, labels) tuples.
+        backend: NLI backend to run, defaults to the one selected by INTENT_BACKEND.
+
+    Returns:
+        List of {"sequence", "labels", "scores"} dicts in request order, labels
+        sorted by descending score.
+    """
+    outputs: List[Optional[Dict]] = [None] * len(requests)
+    pending: Dict[Tuple[str, FrozenSet[str]], List[int]] = {}
+    for index, (text, labels) in enumerate(requests):
+        # The batcher already counted these lookups
+        cached = prediction_cache.get(text, labels, record=False)
+        if cached is not None:
+            outputs[index] = cached
+        else:
+            pending.setdefault(prediction_cache.key(text, labels), []).append(index)
+    if not pending:
+        return outputs
+
+    to_run = [requests[indexes[0]] for indexes in pending.values()]
+    premises = []
+    hypotheses = []
+    for text, labels in to_run:
+        for label in labels:
+            premises.append(text)
+            hypotheses.append(HYPOTHESIS_TEMPLATE.format(label))
+
+    backend = backend or get_backend()
+    nli_logits = backend.nli_logits(premises, hypotheses)
+
+    offset = 0
+    for (text, labels), indexes in zip(to_run, pending.values()):
+        num_labels = len(labels)
+        if num_labels == 1:
+            # Softmax over one label is always 1, the label could never fail
+            scores = [float(softmax(nli_logits[offset])[1])]
+        else:
+            scores = softmax(nli_logits[offset:offset + num_labels, 1]).tolist()
+        offset += num_labels
+        order = sorted(range(num_labels), key=lambda i: scores[i], reverse=True)
+        result = {
+            "sequence": text,
+            "labels": [labels[i] for i in order],
+            "scores": [scores[i] for i in order],
+        }
+        prediction_cache.set(text, labels, result)
+        for index in indexes:
+            outputs[index] = dict(result, sequence=requests[index][0])
+    return outputs
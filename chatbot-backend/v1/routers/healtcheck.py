@@ -1,10 +1,12 @@
 
 
 from fastapi import APIRouter,status
+from fastapi.responses import JSONResponse
 
 # Import the Ticket model and Workflow model from core.models.models
 from core.models.health_check_model import HealthCheck
 # Import the settings from the core.settings module
+from v1.models.intent_cascade import intent_cascade
 
 
 # Import the get_client dependency from utils
@@ -36,4 +38,30 @@ def get_health() -> HealthCheck:
     Returns:
         HealthCheck: Returns a JSON response with the health status
     """
-    return HealthCheck(status="OK")
\ No newline at end of file
+    return HealthCheck(status="OK")
+
+
+@router.get(
+    "/ready",
+    summary="Perform a Readiness Check",
+    response_description="Return HTTP Status Code 200 (OK) once the models are loaded",
+    status_code=status.HTTP_200_OK,
+    response_model=HealthCheck,
+    responses={503: {"model": HealthCheck}},
+)
+def get_ready() -> HealthCheck:
+    """
+    ## Perform a Readiness Check
+    Endpoint to check whether the service can take traffic. The intent classifier is
+    loaded and warmed up in the background at startup; until that finishes this
+    endpoint returns 503 (Service Unavailable) so orchestrators keep the container out
+    of rotation while `/health` already reports the process as alive.
+    Returns:
+        HealthCheck: Returns a JSON response with the readiness status
+    """
+    if not intent_cascade.is_ready():
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content=HealthCheck(status="LOADING").model_dump(),
+        )
+    return HealthCheck(status="OK")
@@ -1,9 +1,11 @@
 
-from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, Request
-from core.models.graph_model import Root
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
+from typing import Any, Dict, List, Optional
+from core.models.graph_model import FlowReport, Root
 # Import the settings from the core.settings module
 from core.settings import settings
+from v1.src.flows import Flow, flow_cache, flow_registry
+from v1.src.analysis import analyze_flow
 import json
 import os
 import tempfile
@@ -17,34 +19,74 @@ router = APIRouter(
     responses={404: {"description": "Not found"}}
 )
 
-@router.post("/publish")
+def check_origin(origin: Optional[str]):
+    # The editor works on the flow of a registered origin, or the default flow
+    if origin is not None and origin not in flow_registry.get_origins():
+        raise HTTPException(status_code=404, detail=f"Origin {origin} is not in the flow registry")
+
+
+@router.post("/publish", response_model=FlowReport)
 def create_production(
     request:Root,
+    origin: Optional[str] = None,
     ): 
+    check_origin(origin)
+    file = flow_registry.get_file(origin)
+    # Flows that would break or hang sessions are not published, the editor
+    # shows the report
+    report = analyze_flow(request)
+    if report.errors:
+        raise HTTPException(status_code=422, detail=report.model_dump())
 
     try:
-        # Inserting the data into the collection
-        # TODO set ENV variables for paths
-        json_path = str(Path(__file__).parent.parent / 'src/flows/flow_production.json')
-        if os.path.exists(json_path):
-            os.remove(json_path)
-        flow = request.model_dump_json(indent=4)
-        with tempfile.NamedTemporaryFile(mode='w', delete=False) as temp_file:
+        json_path = Flow.get_path(file)
+        # The temporary file lives next to the target so os.replace is an atomic
+        # rename: running sessions and new connections never see a partial file
+        with tempfile.NamedTemporaryFile(mode='w', delete=False, dir=os.path.dirname(json_path)) as temp_file:
                 flow = request.model_dump_json(indent=4 , by_alias=True)
                 temp_file.write(flow)
 
             # Replace the original file with the temporary one
         os.replace(temp_file.name, json_path)
+        flow_cache.invalidate(file)
+        # Compiles the new flow once and writes its artifact for the other workers
+        flow_cache.get(file)
     except Exception as e:
         print(e)
         print("Couldn't Save Flow")
         raise HTTPException(status_code=500, detail="Internal Server Error")
+    return report
             
+@router.post("/warmup")
+def warmup(origins: Optional[List[str]] = Body(default=None)) -> Dict[str, Any]:
+    """
+    Compiles the flows of `origins`, every registered origin by default, before
+    traffic reaches them. Each worker has its own cache; the artifacts written
+    here make the first load in the other workers cheap.
+    """
+    if origins is None:
+        origins = flow_registry.get_origins()
+    flows = {}
+    for origin in origins:
+        file = flow_registry.get_file(origin)
+        try:
+            flow = flow_cache.get(file)
+        except Exception as e:
+            flows[origin] = {"file": file, "error": str(e)}
+            continue
+        flows[origin] = {"file": file, "nodes": len(flow.nodes), "size": flow.size}
+    return {"flows": flows, "cache_size": flow_cache.get_size()}
+
+
 @router.get("/fetch/{type}")
-def get_latest(type:str = "prod"):
-    file = "flow_production.json" if type == "prod" else "flow_latest.json"
-    
-    json_path = str(Path(__file__).parent.parent / 'src/flows/{file}'.format(file=file))
+def get_latest(type:str = "prod", origin: Optional[str] = None):
+    check_origin(origin)
+    json_path = Flow.get_path(flow_registry.get_file(origin))
+    if type != "prod":
+        draft_path = Flow.get_path(flow_registry.get_draft_file(origin))
+        # An origin without autosaves yet starts from its published flow
+        if os.path.exists(draft_path):
+            json_path = draft_path
     with open(json_path, 'r') as f:
         data = f.read()
     data = json.loads(data)
@@ -52,17 +94,14 @@ def get_latest(type:str = "prod"):
     return workflow
 
 
-@router.post("/autosave")
-def autosave(request: Root):
+@router.post("/autosave", response_model=FlowReport)
+def autosave(request: Root, origin: Optional[str] = None):
+    check_origin(origin)
+    # Work in progress is always saved, the report only informs the editor
+    report = analyze_flow(request)
     try:
-        # Inserting the data into the collection
-        # TODO set ENV variables for paths
-        json_path = str(Path(__file__).parent.parent / 'src/flows/flow_latest.json')
-        if os.path.exists(json_path):
-            os.remove(json_path)
-            
-        flow = request.model_dump_json(indent=4)
-        with tempfile.NamedTemporaryFile(mode='w', delete=False) as temp_file:
+        json_path = Flow.get_path(flow_registry.get_draft_file(origin))
+        with tempfile.NamedTemporaryFile(mode='w', delete=False, dir=os.path.dirname(json_path)) as temp_file:
                 flow = request.model_dump_json(indent=4, by_alias=True)
                 temp_file.write(flow)
 
@@ -72,3 +111,4 @@ def autosave(request: Root):
         print(e)
         print("Couldn't Save Flow")
         raise HTTPException(status_code=500, detail="Internal Server Error")
+    return report
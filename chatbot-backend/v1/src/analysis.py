@@ -0,0 +1,143 @@
+from typing import Dict, List, Optional, Tuple
+import networkx as nx
+
+from core.models.graph_model import FlowIssue, FlowReport, Root
+from v1.src.compiler import compile_graph
+from v1.src.flows import Flow
+from v1.src.node import Node
+
+
+def add_issue(issues: List[FlowIssue], code: str, message: str, nodes: Optional[List[str]] = None):
+    issues.append(FlowIssue(code=code, message=message, nodes=nodes or []))
+
+
+def parse_flow(workflow: Root, report: FlowReport) -> Optional[Tuple[List[Node], str]]:
+    # Returns the parsed nodes and the drawflow id of the start node
+    home = workflow.drawflow.get("Home")
+    if home is None:
+        add_issue(report.errors, "missing_home", "The flow has no Home module")
+        return None
+    node_dict = home.model_dump(by_alias=True)["data"]
+    nodes = []
+    for node in node_dict.values():
+        try:
+            nodes.append(Flow.parse_node(node))
+        except Exception as e:
+            add_issue(report.errors, "invalid_node", f"{node['class']} can't be built: {e!r}", [str(node["id"])])
+    if report.errors:
+        return None
+
+    starts = [node for node in node_dict.values() if node["class"] == "startNode"]
+    if len(starts) != 1:
+        add_issue(report.errors, "missing_start", f"The flow needs exactly one start node, found {len(starts)}")
+        return None
+    # The start node is renamed when parsed, the other nodes still use its drawflow id
+    start_id = str(starts[0]["id"])
+    aliases = {start_id: "start00000000"}
+    ids = {node.id for node in nodes}
+    for node in nodes:
+        for edges in (node.children, node.parents):
+            edges[:] = [aliases.get(str(other), str(other)) for other in edges]
+            for other in [other for other in edges if other not in ids]:
+                add_issue(report.errors, "dangling_edge", f"Connected to node {other}, which is not in the flow", [node.id])
+                edges.remove(other)
+    return nodes, start_id
+
+
+def use_drawflow_ids(report: FlowReport, start_id: str):
+    # Issues point at the start node by the id the editor shows
+    for issue in [*report.errors, *report.warnings]:
+        issue.nodes = [start_id if node_id == "start00000000" else node_id for node_id in issue.nodes]
+        issue.message = issue.message.replace("start00000000", start_id)
+
+
+def check_outputs(graph: nx.DiGraph, report: FlowReport):
+    for node_id, attrs in graph.nodes(data=True):
+        if attrs["type"] != "endNode" and graph.out_degree(node_id) == 0:
+            add_issue(
+                report.warnings,
+                "dangling_output",
+                "The conversation stops here without reaching an end node",
+                [node_id],
+            )
+
+
+def check_reachable(graph: nx.DiGraph, report: FlowReport):
+    reachable = nx.descendants(graph, "start00000000") | {"start00000000"}
+    unreachable = sorted(node_id for node_id in graph.nodes if node_id not in reachable)
+    for node_id in unreachable:
+        add_issue(report.warnings, "unreachable", "No path from the start node leads here", [node_id])
+
+
+def check_intents(nodes: Dict, report: FlowReport):
+    # Deciders answer with one of their labels or "fail", a label without a
+    # branch ends the session
+    for node in nodes.values():
+        if node.type != "decider":
+            continue
+        transitions = node.transitions or {}
+        for label in [*node.handler.labels, "fail"]:
+            if label in transitions:
+                continue
+            similar = [other for other in transitions if other.strip().lower() == label.strip().lower()]
+            hint = f", a branch is labelled {similar[0]!r}" if similar else ""
+            add_issue(report.errors, "missing_intent_branch", f"No branch for intent {label!r}{hint}", [node.id])
+        for label, child in transitions.items():
+            if label not in node.handler.labels and label != "fail":
+                add_issue(
+                    report.warnings,
+                    "unused_intent_branch",
+                    f"The decider never answers {label!r}, this branch is never taken",
+                    [node.id, child],
+                )
+
+
+def check_cycles(graph: nx.DiGraph, report: FlowReport):
+    # A cycle with no listen node runs without waiting for the user; without a
+    # way out it spins forever
+    busy = graph.subgraph(node_id for node_id, attrs in graph.nodes(data=True) if attrs["type"] != "listenerNode")
+    for component in nx.strongly_connected_components(busy):
+        node_id = next(iter(component))
+        if len(component) == 1 and not busy.has_edge(node_id, node_id):
+            continue
+        cycle = sorted(component)
+        exits = any(child not in component for member in component for child in graph.neighbors(member))
+        if exits:
+            add_issue(
+                report.warnings,
+                "cycle_without_listen",
+                "These nodes loop without waiting for the user, make sure a condition always leaves the loop",
+                cycle,
+            )
+        else:
+            add_issue(report.errors, "endless_cycle", "These nodes loop forever without waiting for the user", cycle)
+
+
+def analyze_flow(workflow: Root) -> FlowReport:
+    """
+    Checks a flow before it is published.
+
+    Errors make sessions fail or hang: nodes that can't be built, connections
+    to missing nodes, decider intents without a branch, loops that never wait
+    for the user nor leave. Warnings point at nodes that are never reached,
+    conversations that stop without an end node and loops without a listen
+    node that depend on a condition to stop.
+    """
+    report = FlowReport()
+    parsed = parse_flow(workflow, report)
+    if parsed is None:
+        return report
+    nodes, start_id = parsed
+    graph = Flow.create_graph(nodes)
+    try:
+        compiled = compile_graph(graph)
+    except ValueError as e:
+        add_issue(report.errors, "invalid_branches", str(e))
+        use_drawflow_ids(report, start_id)
+        return report
+    check_reachable(graph, report)
+    check_outputs(graph, report)
+    check_intents(compiled, report)
+    check_cycles(graph, report)
+    use_drawflow_ids(report, start_id)
+    return report
@@ -0,0 +1,137 @@
+from pathlib import Path
+from typing import Any, Dict, Optional
+import hashlib
+import hmac
+import inspect
+import os
+import pickle
+import struct
+import tempfile
+
+import networkx as nx
+
+from core.settings import settings
+from v1.src import compiler, handler, node
+from v1.src.compiler import CompiledNode
+from v1.src.logger import logger
+from v1.utils import mappings
+
+ARTIFACT_MAGIC = b"CBFLOW"
+ARTIFACT_VERSION = 2
+ARTIFACT_SUFFIX = ".flow"
+# Magic, format version, source digest and HMAC of the body
+HEADER = struct.Struct(f"<{len(ARTIFACT_MAGIC)}sH32s32s")
+
+
+def code_fingerprint() -> bytes:
+    # Handler and node objects are stored as they are, an artifact written by
+    # another version of the code that parses, builds or compiles them is stale
+    digest = hashlib.sha256()
+    paths = [inspect.getfile(module) for module in (handler, compiler, node, mappings)]
+    # flows.py imports this module, it is read by path
+    paths.append(str(Path(__file__).with_name("flows.py")))
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.digest()
+
+
+CODE_FINGERPRINT = code_fingerprint()
+
+
+def get_artifact_path(json_path: str) -> str:
+    return str(Path(json_path).with_suffix(ARTIFACT_SUFFIX))
+
+
+def source_digest(source: bytes) -> bytes:
+    return hashlib.sha256(source + CODE_FINGERPRINT).digest()
+
+
+def get_key() -> Optional[bytes]:
+    key = settings.flows.FLOW_ARTIFACT_KEY
+    return key.encode() if key else None
+
+
+def sign(key: bytes, header: bytes, body: bytes) -> bytes:
+    return hmac.new(key, header + body, hashlib.sha256).digest()
+
+
+def dump_flow(graph: nx.DiGraph, nodes: Dict[str, CompiledNode], source: bytes, key: bytes) -> bytes:
+    """
+    Serialises a compiled flow. The header holds the format version, a hash of
+    the JSON source and of the code that compiled it, and an HMAC of the body
+    keyed with FLOW_ARTIFACT_KEY; the body holds the built handlers and compiled
+    nodes, and the graph with its edges as pairs of indexes into the node list.
+    """
+    node_ids = list(graph.nodes)
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    payload = {
+        "node_ids": node_ids,
+        "attrs": [graph.nodes[node_id] for node_id in node_ids],
+        "edges": [(index[source_id], index[target_id]) for source_id, target_id in graph.edges],
+        "nodes": nodes,
+    }
+    body = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+    digest = source_digest(source)
+    mac = sign(key, ARTIFACT_MAGIC + struct.pack("<H", ARTIFACT_VERSION) + digest, body)
+    return HEADER.pack(ARTIFACT_MAGIC, ARTIFACT_VERSION, digest, mac) + body
+
+
+def load_flow(data: bytes, source: bytes, key: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Returns the graph, compiled nodes and size of an artifact, or None when it
+    was not compiled from `source` by this version of the code.
+
+    Raises:
+        ValueError: The HMAC doesn't match, the artifact wasn't written with `key`.
+    """
+    if len(data) < HEADER.size:
+        return None
+    magic, version, digest, mac = HEADER.unpack_from(data)
+    if magic != ARTIFACT_MAGIC or version != ARTIFACT_VERSION or digest != source_digest(source):
+        return None
+    body = data[HEADER.size:]
+    # Unpickling runs code, only bodies signed by a worker holding the key are loaded
+    if not hmac.compare_digest(mac, sign(key, data[:HEADER.size - len(mac)], body)):
+        raise ValueError("Invalid artifact signature")
+    payload = pickle.loads(body)
+    node_ids = payload["node_ids"]
+    graph = nx.DiGraph()
+    graph.add_nodes_from(zip(node_ids, payload["attrs"]))
+    graph.add_edges_from((node_ids[i], node_ids[j]) for i, j in payload["edges"])
+    return {"graph": graph, "nodes": payload["nodes"], "size": len(data)}
+
+
+def read_artifact(json_path: str, source: bytes) -> Optional[Dict[str, Any]]:
+    # Without a key artifacts are neither written nor loaded
+    key = get_key()
+    if key is None:
+        return None
+    try:
+        with open(get_artifact_path(json_path), "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    try:
+        return load_flow(data, source, key)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable flow artifact for {json_path}: {e!r}")
+        return None
+
+
+def write_artifact(json_path: str, graph: nx.DiGraph, nodes: Dict[str, CompiledNode], source: bytes) -> int:
+    # Returns the size of the artifact, 0 if it couldn't be written
+    key = get_key()
+    if key is None:
+        return 0
+    artifact_path = get_artifact_path(json_path)
+    try:
+        data = dump_flow(graph, nodes, source, key)
+        # Same atomic replace as the flow JSON, workers never read a partial artifact
+        with tempfile.NamedTemporaryFile(mode="wb", delete=False, dir=os.path.dirname(artifact_path)) as temp_file:
+            temp_file.write(data)
+        os.replace(temp_file.name, artifact_path)
+        return len(data)
+    except Exception as e:
+        logger.warning(f"Couldn't write flow artifact {artifact_path}: {e!r}")
+        return 0
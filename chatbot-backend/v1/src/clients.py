@@ -0,0 +1,69 @@
+from typing import Dict, Optional
+import httpx
+
+from core.settings import settings
+
+
+def get_target_config(target: str) -> Dict[str, float | int]:
+    config = {
+        "kb": (settings.http.HTTP_KB_TIMEOUT, settings.http.HTTP_KB_MAX_CONNECTIONS),
+        "chatlog": (settings.http.HTTP_CHATLOG_TIMEOUT, settings.http.HTTP_CHATLOG_MAX_CONNECTIONS),
+        "freshdesk": (settings.http.HTTP_FRESHDESK_TIMEOUT, settings.http.HTTP_FRESHDESK_MAX_CONNECTIONS),
+    }
+    if target not in config:
+        raise ValueError(f"Unknown HTTP target {target}")
+    timeout, max_connections = config[target]
+    return {"timeout": timeout, "max_connections": max_connections}
+
+
+class HTTPClients:
+    """
+    Shared keep-alive `httpx.AsyncClient` instances, one per downstream target
+    ("kb", "chatlog", "freshdesk").
+
+    Each target gets its own connection pool so a slow LLM call can only exhaust
+    the knowledge base pool, never the chatlog or Freshdesk ones. Clients are
+    created on first use and closed on application shutdown.
+    """
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.transport = transport
+
+    def create_client(self, target: str) -> httpx.AsyncClient:
+        config = get_target_config(target)
+        timeout = httpx.Timeout(config["timeout"], connect=settings.http.HTTP_CONNECT_TIMEOUT)
+        limits = httpx.Limits(
+            max_connections=config["max_connections"],
+            max_keepalive_connections=min(
+                config["max_connections"], settings.http.HTTP_MAX_KEEPALIVE_CONNECTIONS
+            ),
+        )
+        # The chatlog routes are mounted with a trailing slash, requests used to
+        # follow the redirect transparently
+        return httpx.AsyncClient(
+            timeout=timeout,
+            limits=limits,
+            transport=self.transport,
+            follow_redirects=True,
+        )
+
+    def get(self, target: str) -> httpx.AsyncClient:
+        client = self.clients.get(target)
+        if client is None or client.is_closed:
+            client = self.create_client(target)
+            self.clients[target] = client
+        return client
+
+    async def set_transport(self, transport: Optional[httpx.AsyncBaseTransport]):
+        # Used to route every target to local fakes (tests, load generation)
+        await self.close()
+        self.transport = transport
+
+    async def close(self):
+        clients = list(self.clients.values())
+        self.clients = {}
+        for client in clients:
+            await client.aclose()
+
+
+http_clients = HTTPClients()
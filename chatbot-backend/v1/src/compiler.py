@@ -0,0 +1,190 @@
+from typing import Any, Dict, List, Optional
+import networkx as nx
+
+from core.models.chat_message_model import Elements
+
+
+class CompiledNode:
+    """
+    Flat record of everything the session step loop needs from a node.
+
+    The record is built once per flow and shared by every session running it, so
+    the step loop does a single dict lookup per node instead of walking the
+    networkx graph. `next_node` is used for nodes with a single child,
+    `transitions` maps an intent to the child node for branching nodes.
+    Parallel nodes list the first node of each branch in `branches` and move
+    to the `join` node the branches end at. Deciders with a qa node on one of
+    their branches name it in `prefetch`, with the nodes leading to it in
+    `prefetch_path`.
+    """
+    __slots__ = (
+        "id",
+        "type",
+        "handler",
+        "keys",
+        "show",
+        "feedback",
+        "elements",
+        "timeout",
+        "next_node",
+        "transitions",
+        "streaming",
+        "branches",
+        "join",
+        "prefetch",
+        "prefetch_path",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        handler: Any,
+        next_node: Optional[str] = None,
+        transitions: Optional[Dict[str, str]] = None,
+        branches: Optional[List[str]] = None,
+        join: Optional[str] = None,
+        ) -> None:
+        self.id = id
+        self.handler = handler
+        self.type = handler.type
+        self.keys = handler.saving_keys
+        self.show = handler.show
+        self.feedback = handler.feedback
+        self.timeout = getattr(handler, "timeout", None)
+        elements = handler.elements
+        if elements:
+            self.elements = [Elements(**element) for element in elements]
+        else:
+            self.elements = None
+        self.next_node = next_node
+        self.transitions = transitions
+        # Only shown answers are worth streaming to the client
+        self.streaming = bool(self.show and getattr(handler, "streaming", False))
+        self.branches = branches
+        self.join = join
+        self.prefetch = None
+        self.prefetch_path = None
+
+    def get_next_node(self, intent: Optional[str] = None) -> Optional[str]:
+        # Raises KeyError when a branching node has no child for the intent
+        if self.transitions is None:
+            return self.next_node
+        return self.transitions[intent]
+
+
+def find_join(graph: nx.DiGraph, node_id: str, branches: List[str]) -> str:
+    """
+    Finds the join node every branch of the parallel node `node_id` ends at.
+
+    Raises:
+        ValueError: A branch waits for the user, starts another parallel node,
+            loops, or the branches don't all end at the same join node.
+    """
+    joins = set()
+    for branch in branches:
+        seen = set()
+        pending = [branch]
+        while pending:
+            child = pending.pop()
+            if child in seen:
+                continue
+            seen.add(child)
+            handler = graph.nodes[child].get("handler")
+            node_type = getattr(handler, "type", None)
+            if node_type == "join":
+                joins.add(child)
+                continue
+            if node_type in ("l", "parallel"):
+                raise ValueError(f"Branch {branch} of parallel node {node_id} contains a {node_type} node")
+            pending.extend(graph.neighbors(child))
+        # A loop without a listen node would keep the branch, and the join, running forever
+        try:
+            cycle = nx.find_cycle(graph.subgraph(seen - joins))
+        except nx.NetworkXNoCycle:
+            cycle = None
+        if cycle is not None:
+            raise ValueError(f"Branch {branch} of parallel node {node_id} loops through {[edge[0] for edge in cycle]}")
+    if len(joins) != 1:
+        raise ValueError(f"Branches of parallel node {node_id} must end at one join node, found {sorted(joins)}")
+    return joins.pop()
+
+
+def compile_graph(graph: nx.DiGraph) -> Dict[str, CompiledNode]:
+    """
+    Compiles a flow graph into a dict of `CompiledNode` keyed by node id.
+
+    A node with one child always moves to it. A node with several children moves
+    to the child whose handler label matches the returned intent; if several
+    children share a label the first one wins, as it did when scanning neighbors.
+
+    The children of a parallel node are its branches, ordered top to bottom as
+    they are drawn in the editor; that order decides which branch wins when
+    several write the same key.
+    """
+    nodes = {}
+    for node_id, attrs in graph.nodes(data=True):
+        handler = attrs.get("handler")
+        if handler is None:
+            continue
+        children: List[str] = list(graph.neighbors(node_id))
+        next_node = None
+        transitions = None
+        branches = None
+        join = None
+        if handler.type == "parallel":
+            branches = sorted(children, key=lambda child: (
+                graph.nodes[child].get("pos_y") or 0, graph.nodes[child].get("pos_x") or 0, child
+            ))
+            join = find_join(graph, node_id, branches)
+            next_node = join
+        elif len(children) == 1:
+            next_node = children[0]
+        elif len(children) > 1:
+            transitions = {}
+            for child in children:
+                label = getattr(graph.nodes[child].get("handler"), "label", None)
+                if label is not None:
+                    transitions.setdefault(label, child)
+        nodes[node_id] = CompiledNode(
+            id=node_id,
+            handler=handler,
+            next_node=next_node,
+            transitions=transitions,
+            branches=branches,
+            join=join,
+        )
+    find_prefetches(nodes)
+    return nodes
+
+
+# Nodes that only move data around the tracker, a qa node behind them is still
+# reached right after the decider
+PASS_THROUGH_TYPES = ("intent", "set", "counter", "text")
+
+
+def find_prefetches(nodes: Dict[str, CompiledNode]):
+    """
+    Marks the deciders with a qa node on one of their branches, either as a
+    direct child or behind intent labels and nodes that only set variables.
+    The session starts that qa node's retrieval while the decider classifies
+    the user's answer. Only branches of intents the decider can emit count and
+    only the first qa node found is prefetched, so a miss costs one search;
+    every branch leading to that node is part of its path.
+    """
+    for node in nodes.values():
+        if node.type != "decider" or not node.transitions:
+            continue
+        paths = {}
+        for label in [*node.handler.labels, "fail"]:
+            child = node.transitions.get(label)
+            if child is None:
+                continue
+            path = []
+            while child in nodes and child not in path and nodes[child].type in PASS_THROUGH_TYPES:
+                path.append(child)
+                child = nodes[child].next_node
+            if child in nodes and nodes[child].type == "qa":
+                paths.setdefault(child, set()).update(path)
+        if paths:
+            node.prefetch = next(iter(paths))
+            node.prefetch_path = frozenset(paths[node.prefetch])
@@ -0,0 +1,83 @@
+import asyncio
+import dataclasses
+from typing import Any, Dict, List, Optional, Tuple
+
+from uvicorn.config import Config
+from uvicorn.protocols.websockets.websockets_impl import WebSocketProtocol
+from uvicorn.server import ServerState
+from websockets import frames
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+
+from core.settings import settings
+
+
+class ThresholdPerMessageDeflate(PerMessageDeflate):
+    """
+    permessage-deflate that sends messages smaller than `min_size` bytes
+    uncompressed. RFC 7692 allows mixing both, the rsv1 bit tells the client
+    which messages to inflate; for signal frames of a few hundred bytes the
+    deflate header and the CPU cost outweigh the saving.
+    """
+    def __init__(self, *args, min_size: int = 0, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.min_size = min_size
+        self.skip_message = False
+
+    def encode(self, frame: frames.Frame) -> frames.Frame:
+        if frame.opcode in frames.CTRL_OPCODES:
+            return frame
+        # Continuation frames follow the decision taken on the first frame
+        if frame.opcode is not frames.OP_CONT:
+            self.skip_message = len(frame.data) < self.min_size
+        if self.skip_message:
+            return dataclasses.replace(frame, rsv1=False)
+        return super().encode(frame)
+
+
+class ThresholdDeflateFactory(ServerPerMessageDeflateFactory):
+    def __init__(self, *args, min_size: int = 0, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.min_size = min_size
+
+    def process_request_params(self, params, accepted_extensions) -> Tuple[List, PerMessageDeflate]:
+        response_params, extension = super().process_request_params(params, accepted_extensions)
+        return response_params, ThresholdPerMessageDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+            min_size=self.min_size,
+        )
+
+
+def create_deflate_factory(
+    level: int = settings.ws.WS_DEFLATE_LEVEL,
+    min_size: int = settings.ws.WS_DEFLATE_MIN_SIZE,
+    max_window_bits: int = settings.ws.WS_DEFLATE_MAX_WINDOW_BITS,
+    mem_level: int = settings.ws.WS_DEFLATE_MEM_LEVEL,
+    ) -> ThresholdDeflateFactory:
+    compress_settings: Dict[str, Any] = {"level": level, "memLevel": mem_level}
+    return ThresholdDeflateFactory(
+        server_max_window_bits=max_window_bits if max_window_bits < 15 else None,
+        compress_settings=compress_settings,
+        min_size=min_size,
+    )
+
+
+class CompressedWebSocketProtocol(WebSocketProtocol):
+    """
+    uvicorn's websockets protocol with a tunable permessage-deflate extension.
+    The uvicorn CLI only accepts its built-in protocols, run the server with
+    `python server.py` to use it.
+    """
+    def __init__(
+        self,
+        config: Config,
+        server_state: ServerState,
+        app_state: Dict[str, Any],
+        _loop: Optional[asyncio.AbstractEventLoop] = None,
+        ) -> None:
+        super().__init__(config, server_state, app_state, _loop)
+        if config.ws_per_message_deflate:
+            self.available_extensions = [create_deflate_factory()]
@@ -1,21 +1,38 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+from starlette.concurrency import run_in_threadpool
 from v1.src.handler import TextHandler, ListenHandler, EndHandler
 import networkx as nx
 from v1.src.node import Node
 from core.models.graph_model import Root
 from pathlib import Path
 import json
+import os
+import threading
 from v1.utils.mappings import NODE_MAPPINGS
-from typing import List
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+from core.settings import settings
+from v1.src.logger import logger
+from v1.src.compiler import CompiledNode, compile_graph
+from v1.src.artifact import read_artifact, write_artifact
+
+FLOWS_DIR = Path(__file__).parent / "flows"
 
 class Flow(BaseModel):
     file_path: str = "flow_production.json"
     graph: nx.DiGraph 
+    nodes: Dict[str, CompiledNode] = {}
+    # Size of the serialised flow, used to bound the cache
+    size: int = 0
     class Config:
         arbitrary_types_allowed = True
     @staticmethod
+    def get_path(file_path: str = "flow_production.json") -> str:
+        return str(FLOWS_DIR / file_path)
+
+    @staticmethod
     def get_json(file_path: str = "flow_production.json"):
-        json_path = str(Path(__file__).parent / f'flows/{file_path}')
+        json_path = Flow.get_path(file_path)
         with open(json_path, 'r') as f:
             data = f.read()
         data = json.loads(data)
@@ -34,40 +51,40 @@ class Flow(BaseModel):
 
     @staticmethod
     def parse_nodes(node_dict):
-        nodes = []
-        for id, node in node_dict.items():
-            name = node["name"]
-            id = str(node["id"])
-            type = node["class"]
-            if type == "startNode":
-                id = "start00000000"
-                name = "start00000000"
-            data = node["data"]
-            inputs = node["inputs"]["input_1"]["connections"]
-            outputs = node["outputs"]["output_1"]["connections"]
-            pos_x = node["pos_x"]
-            pos_y = node["pos_y"]
-            handler = Flow.create_handler_by_type(type, data)
-            children = []
-            parents = []
-            for input in inputs:
-                parents.append(input["node"])
-
-            for output in outputs:
-                children.append(output["node"])
-            node_model = Node(
-                id=id, 
-                name=name, 
-                type=type, 
-                handler=handler,
-                children=children, 
-                parents=parents,
-                data=data,
-                pos_x=pos_x,
-                pos_y=pos_y)
-            nodes.append(node_model)
-
-        return nodes
+        return [Flow.parse_node(node) for node in node_dict.values()]
+
+    @staticmethod
+    def parse_node(node) -> Node:
+        name = node["name"]
+        id = str(node["id"])
+        type = node["class"]
+        if type == "startNode":
+            id = "start00000000"
+            name = "start00000000"
+        data = node["data"]
+        inputs = node["inputs"]["input_1"]["connections"]
+        outputs = node["outputs"]["output_1"]["connections"]
+        pos_x = node["pos_x"]
+        pos_y = node["pos_y"]
+        handler = Flow.create_handler_by_type(type, data)
+        children = []
+        parents = []
+        for input in inputs:
+            parents.append(input["node"])
+
+        for output in outputs:
+            children.append(output["node"])
+        node_model = Node(
+            id=id, 
+            name=name, 
+            type=type, 
+            handler=handler,
+            children=children, 
+            parents=parents,
+            data=data,
+            pos_x=pos_x,
+            pos_y=pos_y)
+        return node_model
 
     @staticmethod
     def create_graph(nodes: List[Node]):
@@ -82,11 +99,151 @@ class Flow(BaseModel):
         return g
     
     @classmethod
-    def from_json(cls, file_path: str = "flow_production.json"):
-        data = cls.get_data_from_json(file_path)
+    def from_workflow(cls, workflow: Root, file_path: str = "flow_production.json"):
+        data = workflow.drawflow["Home"].model_dump(by_alias=True)["data"]
         nodes = Flow.parse_nodes(data)
         g = Flow.create_graph(nodes)
-        return cls(file_path=file_path,graph=g)
+        return cls(file_path=file_path,graph=g,nodes=compile_graph(g))
+
+    @classmethod
+    def from_json(cls, file_path: str = "flow_production.json"):
+        return cls.from_workflow(cls.get_json(file_path), file_path)
+
+    @classmethod
+    def load(cls, file_path: str = "flow_production.json"):
+        """
+        Loads the precompiled artifact of a flow when it was built from the
+        current JSON, otherwise compiles the JSON and rewrites the artifact.
+        """
+        json_path = cls.get_path(file_path)
+        with open(json_path, 'rb') as f:
+            source = f.read()
+        artifact = read_artifact(json_path, source)
+        if artifact is not None:
+            return cls(file_path=file_path, **artifact)
+        flow = cls.from_workflow(Root(**json.loads(source)), file_path)
+        flow.size = write_artifact(json_path, flow.graph, flow.nodes, source) or len(source)
+        return flow
+
+
+class FlowCache(BaseModel):
+    """
+    Process-wide cache of compiled flows.
+
+    Parsing and validating the drawflow JSON and building the graph is done once
+    per file version; every websocket connection then shares the same graph and
+    handler objects. Handlers only read their configuration while executing, all
+    per-conversation state lives in the session tracker, so sharing them is safe.
+
+    Entries are keyed by file name and validated against the file's inode,
+    mtime and size, so a flow replaced on disk (also by another worker) is picked
+    up on the next connection. Flows are compiled on first use and the least
+    recently used ones are dropped once they add up to more than `max_bytes`;
+    the flow just compiled is always kept.
+    """
+    flows: "OrderedDict[str, Tuple[Tuple[int, int, int], Flow]]" = OrderedDict()
+    max_bytes: int = int(settings.flows.FLOW_CACHE_MAX_MB * 1024 * 1024)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @staticmethod
+    def get_file_key(file_path: str) -> Tuple[int, int, int]:
+        stat = os.stat(Flow.get_path(file_path))
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def get_cached(self, file_path: str = "flow_production.json") -> Optional[Flow]:
+        # Lock-free: the lock is held while compiling, hits must not wait for it
+        entry = self.flows.get(file_path)
+        if entry is None or entry[0] != self.get_file_key(file_path):
+            return None
+        try:
+            self.flows.move_to_end(file_path)
+        except KeyError:
+            # Evicted meanwhile, the flow is still valid for this caller
+            pass
+        return entry[1]
+
+    def get(self, file_path: str = "flow_production.json") -> Flow:
+        flow = self.get_cached(file_path)
+        if flow is not None:
+            return flow
+
+        with self._lock:
+            # Another caller may have compiled it while we were waiting
+            key = self.get_file_key(file_path)
+            entry = self.flows.get(file_path)
+            if entry is not None and entry[0] == key:
+                self.flows.move_to_end(file_path)
+                return entry[1]
+            flow = Flow.load(file_path)
+            self.flows[file_path] = (key, flow)
+            self.flows.move_to_end(file_path)
+            self.evict()
+            logger.info(f"Compiled flow {file_path}")
+            return flow
+
+    def evict(self):
+        while len(self.flows) > 1 and self.get_size() > self.max_bytes:
+            file_path, _ = self.flows.popitem(last=False)
+            logger.info(f"Dropped flow {file_path} from the cache")
+
+    def get_size(self) -> int:
+        return sum(flow.size for _, flow in self.flows.values())
+
+    def get_for_origin(self, origin: Optional[str]) -> Flow:
+        return self.get(flow_registry.get_file(origin))
+
+    async def aget_for_origin(self, origin: Optional[str]) -> Flow:
+        # Cache hits are served on the loop, compiling (or waiting for another
+        # caller to finish compiling) runs in the threadpool
+        file_path = flow_registry.get_file(origin)
+        flow = self.get_cached(file_path)
+        if flow is None:
+            flow = await run_in_threadpool(self.get, file_path)
+        return flow
+
+    def invalidate(self, file_path: Optional[str] = None):
+        with self._lock:
+            if file_path is None:
+                self.flows = OrderedDict()
+            else:
+                self.flows.pop(file_path, None)
+
+
+class FlowRegistry:
+    """
+    Maps the origin in the websocket path (one per tenant) to the flow file it
+    runs. Pinning an origin to a versioned file name lets tenants move to a
+    new flow independently.
+    """
+    def __init__(
+        self,
+        flows: Dict[str, str] = settings.flows.FLOW_REGISTRY,
+        default: str = settings.flows.FLOW_DEFAULT_FILE,
+        ) -> None:
+        for file_path in [*flows.values(), default]:
+            # Flow files are looked up in FLOWS_DIR only
+            if Path(file_path).name != file_path:
+                raise ValueError(f"Flow file {file_path} must be a file name")
+        self.flows = dict(flows)
+        self.default = default
+
+    def get_file(self, origin: Optional[str]) -> str:
+        return self.flows.get(origin, self.default)
+
+    def get_draft_file(self, origin: Optional[str]) -> str:
+        # Editor autosaves, one per registered origin next to its flow
+        if origin not in self.flows:
+            return "flow_latest.json"
+        return f"{Path(self.flows[origin]).stem}_latest.json"
+
+    def get_origins(self) -> List[str]:
+        return list(self.flows)
+
 
+flow_registry = FlowRegistry()
 
 
+flow_cache = FlowCache()
@@ -0,0 +1,50 @@
+from typing import Any, List, Optional
+
+from fastapi import WebSocket
+
+# Clients asking for this subprotocol get the frames of a turn as one JSON array
+BATCH_SUBPROTOCOL = "chatbot.batch.v1"
+
+
+def negotiate_batching(websocket: WebSocket) -> Optional[str]:
+    if BATCH_SUBPROTOCOL in websocket.scope.get("subprotocols", []):
+        return BATCH_SUBPROTOCOL
+    return None
+
+
+class FrameSender:
+    """
+    Wraps the websocket of a session and sends its serialised frames.
+
+    Without batching every frame goes out as soon as it is produced, as before.
+    With batching the frames of a turn (signals, the echo of the user message,
+    the answers of the nodes that follow) are buffered and sent as a single JSON
+    array when the session waits for the user again, closes, or needs a frame
+    delivered right away (streamed chunks).
+    """
+    def __init__(self, websocket: WebSocket, batch: bool = False) -> None:
+        self.websocket = websocket
+        self.batch = batch
+        self.buffer: List[str] = []
+
+    async def send_text(self, frame: str):
+        if not self.batch:
+            await self.websocket.send_text(frame)
+            return
+        self.buffer.append(frame)
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        frames = self.buffer
+        self.buffer = []
+        # The frames already are JSON objects, joining them is enough
+        await self.websocket.send_text("[" + ",".join(frames) + "]")
+
+    async def receive_json(self) -> Any:
+        await self.flush()
+        return await self.websocket.receive_json()
+
+    async def close(self, *args, **kwargs):
+        await self.flush()
+        await self.websocket.close(*args, **kwargs)
@@ -4,15 +4,59 @@ from typing import Any, Dict, List, Optional, Tuple, Union, Callable, Literal, C
 import random
 from abc import ABC, abstractmethod
 import json
-from v1.models.intent_classifier import predict
+from v1.models.intent_cascade import intent_cascade
 from v1.src.logger import logger
-import requests
+from v1.src.clients import http_clients
 from core.models.kb_models import DocumentQuery,DocumentQueyResponse, ModelKwargs, GenerateQuery, GenerateResponse
 from core.settings import settings
 import markdown
 import re
+import inspect
+
+
+async def stream_kb_answer(
+    path: str,
+    payload: Dict[str, Any],
+    on_chunk: Callable[[str], Any],
+    fail_response: Optional[str] = None,
+    ) -> Optional[str]:
+    """
+    Posts to a streamed knowledge base endpoint and forwards every chunk of the
+    answer to `on_chunk` as it arrives.
+
+    Returns:
+        The full answer, or `fail_response` when it is set and the knowledge base
+        found no documents (the stream is closed before anything is generated).
+    """
+    headers={"Authorization": f"Bearer {settings.kb.CHATBOT_KB_TOKEN}"}
+    url_base = settings.kb.CHATBOT_KB_URL
+    async with http_clients.get("kb").stream(
+        "POST",
+        f"{url_base}{path}",
+        json=payload,
+        headers=headers
+        ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["type"] == "documents":
+                if fail_response is not None and not event["documents"]:
+                    return fail_response
+            elif event["type"] == "chunk":
+                await on_chunk(event["text"])
+            elif event["type"] == "end":
+                return event["answer"]
+            elif event["type"] == "error":
+                raise RuntimeError(event["detail"])
+    raise RuntimeError("Knowledge base stream ended without an answer")
+
+
 class BaseHandler(ABC):
     feedback: Optional[bool] = False
+    # Handlers with a `stream` method can forward the answer while it is generated
+    streaming: ClassVar[bool] = False
     def __init__(self,elements:List[Dict|None]|None = None)-> None:
         self.elements = elements
 
@@ -36,9 +80,23 @@ class BaseHandler(ABC):
         self,
         value: Any, 
         vars: Optional[Dict[str, Any]] = None,
+        **kwargs,
         ):
-        result = self.execute(value,vars)
+        result = self.execute(value,vars,**kwargs)
         return result  
+
+    async def run(
+        self,
+        value: Any,
+        vars: Optional[Dict[str, Any]] = None,
+        **kwargs,
+        ):
+        # Handlers doing I/O implement `execute` as a coroutine so they never
+        # block the event loop, the rest stay plain functions
+        result = self(value,vars,**kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
     
     
 
@@ -151,13 +209,20 @@ class DeciderHandler(BaseHandler):
         self,
         saving_keys: Optional[List[str]] = ["current_intent"],
         labels: Optional[List[str]] = ["help","greeting","goodbye"],
+        embedding_margin: Optional[float] = None,
+        embedding_min_score: Optional[float] = None,
+        prototypes: Optional[Dict[str, List[str]]] = None,
         ) -> None:
         super().__init__()
         self.saving_keys = saving_keys
         self.labels = labels
+        # None falls back to the INTENT_EMBEDDING_* settings
+        self.embedding_margin = embedding_margin
+        self.embedding_min_score = embedding_min_score
+        self.prototypes = prototypes
 
     
-    def execute(
+    async def execute(
         self,
         value: Optional[Any] = None,
         vars: Optional[Dict[str, Any]] = None,  # Vars is not used in this handler
@@ -165,10 +230,19 @@ class DeciderHandler(BaseHandler):
         sentence = vars["last_utterance"]
         logger.info(f"Decider handler: {sentence}")
         
-        results = predict(text=sentence,labels=self.labels)
+        results = await intent_cascade.classify(
+            text=sentence,
+            labels=self.labels,
+            margin=self.embedding_margin,
+            min_score=self.embedding_min_score,
+            prototypes=self.prototypes,
+            )
         logger.info(f"Decider handler results: {results}")
         scores = results["scores"]
         labels = results["labels"]
+        if results["tier"] == "embedding":
+            # The cascade only answers from embeddings when the margin is clear
+            return None , labels[0]
         max_score = max(scores)
         # TODO set max score in env var
         num_labels = len(labels)
@@ -183,7 +257,21 @@ class DeciderHandler(BaseHandler):
     @classmethod
     def from_data(cls, data: Dict[str, Any]):
         labels = json.loads(data["intents"])
-        return cls(labels=labels)
+        embedding_margin = data.get("embedding_margin") or None
+        embedding_min_score = data.get("embedding_min_score") or None
+        prototypes = data.get("prototypes") or None
+        if embedding_margin is not None:
+            embedding_margin = float(embedding_margin)
+        if embedding_min_score is not None:
+            embedding_min_score = float(embedding_min_score)
+        if isinstance(prototypes, str):
+            prototypes = json.loads(prototypes)
+        return cls(
+            labels=labels,
+            embedding_margin=embedding_margin,
+            embedding_min_score=embedding_min_score,
+            prototypes=prototypes,
+            )
     
 class IntentHandler(BaseHandler):
     type: Literal["intent"] = "intent"
@@ -219,6 +307,7 @@ class QaHandler(BaseHandler):
     type: Literal["qa"] = "qa"
     show: Optional[bool] = True
     feedback: Optional[bool] = True
+    streaming: ClassVar[bool] = True
     def __init__(
         self,
         collection: str = "tenantev",
@@ -242,27 +331,40 @@ class QaHandler(BaseHandler):
         self.num_results = num_results
         self.if_fail = if_fail
         
-    def predict(self,value,vars):
-        question = self.question_text.format(**vars)
+    def query_payload(self, vars, documents=None, generate=None):
+        document_query = DocumentQuery(
+            model=self.model,
+            llm_model_kwargs=ModelKwargs(temperature=self.temperature, max_tokens=self.max_tokens),
+            question=self.question_text.format(**vars),
+            generate=self.generate if generate is None else generate,
+            num_results=self.num_results,
+            documents=documents,
+            )
+        return document_query.model_dump()
+
+    async def retrieve(self, vars) -> List[Dict[str, Any]]:
+        # Only the vector search, the answer is generated if the qa node runs
+        headers={"Authorization": f"Bearer {settings.kb.CHATBOT_KB_TOKEN}"}
+        url_base = settings.kb.CHATBOT_KB_URL
+        response = await http_clients.get("kb").post(
+            f"{url_base}/kb/{self.collection}/query",
+            json=self.query_payload(vars, generate=False),
+            headers=headers
+            )
+        response.raise_for_status()
+        return response.json()["documents"] or []
+
+    async def predict(self,value,vars,documents=None):
         collection = self.collection
-        temperature = self.temperature
-        max_tokens = self.max_tokens
-        model = self.model
-        generate = self.generate
-        num_results = self.num_results
         fail_response = self.if_fail
+        # Documents retrieved ahead of time, an empty list needs no LLM call
+        if documents is not None and not documents:
+            return fail_response
         try:
-            document_query = DocumentQuery(
-                model=model,
-                llm_model_kwargs=ModelKwargs(temperature=temperature, max_tokens=max_tokens),
-                question=question,
-                generate=generate,
-                num_results=num_results,
-                )
-            payload = document_query.model_dump()
+            payload = self.query_payload(vars, documents)
             headers={"Authorization": f"Bearer {settings.kb.CHATBOT_KB_TOKEN}"}
             url_base = settings.kb.CHATBOT_KB_URL
-            response = requests.post(
+            response = await http_clients.get("kb").post(
                 f"{url_base}/kb/{collection}/query",
                 json=payload,
                 headers=headers
@@ -281,16 +383,45 @@ class QaHandler(BaseHandler):
             print(e)
             return None
         
+    async def predict_stream(self, value, vars, on_chunk, documents=None):
+        if documents is not None and not documents:
+            return self.if_fail
+        try:
+            return await stream_kb_answer(
+                f"/kb/{self.collection}/query/stream",
+                self.query_payload(vars, documents),
+                on_chunk,
+                fail_response=self.if_fail,
+                )
+        except Exception as e:
+            logger.error(e)
+            print(e)
+            return None
         
-        
-        
-    def execute(
+    async def execute(
         self,
         value: Optional[Any] = None,
         vars: Optional[Dict[str, Any]] = None,
+        documents: Optional[List[Dict[str, Any]]] = None,
         ) -> Tuple[Union[str, None], Union[str, None]]:
         
-        text = self.predict(value,vars)
+        text = await self.predict(value,vars,documents)
+        if text is None:
+            intent = "fail"
+        else:
+            intent = "success"
+        
+        return text , intent
+    
+    async def stream(
+        self,
+        value: Optional[Any],
+        vars: Optional[Dict[str, Any]],
+        on_chunk: Callable[[str], Any],
+        documents: Optional[List[Dict[str, Any]]] = None,
+        ) -> Tuple[Union[str, None], Union[str, None]]:
+        
+        text = await self.predict_stream(value, vars, on_chunk, documents)
         if text is None:
             intent = "fail"
         else:
@@ -321,6 +452,7 @@ class QaHandler(BaseHandler):
 
 class AIHandler(BaseHandler):
     type: Literal["qa"] = "ai"
+    streaming: ClassVar[bool] = True
     def __init__(
         self,
         instruction: str,
@@ -340,23 +472,21 @@ class AIHandler(BaseHandler):
         self.max_tokens = max_tokens
         self.model = model
         
-    def predict(self,value,vars):
-        instruction = self.instruction.format(**vars)
-        system_message = self.system_message.format(**vars)
-        temperature = self.temperature
-        max_tokens = self.max_tokens
-        model = self.model
+    def generate_payload(self, vars):
+        generate_query = GenerateQuery(
+            model=self.model,
+            llm_model_kwargs=ModelKwargs(temperature=self.temperature, max_tokens=self.max_tokens),
+            system_prompt=self.instruction.format(**vars),
+            human_prompt=self.system_message.format(**vars)
+            )
+        return generate_query.model_dump()
+
+    async def predict(self,value,vars):
         try:
-            generate_query = GenerateQuery(
-                model=model,
-                llm_model_kwargs=ModelKwargs(temperature=temperature, max_tokens=max_tokens),
-                system_prompt=instruction,
-                human_prompt=system_message
-                )
-            payload = generate_query.model_dump()
+            payload = self.generate_payload(vars)
             headers={"Authorization": f"Bearer {settings.kb.CHATBOT_KB_TOKEN}"}
             url_base = settings.kb.CHATBOT_KB_URL
-            response = requests.post(
+            response = await http_clients.get("kb").post(
                 f"{url_base}/generate",
                 json=payload,
                 headers=headers
@@ -370,13 +500,40 @@ class AIHandler(BaseHandler):
             print(e)
             return None
         
-    def execute(
+    async def predict_stream(self, value, vars, on_chunk):
+        try:
+            return await stream_kb_answer(
+                "/generate/stream",
+                self.generate_payload(vars),
+                on_chunk,
+                )
+        except Exception as e:
+            logger.error(e)
+            print(e)
+            return None
+        
+    async def execute(
         self,
         value: Optional[Any] = None,
         vars: Optional[Dict[str, Any]] = None,
         ) -> Tuple[Union[str, None], Union[str, None]]:
         
-        text = self.predict(value,vars)
+        text = await self.predict(value,vars)
+        if text is None:
+            intent = "fail"
+        else:
+            intent = "success"
+            
+        return text , intent
+    
+    async def stream(
+        self,
+        value: Optional[Any],
+        vars: Optional[Dict[str, Any]],
+        on_chunk: Callable[[str], Any],
+        ) -> Tuple[Union[str, None], Union[str, None]]:
+        
+        text = await self.predict_stream(value, vars, on_chunk)
         if text is None:
             intent = "fail"
         else:
@@ -410,6 +567,10 @@ class AIHandler(BaseHandler):
             show=show
             )
         
+EMAIL_PATTERN = re.compile(r"[^@]+@[^@]+\.[^@]+")
+ID_PATTERN = re.compile(r"^[0-9]{4,6}$")
+
+
 class ValidatorHandler(BaseHandler):
     type: Literal["validator"] = "validator"
     show: Optional[bool] = False
@@ -425,13 +586,13 @@ class ValidatorHandler(BaseHandler):
         self.var = var
         
     def validate_email(self,email):
-        if re.match(r"[^@]+@[^@]+\.[^@]+", email):
+        if EMAIL_PATTERN.match(email):
             return True
         else:
             return False
         
     def validate_id(self,id):
-        if re.match(r"^[0-9]{4,6}$", id):
+        if ID_PATTERN.match(id):
             return True
         else:
             return False
@@ -686,11 +847,8 @@ class TicketHandler(BaseHandler):
         self.ticket_platform = ticket_platform
         
     def parse_session_chats(self, data):
+        # History only holds USER and AI records
         chat_history = data['history']
-        filtered_messages = []
-        for message in chat_history:
-            if message['user'] in ['USER', 'AI']:
-                filtered_messages.append(message)
 
         html = """<p>
         <b>Ticket Report</b>
@@ -708,20 +866,20 @@ class TicketHandler(BaseHandler):
         </p>
         """
 
-        for message in filtered_messages:
-            text = message['text']
+        for message in chat_history:
+            text = message.text
             
             text = re.sub('\\n\\n', '', text)
             html_text = markdown.markdown(text)
             html_text = re.sub('<p>', '', html_text)
             html_text = re.sub('</p>', '', html_text)
-            html += "<p><b>%s</b>: %s<br><br></p>" % (message['user'], html_text)
+            html += "<p><b>%s</b>: %s<br><br></p>" % (message.user, html_text)
 
         html = re.sub("\n", "", html)
         
         return html
     
-    def save_ticket(self, data, ticket_id):
+    async def save_ticket(self, data, ticket_id):
         from core.models.chatlog_models import TicketCreate
         
         ticket = TicketCreate(
@@ -734,7 +892,7 @@ class TicketHandler(BaseHandler):
         headers = {"Authorization": f"Bearer {ticket_token}"}
         req_data = ticket.model_dump()
         try:
-            r = requests.post(
+            r = await http_clients.get("chatlog").post(
                 url=ticket_url, 
                 json=req_data,
                 headers=headers
@@ -745,7 +903,7 @@ class TicketHandler(BaseHandler):
         
         
     
-    def create_ticket(self, data,platform):
+    async def create_ticket(self, data,platform):
          # Freshdesk API
         html = self.parse_session_chats(data)
         # Freshdesk ENV variable for ticket creation 
@@ -772,7 +930,7 @@ class TicketHandler(BaseHandler):
         }
         try:
         # Requesting Data to URL
-            r = requests.post("https://"+ domain +".freshdesk.com/api/v2/tickets", auth = (api_key,password), headers = headers, json=ticket)
+            r = await http_clients.get("freshdesk").post("https://"+ domain +".freshdesk.com/api/v2/tickets", auth = (api_key,password), headers = headers, json=ticket)
             # Checking HTTP Status
             r.raise_for_status()
             # Returning the JSON Response if Status is OK and ID is not 0
@@ -784,7 +942,7 @@ class TicketHandler(BaseHandler):
             # raise system exit if the ticket is not created to avoid wrong api responses
             return None , "fail"
 
-    def execute(
+    async def execute(
         self,
         value: Optional[Any] = None, # There is no value as it is set by the user in the UI, value only for listening
         vars: Optional[Dict[str, Any]] = None,  # Vars is not used in this handler
@@ -792,9 +950,9 @@ class TicketHandler(BaseHandler):
         # Does not execute anything, just saves the value
         ticket_platform = self.ticket_platform
         
-        ticket_id , intent = self.create_ticket(vars,ticket_platform)
+        ticket_id , intent = await self.create_ticket(vars,ticket_platform)
         if ticket_id:
-            self.save_ticket(vars,ticket_id)
+            await self.save_ticket(vars,ticket_id)
         
         return ticket_id, intent
     
@@ -802,3 +960,53 @@ class TicketHandler(BaseHandler):
     def from_data(cls, data: Dict[str, Any]):
         return cls(ticket_platform=data["freshdesk_environment"])
 
+
+class ParallelHandler(BaseHandler):
+
+    type: Literal["parallel"] = "parallel"
+    show: Optional[bool] = False
+    def __init__(
+        self,
+        branch_timeout: Optional[float] = None,
+        ) -> None:
+        super().__init__()
+        self.saving_keys = []
+        self.branch_timeout = branch_timeout
+
+    def execute(
+        self,
+        value: Optional[Any] = None,
+        vars: Optional[Dict[str, Any]] = None,
+        ) -> Tuple[Union[str, None], Union[str, None]]:
+        # The session runs the branches, the node itself only forks
+        return None, None
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]):
+        branch_timeout = data.get("branch_timeout")
+        if branch_timeout in (None, ""):
+            branch_timeout = None
+        else:
+            branch_timeout = float(branch_timeout)
+        return cls(branch_timeout=branch_timeout)
+
+
+class JoinHandler(BaseHandler):
+
+    type: Literal["join"] = "join"
+    show: Optional[bool] = False
+    def __init__(self) -> None:
+        super().__init__()
+        self.saving_keys = []
+
+    def execute(
+        self,
+        value: Optional[Any] = None,
+        vars: Optional[Dict[str, Any]] = None,
+        ) -> Tuple[Union[str, None], Union[str, None]]:
+        # Branches are merged by the parallel node before the flow gets here
+        return None, None
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]):
+        return cls()
@@ -0,0 +1,40 @@
+from typing import Any, List, NamedTuple, Optional
+
+from core.models.chat_message_model import ChatMessage
+from core.settings import settings
+
+# Only the conversation itself is kept, UI signals are sent and forgotten
+HISTORY_USERS = ("USER", "AI")
+
+
+class HistoryRecord(NamedTuple):
+    """
+    One message of the conversation kept in `tracker["history"]`.
+
+    A plain tuple is a fraction of the size of the dumped `ChatMessage` dict and
+    serialises to a JSON list, `load_history` turns those back into records.
+    """
+    message_id: Optional[str]
+    timestamp: Optional[str]
+    user: str
+    text: Optional[str]
+
+    @classmethod
+    def from_message(cls, message: ChatMessage) -> "HistoryRecord":
+        return cls(message.message_id, message.timestamp, message.user, message.text)
+
+
+def add_record(
+    history: List[HistoryRecord],
+    record: HistoryRecord,
+    max_size: int = settings.store.SESSION_HISTORY_MAX_SIZE,
+    ):
+    history.append(record)
+    # Every record already went to the chatlog outbox, dropping the oldest ones
+    # only loses them from memory
+    if max_size > 0 and len(history) > max_size:
+        del history[:len(history) - max_size]
+
+
+def load_history(history: List[Any]) -> List[HistoryRecord]:
+    return [HistoryRecord(*record) for record in history]
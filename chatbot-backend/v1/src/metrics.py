@@ -0,0 +1,81 @@
+from typing import Callable, Dict, Optional
+import asyncio as aio
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from core.settings import settings
+
+# Handlers range from microseconds (text, set value) to seconds (LLM calls)
+NODE_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+NODE_DURATION = Histogram(
+    "chatbot_node_duration_seconds",
+    "Time spent executing the handler of a node.",
+    ["node_type", "node_id"],
+    buckets=NODE_BUCKETS,
+)
+INTENTS = Counter(
+    "chatbot_intents_total",
+    "Intents returned by node handlers.",
+    ["node_type", "intent"],
+)
+SESSIONS = Gauge(
+    "chatbot_sessions",
+    "Sessions held by this worker: running a node, waiting on a listen node, or hibernated.",
+    ["state"],
+)
+KB_PREFETCHES = Counter(
+    "chatbot_kb_prefetch_total",
+    "Knowledge base retrievals started while the decider classified: used (hit), discarded (miss) or failed.",
+    ["outcome"],
+)
+LOOP_LAG = Histogram(
+    "chatbot_event_loop_lag_seconds",
+    "Delay between when the loop lag probe should wake up and when it does.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+
+def observe_node(node_type: str, node_id: str, intent: Optional[str], duration: float):
+    NODE_DURATION.labels(node_type, node_id).observe(duration)
+    if intent is not None:
+        INTENTS.labels(node_type, intent).inc()
+
+
+def track_sessions(get_stats: Callable[[], Dict[str, int]]):
+    # Read when /metrics is scraped, nothing is updated on the hot path
+    SESSIONS.labels("active").set_function(lambda: get_stats()["active"])
+    SESSIONS.labels("listening").set_function(lambda: get_stats()["listening"])
+    SESSIONS.labels("hibernated").set_function(lambda: get_stats()["hibernated"])
+
+
+class LoopLagMonitor:
+    """
+    Sleeps for `interval` seconds in a loop and records how late it wakes up.
+    Any coroutine or callback blocking the event loop shows up as lag.
+    """
+    def __init__(self, interval: float = settings.metrics.METRICS_LOOP_LAG_INTERVAL_S) -> None:
+        self.interval = interval
+        self.task: Optional[aio.Task] = None
+
+    def start(self):
+        self.task = aio.get_running_loop().create_task(self.run())
+
+    async def run(self):
+        loop = aio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await aio.sleep(self.interval)
+            LOOP_LAG.observe(max(0.0, loop.time() - expected))
+
+    async def shutdown(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except aio.CancelledError:
+                pass
+            self.task = None
+
+
+loop_lag_monitor = LoopLagMonitor()
@@ -0,0 +1,126 @@
+from typing import Any, Dict, List, Optional
+import asyncio as aio
+import random
+
+import httpx
+
+from core.settings import settings
+from v1.src.clients import http_clients
+from v1.src.logger import logger
+
+
+class ChatlogOutbox:
+    """
+    Write-behind queue for the chat messages stored by the chatlog service.
+
+    Sessions put their messages here as they are produced, without waiting for
+    the chatlog. A single worker task gathers the messages of all sessions and
+    posts them to the bulk insert of `/messages` in batches of at most
+    `max_batch_size`, at most every `flush_interval_ms`. Failed batches are
+    retried with exponential backoff; the chatlog upserts on message_id so a
+    retried batch never duplicates messages. `drain` flushes what is left on
+    shutdown.
+    """
+    def __init__(
+        self,
+        max_batch_size: int = settings.outbox.OUTBOX_MAX_BATCH_SIZE,
+        flush_interval_ms: float = settings.outbox.OUTBOX_FLUSH_INTERVAL_MS,
+        max_queue_size: int = settings.outbox.OUTBOX_MAX_QUEUE_SIZE,
+        max_retries: int = settings.outbox.OUTBOX_MAX_RETRIES,
+        retry_backoff_s: float = settings.outbox.OUTBOX_RETRY_BACKOFF_S,
+        retry_backoff_max_s: float = settings.outbox.OUTBOX_RETRY_BACKOFF_MAX_S,
+        ) -> None:
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff_s
+        self.retry_backoff_max = retry_backoff_max_s
+        self.queue: Optional[aio.Queue] = None
+        self.worker: Optional[aio.Task] = None
+        self.loop: Optional[aio.AbstractEventLoop] = None
+        self.stats = {"enqueued": 0, "sent": 0, "batches": 0, "retries": 0, "dropped": 0}
+
+    def ensure_started(self):
+        loop = aio.get_running_loop()
+        if self.worker is not None and not self.worker.done() and self.loop is loop:
+            return
+        self.loop = loop
+        self.queue = aio.Queue(maxsize=self.max_queue_size)
+        self.worker = loop.create_task(self.run())
+
+    def put(self, message: Dict[str, Any]):
+        self.ensure_started()
+        try:
+            self.queue.put_nowait(message)
+            self.stats["enqueued"] += 1
+        except aio.QueueFull:
+            # The chatlog is down for long enough to fill the queue, the session
+            # must not block on it
+            self.stats["dropped"] += 1
+            logger.error(f"Chatlog outbox full, dropping message {message.get('message_id')}")
+
+    def drain_queue(self, batch: List):
+        while len(batch) < self.max_batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            self.drain_queue(batch)
+            if len(batch) < self.max_batch_size and self.flush_interval > 0:
+                await aio.sleep(self.flush_interval)
+                self.drain_queue(batch)
+            try:
+                await self.send(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def get_backoff(self, attempt: int) -> float:
+        backoff = min(self.retry_backoff_max, self.retry_backoff * 2 ** attempt)
+        # Jitter so that several workers don't retry in lockstep
+        return backoff * random.uniform(0.5, 1)
+
+    async def send(self, batch: List[Dict[str, Any]]) -> bool:
+        message_url = f"{settings.chatlog.CHATBOT_CHATLOG_URL}/messages"
+        headers = {"Authorization": f"Bearer {settings.chatlog.CHATBOT_CHATLOG_TOKEN}"}
+        for attempt in range(self.max_retries + 1):
+            try:
+                r = await http_clients.get("chatlog").post(
+                    url=message_url,
+                    json=batch,
+                    headers=headers
+                    )
+                r.raise_for_status()
+                self.stats["sent"] += len(batch)
+                self.stats["batches"] += 1
+                return True
+            except httpx.HTTPError as e:
+                logger.error(f"Error saving {len(batch)} messages (attempt {attempt + 1}) \n {e}")
+                # The chatlog rejected the payload, sending it again won't help
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500:
+                    break
+                if attempt < self.max_retries:
+                    self.stats["retries"] += 1
+                    await aio.sleep(self.get_backoff(attempt))
+        self.stats["dropped"] += len(batch)
+        return False
+
+    async def drain(self, timeout: float = settings.outbox.OUTBOX_DRAIN_TIMEOUT_S):
+        if self.worker is None:
+            return
+        if self.loop is aio.get_running_loop() and not self.worker.done():
+            try:
+                await aio.wait_for(self.queue.join(), timeout=timeout)
+            except aio.TimeoutError:
+                logger.error(f"Chatlog outbox drain timed out, {self.queue.qsize()} messages not saved")
+        self.worker.cancel()
+        try:
+            await self.worker
+        except (aio.CancelledError, RuntimeError):
+            pass
+        self.worker = None
+
+
+chatlog_outbox = ChatlogOutbox()
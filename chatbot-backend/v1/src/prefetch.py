@@ -0,0 +1,46 @@
+from typing import Any, Dict, FrozenSet, List, Optional
+import asyncio as aio
+
+from v1.src.logger import logger
+from v1.src.metrics import KB_PREFETCHES
+
+
+class Prefetch:
+    """
+    Knowledge base search started for a qa node before the flow reaches it.
+
+    The session takes the documents when the qa node runs and discards them when
+    the decider picks another branch; the outcomes are counted in
+    `chatbot_kb_prefetch_total`.
+    """
+    __slots__ = ("node_id", "path", "question", "task")
+
+    def __init__(self, node_id: str, path: FrozenSet[str], question: str, task: aio.Future) -> None:
+        self.node_id = node_id
+        # Nodes between the decider and the qa node, leaving them is a miss
+        self.path = path
+        self.question = question
+        self.task = task
+        # A discarded search may still fail, its error is not worth a warning
+        task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    async def take(self, question: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns the documents found for `question`, or None when the search
+        failed or was made for another question.
+        """
+        if question != self.question:
+            self.discard()
+            return None
+        try:
+            documents = await self.task
+        except Exception as e:
+            logger.error(f"Knowledge base prefetch for {self.node_id} failed: {e}")
+            KB_PREFETCHES.labels("failed").inc()
+            return None
+        KB_PREFETCHES.labels("hit").inc()
+        return documents
+
+    def discard(self):
+        self.task.cancel()
+        KB_PREFETCHES.labels("miss").inc()
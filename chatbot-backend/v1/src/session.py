@@ -1,51 +1,168 @@
 from fastapi import WebSocket, HTTPException
 import networkx as nx
-from typing import Dict, Any, Optional,List, ClassVar
+from typing import Dict, Any, Optional,List, ClassVar, Callable, Tuple
 
-from core.models.base_model import generate_date_str
+from core.models.base_model import generate_date_str, generate_id
 from ..utils.utils import generate_uuid
 from pydantic import BaseModel, Field
 from core.models.chat_message_model import ChatMessage, Elements
 import asyncio as aio
+import time
 from core.models.chatlog_models import MessageCreate, SessionCreate
 from core.settings import settings
-import requests
+import httpx
 from v1.src.logger import logger
+from v1.src.clients import http_clients
+from v1.src.compiler import CompiledNode, compile_graph
+from v1.src.outbox import chatlog_outbox
+from v1.src.store import SessionStore, create_session_store
+from v1.src.frames import FrameSender
+from v1.src.timers import listen_timers
+from v1.src.metrics import observe_node
+from v1.src.prefetch import Prefetch
+from v1.src.history import HISTORY_USERS, HistoryRecord, add_record, load_history
 class Session(BaseModel): 
     starter_node: ClassVar[str] = "start00000000"
     tracker: Dict[str, Any] = {}
     session_id: Optional[str] = Field(default_factory=generate_uuid)
     graph: Optional[nx.DiGraph] = None
+    nodes: Optional[Dict[str, CompiledNode]] = None
     origin: Optional[str] = None
+    store: Optional[SessionStore] = None
+    hibernated: bool = False
+    listening: bool = False
+    prefetch: Optional[Prefetch] = None
     class Config:
         arbitrary_types_allowed = True
+
+    def model_post_init(self, __context: Any) -> None:
+        if self.nodes is None and isinstance(self.graph, nx.DiGraph):
+            self.nodes = compile_graph(self.graph)
     
     def get_next_node(self, current_node: str, intent:Optional[str | None] = None) -> str:
-        next_nodes = [node for node in self.graph.neighbors(current_node)]
-        if len(next_nodes) == 1:
-            next_node = next_nodes[0]
-        elif len(next_nodes) > 1:
-            for node in next_nodes:
-                if self.graph.nodes[node]["handler"].label == intent:
-                    next_node = node
-                    break
-
-        elif len(next_nodes) == 0:
-            next_node = None
+        next_node = self.nodes[current_node].get_next_node(intent)
         self.tracker["current_node"] = next_node
         
+    async def checkpoint(self):
+        # Makes the tracker visible to the other workers of the host
+        if self.store is not None:
+            await self.store.save(self.session_id, self.tracker)
+
+    async def receive_application_data(self):
+        # Application data posted to another worker waits in the store mailbox
+        if self.store is not None:
+            data = await self.store.pop_application_data(self.session_id)
+            if data is not None:
+                self.tracker["application_data"] = data
+
+    async def hibernate(self):
+        # Idle sessions keep only a stub in memory, the tracker lives in the store
+        await self.store.save(self.session_id, self.tracker)
+        self.tracker = {}
+        self.hibernated = True
+
+    async def wake(self):
+        """
+        Raises:
+            RuntimeError: The tracker is no longer in the store (expired, evicted
+                or deleted), the conversation can't be resumed.
+        """
+        tracker = await self.store.load(self.session_id)
+        if tracker is None:
+            raise RuntimeError(f"Session {self.session_id} state was lost while hibernated")
+        tracker["history"] = load_history(tracker.get("history", []))
+        self.tracker = tracker
+        self.hibernated = False
+
+    async def receive_message(self, websocket: WebSocket, timeout: float):
+        """
+        Waits for the next user message for up to `timeout` seconds, hibernating
+        the session once it has been idle for SESSION_HIBERNATE_AFTER_S. Both
+        deadlines live on the shared listen timer wheel.
+
+        Raises:
+            asyncio.TimeoutError: No message arrived in time.
+        """
+        receive = aio.ensure_future(websocket.receive_json())
+        timers = [listen_timers.schedule(timeout, receive.cancel)]
+        hibernation = None
+
+        def start_hibernation():
+            nonlocal hibernation
+            if not receive.done():
+                hibernation = aio.ensure_future(self.hibernate())
+
+        hibernate_after = settings.store.SESSION_HIBERNATE_AFTER_S
+        if self.store is not None and 0 < hibernate_after < timeout:
+            timers.append(listen_timers.schedule(hibernate_after, start_hibernation))
+        self.listening = True
+        try:
+            return await receive
+        except aio.CancelledError:
+            if timers[0].fired:
+                raise aio.TimeoutError() from None
+            raise
+        finally:
+            self.listening = False
+            receive.cancel()
+            for timer in timers:
+                timer.cancel()
+            if hibernation is not None:
+                await hibernation
+            if self.hibernated:
+                await self.wake()
         
 
+    async def send_message(self, websocket: WebSocket, message: ChatMessage, flush: bool = False):
+        # The frame is serialised once, straight to JSON by pydantic-core.
+        # UI signals never reach the history, conversation messages are saved
+        # as they happen
+        frame = message.model_dump_json(by_alias=True)
+        if message.user in HISTORY_USERS:
+            add_record(self.tracker["history"], HistoryRecord.from_message(message))
+            chatlog_outbox.put(MessageCreate(
+                message_id=message.message_id,
+                created_at=message.timestamp,
+                exchange=message.text,
+                message_type=message.user,
+                session_id=message.session_id,
+                ).model_dump())
+        await websocket.send_text(frame)
+        if flush and isinstance(websocket, FrameSender):
+            await websocket.flush()
+
+    async def run_node(
+        self,
+        node_name: str,
+        value: Any,
+        vars: Dict[str, Any],
+        on_chunk: Optional[Callable[[str], Any]] = None,
+        ) -> Tuple[Any, Optional[str]]:
+        node = self.nodes[node_name]
+        kwargs = {}
+        if self.prefetch is not None and self.prefetch.node_id == node_name:
+            prefetch, self.prefetch = self.prefetch, None
+            documents = await prefetch.take(node.handler.question_text.format(**vars))
+            if documents is not None:
+                kwargs["documents"] = documents
+        start = time.perf_counter()
+        if on_chunk is not None and node.streaming:
+            data,intent = await node.handler.stream(value,vars,on_chunk,**kwargs)
+        else:
+            data,intent = await node.handler.run(value,vars,**kwargs)
+        observe_node(node.type, node_name, intent, time.perf_counter() - start)
+        return data, intent
+
     async def execute(
         self,
         value: str,
         keys: Optional[List[str]] = None,
         current_node: Optional[str] = None,
+        on_chunk: Optional[Callable[[str], Any]] = None,
         ) -> Any:
         
         node_name = current_node
-        current_node = self.graph.nodes[node_name]
-        data,intent = current_node["handler"](value,self.tracker)
+        data,intent = await self.run_node(node_name, value, self.tracker, on_chunk)
         for key in keys:
             self.tracker[key] = data
             
@@ -79,11 +196,10 @@ class Session(BaseModel):
                 session_id=session_id,
                 feedback=feedback
             )
-            self.tracker["history"].append(message.model_dump(by_alias=True))
-            await websocket.send_json(message.model_dump(by_alias=True))
+            await self.send_message(websocket, message)
 
             # Waits for user message for timeout seconds
-            response = await aio.wait_for(websocket.receive_json(), timeout=timeout)   
+            response = await self.receive_message(websocket, timeout)
             value = response["text"]
             text = await self.execute(value=value, keys=keys, current_node=current_node)
             message = ChatMessage(
@@ -93,8 +209,7 @@ class Session(BaseModel):
                 session_id=session_id,
                 feedback=feedback
             )
-            self.tracker["history"].append(message.model_dump(by_alias=True))
-            await websocket.send_json(message.model_dump(by_alias=True))
+            await self.send_message(websocket, message)
 
             message = ChatMessage(
                 message_id=None,
@@ -104,8 +219,7 @@ class Session(BaseModel):
                 session_id=session_id,
                 feedback=feedback
             )
-            self.tracker["history"].append(message.model_dump(by_alias=True))
-            await websocket.send_json(message.model_dump(by_alias=True))
+            await self.send_message(websocket, message)
             self.tracker["timeout_iters"] = 0
         except aio.TimeoutError:
             # if timeout, send timeout message and set value to None
@@ -118,8 +232,7 @@ class Session(BaseModel):
                 session_id=session_id,
                 feedback=feedback
                 )
-                self.tracker["history"].append(message.model_dump(by_alias=True))
-                await websocket.send_json(message.model_dump(by_alias=True))
+                await self.send_message(websocket, message)
                 
                 message = ChatMessage(
                     text="Session timeout",
@@ -128,8 +241,7 @@ class Session(BaseModel):
                     session_id=session_id,
                     feedback=feedback
                 )
-                self.tracker["history"].append(message.model_dump(by_alias=True))
-                await websocket.send_json(message.model_dump(by_alias=True))
+                await self.send_message(websocket, message)
                 
                 self.tracker["current_node"] = None
             else:
@@ -141,10 +253,9 @@ class Session(BaseModel):
                     session_id=session_id,
                     feedback=feedback
                 )
-                self.tracker["history"].append(message.model_dump(by_alias=True))
-                await websocket.send_json(message.model_dump(by_alias=True))
+                await self.send_message(websocket, message)
                 
-                timeout_message = self.graph.nodes[current_node]["handler"].timeout
+                timeout_message = self.nodes[current_node].timeout
                 message = ChatMessage(
                     text=timeout_message,
                     elements=None,
@@ -152,8 +263,7 @@ class Session(BaseModel):
                     session_id=session_id,
                     feedback=feedback
                 )
-                self.tracker["history"].append(message.model_dump(by_alias=True))
-                await websocket.send_json(message.model_dump(by_alias=True))
+                await self.send_message(websocket, message)
                 self.tracker["timeout_iters"] += 1
 
             
@@ -168,11 +278,43 @@ class Session(BaseModel):
         ):
         session_id = self.session_id
         current_node = current_node
-        text = await self.execute(value=None, keys=keys, current_node=current_node)
+        on_chunk = None
+        streamed = False
+        message_id = generate_id()
+        if show and settings.kb.CHATBOT_KB_STREAMING:
+            # Partial answers go out as "ai_chunk" frames sharing the id of the
+            # final "AI" message, only the final message is kept in the history
+            async def on_chunk(chunk: str):
+                nonlocal streamed
+                streamed = True
+                message = ChatMessage(
+                    message_id=message_id,
+                    text=chunk,
+                    elements=None,
+                    user="ai_chunk",
+                    session_id=session_id,
+                    feedback=feedback
+                )
+                await self.send_message(websocket, message, flush=True)
+        text = await self.execute(value=None, keys=keys, current_node=current_node, on_chunk=on_chunk)
+
+        if streamed and not text:
+            # The stream failed after some chunks went out: an "ai_abort" frame
+            # tells the client to drop the partial answer, no "AI" frame follows
+            message = ChatMessage(
+                message_id=message_id,
+                text=None,
+                elements=None,
+                user="ai_abort",
+                session_id=session_id,
+                feedback=feedback
+            )
+            await self.send_message(websocket, message, flush=True)
 
         if text and show:
 
             message = ChatMessage(
+                message_id=message_id,
                 text=text,
                 elements=element_list,
                 user="AI",
@@ -180,9 +322,89 @@ class Session(BaseModel):
                 feedback=feedback
             ) 
             
-            self.tracker["history"].append(message.model_dump(by_alias=True))
-            await websocket.send_json(message.model_dump(by_alias=True))
+            await self.send_message(websocket, message)
     
+    def start_prefetch(self, node: CompiledNode):
+        # Searches the knowledge base for the qa branch while the decider classifies
+        if not settings.kb.CHATBOT_KB_PREFETCH or node.prefetch is None:
+            return
+        self.drop_prefetch()
+        handler = self.nodes[node.prefetch].handler
+        vars = dict(self.tracker)
+        try:
+            question = handler.question_text.format(**vars)
+        except KeyError:
+            return
+        self.prefetch = Prefetch(
+            node.prefetch,
+            node.prefetch_path,
+            question,
+            aio.ensure_future(handler.retrieve(vars)),
+            )
+
+    def drop_prefetch(self):
+        if self.prefetch is not None:
+            self.prefetch.discard()
+            self.prefetch = None
+
+    async def run_branch(
+        self,
+        node_name: str,
+        join: str,
+        tracker: Dict[str, Any],
+        ) -> Tuple[Dict[str, Any], List[Tuple[Any, CompiledNode]]]:
+        """
+        Runs one branch of a parallel node on its own copy of the tracker, up
+        to the join node.
+
+        Returns:
+            The keys written by the branch and, for every shown answer, the
+            text and the node that produced it.
+        """
+        written = {}
+        shown = []
+        while node_name is not None and node_name != join:
+            node = self.nodes[node_name]
+            data,intent = await self.run_node(node_name, None, tracker)
+            for key in node.keys:
+                tracker[key] = data
+                written[key] = data
+            if data and node.show:
+                shown.append((data, node))
+            node_name = node.get_next_node(intent)
+        return written, shown
+
+    async def handle_parallel_node(self, websocket: WebSocket, current_node: str):
+        node = self.nodes[current_node]
+        timeout = node.handler.branch_timeout
+        branches = [
+            aio.wait_for(self.run_branch(branch, node.join, dict(self.tracker)), timeout)
+            for branch in node.branches
+        ]
+        results = await aio.gather(*branches, return_exceptions=True)
+        # Branches are merged in their compiled order, a key written by several
+        # branches keeps the value of the last one, as if they had run one after
+        # the other. Failed or slow branches leave the tracker untouched.
+        for branch, result in zip(node.branches, results):
+            if isinstance(result, aio.TimeoutError):
+                logger.warning(f"Branch {branch} of {current_node} timed out after {timeout} s")
+                continue
+            if isinstance(result, Exception):
+                logger.error(f"Branch {branch} of {current_node} failed: {result}")
+                continue
+            written, shown = result
+            self.tracker.update(written)
+            for text, shown_node in shown:
+                message = ChatMessage(
+                    text=text,
+                    elements=shown_node.elements,
+                    user="AI",
+                    session_id=self.session_id,
+                    feedback=shown_node.feedback
+                )
+                await self.send_message(websocket, message)
+        self.tracker["current_node"] = node.next_node
+
     def init(self, timeout, delay):
         self.tracker["current_node"] = self.starter_node
         self.tracker["last_utterance"] = None
@@ -203,30 +425,42 @@ class Session(BaseModel):
         self.tracker["delay"] = delay
         self.tracker["origin"] = self.origin
 
-    async def start_flow(self,websocket: WebSocket):
+    async def start_flow(self,websocket: WebSocket, batch: bool = False):
+        # Frames of a turn are coalesced when the client negotiated batching
+        websocket = FrameSender(websocket, batch=batch)
         self.init(240, 0)
+        await self.checkpoint()
 
-        while self.tracker["current_node"] is not None:
-            sleep_time = self.tracker["delay"]
-            timeout = self.tracker["timeout"]
-            current_node = self.tracker["current_node"]
-            node_type = self.graph.nodes[current_node]["handler"].type
-            keys = self.graph.nodes[current_node]["handler"].saving_keys
-            show = self.graph.nodes[current_node]["handler"].show
-            elements = self.graph.nodes[current_node]["handler"].elements
-            feedback = self.graph.nodes[current_node]["handler"].feedback
-
-            if elements:
-                element_list = [Elements(**element) for element in elements]
-            else:
-                element_list = None
+        try:
+            while self.tracker["current_node"] is not None:
+                await self.receive_application_data()
+                sleep_time = self.tracker["delay"]
+                timeout = self.tracker["timeout"]
+                current_node = self.tracker["current_node"]
+                node = self.nodes[current_node]
+                keys = node.keys
+                element_list = node.elements
+                feedback = node.feedback
 
-            if node_type == "l":
-                await self.handle_listen_node(websocket,keys ,element_list, feedback, current_node, timeout)
-            else:
-                await self.handle_other_node(websocket, keys, show, element_list, feedback, current_node)
+                # The decider picked another branch than the prefetched qa node
+                if (self.prefetch is not None and current_node != self.prefetch.node_id
+                        and current_node not in self.prefetch.path):
+                    self.drop_prefetch()
 
-            await aio.sleep(sleep_time)
+                if node.type == "l":
+                    await self.checkpoint()
+                    await self.handle_listen_node(websocket,keys ,element_list, feedback, current_node, timeout)
+                elif node.type == "parallel":
+                    await self.handle_parallel_node(websocket, current_node)
+                else:
+                    self.start_prefetch(node)
+                    await self.handle_other_node(websocket, keys, node.show, element_list, feedback, current_node)
+
+                # A batched turn reaches the client in one frame, pacing it only adds latency
+                if not batch:
+                    await aio.sleep(sleep_time)
+        finally:
+            self.drop_prefetch()
 
         message = ChatMessage(
                     message_id=None,
@@ -236,17 +470,24 @@ class Session(BaseModel):
                     session_id=self.session_id,
                     feedback=feedback
                 )
-        await websocket.send_json(message.model_dump(by_alias=True))
+        await self.send_message(websocket, message)
                 
         await websocket.close()
 
 class SessionManager(BaseModel):
     sessions: Dict[str, Session] = {}
+    store: SessionStore = Field(default_factory=create_session_store)
     class Config:
         arbitrary_types_allowed = True
 
-    def create_session(self, graph: nx.DiGraph = None, session_id: str = None, origin: str = None):
-        session = Session(graph=graph, session_id=session_id, origin=origin)
+    def create_session(
+        self,
+        graph: nx.DiGraph = None,
+        session_id: str = None,
+        origin: str = None,
+        nodes: Dict[str, CompiledNode] = None,
+        ):
+        session = Session(graph=graph, session_id=session_id, origin=origin, nodes=nodes, store=self.store)
         
         self.sessions[session.session_id] = session
         return session
@@ -255,33 +496,6 @@ class SessionManager(BaseModel):
         return self.sessions[session_id]
     
     
-    def parse_session_chats(self, chat_history):
-        filtered_messages = []
-        for message in chat_history:
-            if message['user'] in ['USER', 'AI']:
-                filtered_messages.append(message)
-        return filtered_messages
-    
-    async def save_messages(self, session_id: str):
-        session = self.get_session(session_id)
-        chat_history = session.tracker['history']
-        filtered_messages = self.parse_session_chats(chat_history)
-        message_list = [MessageCreate(**message).model_dump() for message in filtered_messages]
-        message_url = f"{settings.chatlog.CHATBOT_CHATLOG_URL}/messages"
-        token = settings.chatlog.CHATBOT_CHATLOG_TOKEN
-        headers = {"Authorization": f"Bearer {token}"}
-
-        try:
-            r = requests.post(
-                url=message_url, 
-                json=message_list,
-                headers=headers
-                )
-            r.raise_for_status()
-        except HTTPException as e:
-            logger.error(f"Error saving messages \n {e}")
-
-            
     async def save_session(self, session_id: str):
         session = self.get_session(session_id)
         session.tracker["ended_at"] = generate_date_str()
@@ -306,18 +520,19 @@ class SessionManager(BaseModel):
             token = settings.chatlog.CHATBOT_CHATLOG_TOKEN
             headers = {"Authorization": f"Bearer {token}"}
             data = session_dto.model_dump()
-            r = requests.post(
+            r = await http_clients.get("chatlog").post(
                 url=session_url, 
                 json=data,
                 headers=headers
                 )
             r.raise_for_status()
-        except HTTPException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error saving sessions \n {e}")
      
     async def save(self, session_id: str):
+        # Messages already went to the chatlog outbox while the session ran
         try:
-            await self.save_messages(session_id)
+            await self.get_session(session_id).receive_application_data()
             await self.save_session(session_id)
         except Exception as e:
             logger.error(e)
@@ -325,6 +540,7 @@ class SessionManager(BaseModel):
     
     async def delete_session(self, session_id: str):
         del self.sessions[session_id]
+        await self.store.delete(session_id)
         
     async def end_session(self, session_id: str):
         await self.save(session_id)
@@ -344,6 +560,28 @@ class SessionManager(BaseModel):
         self.sessions[session_id].tracker = tracker
         return self.sessions[session_id]
     
+    def get_stats(self) -> Dict[str, int]:
+        hibernated = 0
+        listening = 0
+        for session in self.sessions.values():
+            if session.hibernated:
+                hibernated += 1
+            elif session.listening:
+                listening += 1
+        resident = len(self.sessions) - hibernated
+        return {
+            "resident": resident,
+            "active": resident - listening,
+            "listening": listening,
+            "hibernated": hibernated,
+        }
+
     async def add_application_data(self, session_id: str, data: Dict[str, Any]):
-        self.sessions[session_id].tracker["application_data"] = data
-        return self.sessions[session_id]
\ No newline at end of file
+        if session_id in self.sessions and not self.sessions[session_id].hibernated:
+            self.sessions[session_id].tracker["application_data"] = data
+            return self.sessions[session_id]
+        # The websocket is owned by another worker or the session is hibernated,
+        # the data is picked up on the next step
+        if not await self.store.post_application_data(session_id, data):
+            raise KeyError(session_id)
+        return None
\ No newline at end of file
@@ -0,0 +1,182 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+import asyncio as aio
+import json
+import os
+import socket
+import sqlite3
+import time
+import zlib
+
+from core.settings import settings
+
+
+def get_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def dump_tracker(tracker: Dict[str, Any]) -> bytes:
+    # Hibernated sessions are mostly history text, which compresses well
+    return zlib.compress(json.dumps(tracker, separators=(",", ":"), default=str).encode(), 1)
+
+
+def load_tracker(data: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(data))
+
+
+class SessionStore(ABC):
+    """
+    Shared state of the sessions running on this host.
+
+    Every worker keeps its live `Session` objects in memory; the store holds a
+    checkpoint of each tracker, which worker owns the websocket, and a mailbox
+    for application data posted to a worker that doesn't own the session. The
+    owning worker applies the mailbox at its next step.
+    """
+    @abstractmethod
+    async def save(self, session_id: str, tracker: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    async def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        pass
+
+    @abstractmethod
+    async def post_application_data(self, session_id: str, data: Dict[str, Any]) -> bool:
+        """Returns False when no worker owns the session."""
+        pass
+
+    @abstractmethod
+    async def pop_application_data(self, session_id: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    async def prune(self, max_age: float):
+        pass
+
+    def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Store for a single worker, sessions never leave the process. Trackers are
+    kept serialised so that a hibernated session holds a single bytes object.
+    """
+    def __init__(self) -> None:
+        self.trackers: Dict[str, bytes] = {}
+        self.mailbox: Dict[str, Dict[str, Any]] = {}
+
+    async def save(self, session_id: str, tracker: Dict[str, Any]):
+        self.trackers[session_id] = dump_tracker(tracker)
+
+    async def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        data = self.trackers.get(session_id)
+        if data is None:
+            return None
+        return load_tracker(data)
+
+    async def delete(self, session_id: str):
+        self.trackers.pop(session_id, None)
+        self.mailbox.pop(session_id, None)
+
+    async def post_application_data(self, session_id: str, data: Dict[str, Any]) -> bool:
+        if session_id not in self.trackers:
+            return False
+        self.mailbox[session_id] = data
+        return True
+
+    async def pop_application_data(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.mailbox.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Store shared by all the workers of a host through a SQLite database in WAL
+    mode, so readers never block the writer. Queries run on a dedicated thread
+    with its own connection to keep the event loop free.
+    """
+    def __init__(self, path: str, worker_id: Optional[str] = None) -> None:
+        self.path = path
+        self.worker_id = worker_id or get_worker_id()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-store")
+        self.connection: Optional[sqlite3.Connection] = None
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, owner TEXT NOT NULL, "
+                "tracker BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS mailbox ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+            self.connection = connection
+        return self.connection
+
+    async def run(self, query: str, params: tuple = ()) -> list:
+        def execute():
+            return self.connect().execute(query, params).fetchall()
+        return await aio.get_running_loop().run_in_executor(self.executor, execute)
+
+    async def save(self, session_id: str, tracker: Dict[str, Any]):
+        await self.run(
+            "INSERT OR REPLACE INTO sessions (session_id, owner, tracker, updated_at) VALUES (?, ?, ?, ?)",
+            (session_id, self.worker_id, dump_tracker(tracker), time.time()),
+        )
+
+    async def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self.run("SELECT tracker FROM sessions WHERE session_id = ?", (session_id,))
+        if not rows:
+            return None
+        return load_tracker(rows[0][0])
+
+    async def delete(self, session_id: str):
+        await self.run("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        await self.run("DELETE FROM mailbox WHERE session_id = ?", (session_id,))
+
+    async def post_application_data(self, session_id: str, data: Dict[str, Any]) -> bool:
+        rows = await self.run("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,))
+        if not rows:
+            return False
+        await self.run(
+            "INSERT OR REPLACE INTO mailbox (session_id, data) VALUES (?, ?)",
+            (session_id, json.dumps(data)),
+        )
+        return True
+
+    async def pop_application_data(self, session_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self.run("DELETE FROM mailbox WHERE session_id = ? RETURNING data", (session_id,))
+        if not rows:
+            return None
+        return json.loads(rows[0][0])
+
+    async def prune(self, max_age: float):
+        # Sessions of workers that died without cleaning up
+        await self.run("DELETE FROM sessions WHERE updated_at < ?", (time.time() - max_age,))
+        await self.run("DELETE FROM mailbox WHERE session_id NOT IN (SELECT session_id FROM sessions)")
+
+    def close(self):
+        def close_connection():
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+        self.executor.submit(close_connection).result()
+        self.executor.shutdown(wait=False)
+
+
+def create_session_store(backend: str = settings.store.SESSION_STORE) -> SessionStore:
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore(settings.store.SESSION_STORE_PATH)
+    raise ValueError(f"Unknown session store: {backend}")
@@ -0,0 +1,135 @@
+from typing import Callable, List, Optional, Set
+import asyncio as aio
+import math
+
+from core.settings import settings
+from v1.src.logger import logger
+
+
+class Timer:
+    __slots__ = ("deadline", "callback", "bucket", "fired")
+
+    def __init__(self, deadline: int, callback: Callable[[], None]) -> None:
+        self.deadline = deadline
+        self.callback = callback
+        self.bucket: Optional[Set["Timer"]] = None
+        self.fired = False
+
+    def cancel(self):
+        if self.bucket is not None:
+            self.bucket.discard(self)
+            self.bucket = None
+
+
+class TimerWheel:
+    """
+    Hierarchical timing wheel shared by all the sessions of the worker.
+
+    Time advances in ticks of `resolution` seconds. Level 0 has one bucket per
+    tick, each higher level covers `slots` times the span of the one below and
+    its buckets are cascaded down when the lower wheel wraps; deadlines beyond
+    the last level wait in an overflow set. Scheduling and cancelling are set
+    operations, and one driver task fires every timer of a tick in a single
+    pass, instead of each idle session keeping a handle in the event loop's
+    timer heap.
+    """
+    def __init__(
+        self,
+        resolution: float = settings.store.LISTEN_TIMER_RESOLUTION_S,
+        slots: int = 64,
+        levels: int = 3,
+        ) -> None:
+        self.resolution = resolution
+        self.slots = slots
+        self.levels = levels
+        self.loop: Optional[aio.AbstractEventLoop] = None
+        self.worker: Optional[aio.Task] = None
+        self.reset()
+
+    def reset(self):
+        self.wheels = [[set() for _ in range(self.slots)] for _ in range(self.levels)]
+        self.overflow: Set[Timer] = set()
+        self.current_tick = 0
+        self.start = None
+
+    def __len__(self) -> int:
+        return len(self.overflow) + sum(len(bucket) for wheel in self.wheels for bucket in wheel)
+
+    def ensure_started(self):
+        loop = aio.get_running_loop()
+        if self.worker is not None and not self.worker.done() and self.loop is loop:
+            return
+        self.reset()
+        self.loop = loop
+        self.start = loop.time()
+        self.worker = loop.create_task(self.run())
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> Timer:
+        self.ensure_started()
+        elapsed = self.loop.time() - self.start + delay
+        deadline = max(self.current_tick + 1, math.ceil(elapsed / self.resolution))
+        timer = Timer(deadline, callback)
+        self.insert(timer)
+        return timer
+
+    def insert(self, timer: Timer):
+        ticks = timer.deadline - self.current_tick
+        bucket = self.overflow
+        for level in range(self.levels):
+            if ticks < self.slots ** (level + 1):
+                bucket = self.wheels[level][(timer.deadline // self.slots ** level) % self.slots]
+                break
+        bucket.add(timer)
+        timer.bucket = bucket
+
+    def cascade(self, bucket: Set[Timer]):
+        for timer in bucket:
+            self.insert(timer)
+
+    def advance(self) -> Set[Timer]:
+        self.current_tick += 1
+        tick = self.current_tick
+        # Higher levels move their next bucket down when the wheel below wraps
+        for level in range(1, self.levels + 1):
+            span = self.slots ** level
+            if tick % span:
+                break
+            if level == self.levels:
+                overflow, self.overflow = self.overflow, set()
+                self.cascade(overflow)
+            else:
+                slot = (tick // span) % self.slots
+                bucket, self.wheels[level][slot] = self.wheels[level][slot], set()
+                self.cascade(bucket)
+        slot = tick % self.slots
+        expired, self.wheels[0][slot] = self.wheels[0][slot], set()
+        return expired
+
+    def fire(self, expired: Set[Timer]):
+        for timer in expired:
+            timer.bucket = None
+            timer.fired = True
+            try:
+                timer.callback()
+            except Exception as e:
+                logger.error(f"Timer callback failed: {e}")
+
+    async def run(self):
+        while True:
+            await aio.sleep(self.resolution)
+            target = int((self.loop.time() - self.start) / self.resolution)
+            # Catches up on the ticks missed while the loop was busy
+            while self.current_tick < target:
+                self.fire(self.advance())
+
+    async def shutdown(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except (aio.CancelledError, RuntimeError):
+                pass
+            self.worker = None
+
+
+listen_timers = TimerWheel()
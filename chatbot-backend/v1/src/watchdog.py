@@ -0,0 +1,114 @@
+from types import FrameType
+from typing import Dict, List, Optional
+import asyncio as aio
+import collections
+import sys
+import threading
+import time
+import traceback
+
+from prometheus_client import Counter
+
+from core.settings import settings
+from v1.src.logger import logger
+
+LOOP_STALLS = Counter(
+    "chatbot_event_loop_stalls_total",
+    "Event loop stalls longer than WATCHDOG_THRESHOLD_MS, by node type and handler class.",
+    ["node_type", "handler"],
+)
+
+
+def find_node(frame: Optional[FrameType]) -> Dict[str, Optional[str]]:
+    """
+    Walks the blocked stack outwards to the `Session.run_node` call running the
+    node, if any, and returns its node id, type and handler class.
+    """
+    while frame is not None:
+        if frame.f_code.co_name == "run_node" and "node_name" in frame.f_locals:
+            node = frame.f_locals.get("node")
+            handler = getattr(node, "handler", None)
+            return {
+                "node_id": frame.f_locals["node_name"],
+                "node_type": getattr(node, "type", None),
+                "handler": type(handler).__name__ if handler is not None else None,
+            }
+        frame = frame.f_back
+    return {"node_id": None, "node_type": None, "handler": None}
+
+
+class LoopWatchdog:
+    """
+    Opt-in detector for code blocking the event loop.
+
+    A task on the loop records a heartbeat every `interval` seconds; a daemon
+    thread checks it and, when the loop hasn't beaten for `threshold` seconds,
+    captures the stack of the loop thread while it is still blocked. The report
+    names the node and handler class being executed, is logged and counted in
+    `chatbot_event_loop_stalls_total`, and the last ones are kept in `stalls`.
+    """
+    def __init__(
+        self,
+        threshold_ms: float = settings.metrics.WATCHDOG_THRESHOLD_MS,
+        interval_ms: float = settings.metrics.WATCHDOG_INTERVAL_MS,
+        history: int = 50,
+        ) -> None:
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.stalls: collections.deque = collections.deque(maxlen=history)
+        self.last_beat = time.monotonic()
+        self.reported_beat: Optional[float] = None
+        self.loop_thread_id: Optional[int] = None
+        self.task: Optional[aio.Task] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stop_event.clear()
+        self.task = aio.get_running_loop().create_task(self.beat())
+        self.thread = threading.Thread(target=self.watch, name="loop-watchdog", daemon=True)
+        self.thread.start()
+
+    async def beat(self):
+        while True:
+            self.last_beat = time.monotonic()
+            await aio.sleep(self.interval)
+
+    def watch(self):
+        while not self.stop_event.wait(self.interval):
+            last_beat = self.last_beat
+            stalled_for = time.monotonic() - last_beat
+            # One report per stall, taken while the loop is still blocked
+            if stalled_for > self.threshold and self.reported_beat != last_beat:
+                self.reported_beat = last_beat
+                self.report(stalled_for)
+
+    def report(self, stalled_for: float) -> Dict:
+        frame = sys._current_frames().get(self.loop_thread_id)
+        stack: List[str] = traceback.format_stack(frame) if frame is not None else []
+        stall = {"stalled_ms": round(stalled_for * 1000, 1), **find_node(frame), "stack": stack}
+        self.stalls.append(stall)
+        LOOP_STALLS.labels(str(stall["node_type"]), str(stall["handler"])).inc()
+        logger.warning(
+            f"Event loop blocked for {stall['stalled_ms']} ms in node {stall['node_id']} "
+            f"({stall['handler']}):\n{''.join(stack)}"
+        )
+        return stall
+
+    async def shutdown(self):
+        self.stop_event.set()
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except aio.CancelledError:
+                pass
+            self.task = None
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+            self.thread = None
+
+
+loop_watchdog = LoopWatchdog()
@@ -14,5 +14,7 @@ NODE_MAPPINGS ={
     "counterNode": {"user": "AI", "handler": CounterHandler.from_data},
     "ifNode": {"user": "AI", "handler": IfHandler.from_data},
     "ticketNode": {"user": "AI", "handler": TicketHandler.from_data},
+    "parallelNode": {"user": "AI", "handler": ParallelHandler.from_data},
+    "joinNode": {"user": "AI", "handler": JoinHandler.from_data},
 }
 
@@ -1,8 +1,27 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from v1 import app
+from v1.utils.utils import create_client, create_indexes
 
 
-api = FastAPI(docs_url="/documentation", redoc_url="/redocumentation")
+def setup_database():
+    client = create_client()
+    try:
+        create_indexes(client)
+    finally:
+        client.close()
+
+
+@asynccontextmanager
+async def lifespan(api: FastAPI):
+    # Fails the startup if the indexes can't be created, e.g. when the
+    # collection already holds duplicated message ids
+    await run_in_threadpool(setup_database)
+    yield
+
+
+api = FastAPI(docs_url="/documentation", redoc_url="/redocumentation", lifespan=lifespan)
 
 api.include_router(app.router, include_in_schema=True)
 
@@ -0,0 +1,41 @@
+from contextlib import nullcontext
+
+import mongomock
+
+from core.models.models import MessageCreate
+from core.settings import settings
+from v1.routers.messages import create_message
+from v1.utils.utils import create_indexes
+
+
+class FakeClient(mongomock.MongoClient):
+    # mongomock has no sessions, the endpoint only passes them through
+    def start_session(self, **kwargs):
+        return nullcontext(None)
+
+
+def make_batch(n):
+    return [
+        MessageCreate(
+            message_id=f"m{i}",
+            created_at="2023-10-18 12:00:00.000000",
+            exchange=f"message {i}",
+            message_type="USER",
+            session_id="s1",
+        )
+        for i in range(n)
+    ]
+
+
+def test_replayed_batch_is_not_duplicated():
+    client = FakeClient()
+    create_indexes(client)
+    collection = client[settings.db.MONGO_CHATLOG_DB_NAME][settings.db.MONGO_CHATLOG_COLLECTION_MESSAGES]
+
+    create_message(make_batch(3), client=client)
+    # The outbox retries a batch when the response was lost, with new messages appended
+    create_message(make_batch(5), client=client)
+
+    assert collection.count_documents({}) == 5
+    assert sorted(doc["message_id"] for doc in collection.find()) == ["m0", "m1", "m2", "m3", "m4"]
+    assert collection.index_information()["message_id_1"]["unique"]
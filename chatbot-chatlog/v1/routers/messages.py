@@ -1,7 +1,8 @@
 # Import FastAPI
 from fastapi import APIRouter, Depends, HTTPException
 from typing import List, Union
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
 
 # Add the dependency to other route handlers as needed
 # Import the Message model and the MessageCreate model from the models folder
@@ -17,6 +18,8 @@ from core.settings import settings
 from v1.utils.utils import get_client
 
 
+DUPLICATE_KEY = 11000
+
 # Create the router instance for the messages
 router = APIRouter(prefix="/messages",
     tags=["Messages Logging"],
@@ -64,8 +67,27 @@ def create_message(
         collection = db[settings.db.MONGO_CHATLOG_COLLECTION_MESSAGES]
         try:
             if isinstance(message, list):
-                # Inserting the data into the collection
-                collection.insert_many([message.model_dump() for message in message],session=session)
+                # Bulk inserts come from the backend outbox, which retries failed
+                # batches; upserting on message_id keeps a retried batch from
+                # duplicating the messages that were already stored
+                try:
+                    collection.bulk_write(
+                        [
+                            UpdateOne(
+                                {"message_id": message.message_id},
+                                {"$setOnInsert": message.model_dump()},
+                                upsert=True,
+                            )
+                            for message in message
+                        ],
+                        ordered=False,
+                        session=session,
+                    )
+                except BulkWriteError as e:
+                    # A concurrent replay of the batch won the race to insert a
+                    # message, the unique index rejected the second copy
+                    if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+                        raise
                 return [MessageModel(**message.model_dump()) for message in message]
             # Inserting the data into the collection
             collection.insert_one(message.model_dump(),session=session)
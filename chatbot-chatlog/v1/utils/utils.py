@@ -25,27 +25,43 @@ async def has_access(credentials: HTTPAuthorizationCredentials= Depends(security
             status_code=401,
             detail=str(e))
 
-# Define a dependency to get the MongoDB collection
-def get_client():
+def create_client() -> MongoClient:
     host = settings.db.MONGO_CHATLOG_DB_HOST
     port = int(settings.db.MONGO_CHATLOG_DB_PORT)
     username = settings.db.MONGO_CHATLOG_DB_USERNAME
     password = settings.db.MONGO_CHATLOG_DB_PASSWORD
     path_pem = settings.db.MONGO_CHATLOG_DB_PEM_PATH
+    return MongoClient(
+        host=host, 
+        port=port, 
+        username=username, 
+        password=password, 
+        tlsCAFile=path_pem, 
+        replicaSet='rs0', 
+        tls=True,
+        retryWrites=False,
+        readPreference='secondaryPreferred'
+        )
+
+
+def create_indexes(client: MongoClient):
+    """
+    Creates the indexes the endpoints rely on. The unique index on message_id
+    lets the bulk upserts find a message without scanning the collection, and
+    keeps a replayed outbox batch from storing a message twice.
+    """
+    db = client[settings.db.MONGO_CHATLOG_DB_NAME]
+    db[settings.db.MONGO_CHATLOG_COLLECTION_MESSAGES].create_index("message_id", unique=True)
+
+
+# Define a dependency to get the MongoDB collection
+def get_client():
+    client = None
     try:
         # Establish the MongoDB connection and return the client
-        client =MongoClient(
-            host=host, 
-            port=port, 
-            username=username, 
-            password=password, 
-            tlsCAFile=path_pem, 
-            replicaSet='rs0', 
-            tls=True,
-            retryWrites=False,
-            readPreference='secondaryPreferred'
-            )
+        client = create_client()
         yield client
     finally:
         # Close the MongoDB connection when the request is finished
-        client.close()
\ No newline at end of file
+        if client is not None:
+            client.close()
\ No newline at end of file
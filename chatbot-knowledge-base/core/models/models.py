@@ -67,6 +67,8 @@ class DocumentQuery(BaseDTO):
     generate: bool = True
     num_results: int = 5
     score_threshold: float = 0.3
+    # Documents returned by an earlier query with generate=False, skips the search
+    documents: Optional[List[DocumentDTO]] = None
     
 
     
@@ -1,12 +1,14 @@
 
 # Import FastAPI framework
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 # Import the Feedback model and the FeedbackCreate Pydantic model from core.models
 from core.models.models import (
     GenerateQuery,
     GenerateResponse
 )
-from v1.src.chains import create_chain
+from v1.src.chains import create_chain, create_streaming_chain
+from v1.src.streaming import NDJSON_MEDIA_TYPE, stream_answer
 
 
 from langchain.schema import Document
@@ -45,4 +47,28 @@ def generate_ai(
         raise HTTPException(
             status_code=500,
             detail=str(e))
-        
\ No newline at end of file
+
+
+@router.post("/stream")
+async def generate_ai_stream(
+    query: GenerateQuery
+    ) -> StreamingResponse:
+    """
+    Streams the generated answer as newline-delimited JSON events ("chunk" events
+    while tokens arrive, then an "end" event with the full answer).
+    """
+    if not query.human_prompt:
+        raise HTTPException(
+            status_code=500,
+            detail="No message found")
+    model_kwargs = query.llm_model_kwargs.model_dump()
+    chain = create_streaming_chain(
+        model=query.model,
+        model_kwargs=model_kwargs,
+        human_message_prompt="{query}",
+        system_message_prompt=query.system_prompt,
+        )
+    return StreamingResponse(
+        stream_answer(chain, {"query": query.human_prompt}),
+        media_type=NDJSON_MEDIA_TYPE,
+        )
@@ -1,6 +1,8 @@
 
 # Import FastAPI framework
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from qdrant_client import QdrantClient
 # Import the Feedback model and the FeedbackCreate Pydantic model from core.models
 from core.models.models import (
@@ -17,8 +19,10 @@ from core.settings import settings
 # Import the get_client_uri function from utils.utils
 from v1.utils.utils import get_client
 from langchain.embeddings import HuggingFaceEmbeddings, SentenceTransformerEmbeddings
-from v1.src.chains import create_chain
+from v1.src.chains import create_chain, create_streaming_chain
+from v1.src.streaming import NDJSON_MEDIA_TYPE, ndjson, stream_answer
 import json
+from typing import List
 
 from langchain.schema import Document
 # Create a router instance for the Feedback Logging API
@@ -38,6 +42,39 @@ router = APIRouter(prefix="/kb",
     tags=["Knowledgebase API"],
     responses={404: {"description": "Not found"}},
 )
+
+
+def documents_context(documents: List[DocumentDTO]) -> str:
+    return "\n".join(f"{doc.page_content} \n\n {doc.metadata['answer']}" for doc in documents)
+
+
+def retrieve_documents(client: QdrantClient, collection: str, query: DocumentQuery):
+    """
+    Runs the similarity search for a query and keeps the documents above the
+    score threshold. Documents sent with the query, retrieved by an earlier
+    call, are used as they are.
+
+    Returns:
+        Tuple of the context string for the prompt and the list of DocumentDTO.
+    """
+    if query.documents is not None:
+        return documents_context(query.documents), query.documents
+    db_index= Qdrant(client=client, collection_name=collection, embeddings=embeddings, distance_strategy="COSINE")
+    
+    test_query = query.question
+    k= query.num_results
+    min_score = query.score_threshold
+    docs = db_index.similarity_search_with_relevance_scores(test_query,k=k)
+    
+    docs_response = []
+    for doc, score in docs:
+        if score > min_score: #TODO make this a setting
+            doc_dto = DocumentDTO(page_content=doc.page_content, metadata=doc.metadata, score=score)
+            docs_response.append(doc_dto)
+    
+    context = documents_context(docs_response)
+    return context, docs_response
+
     
 @router.post("/{collection}/query", response_model=DocumentQueyResponse)
 def query_db(
@@ -56,27 +93,10 @@ def query_db(
             raise HTTPException(
                 status_code=500,
                 detail="Collection not authorized")
-        db_index= Qdrant(client=client, collection_name=collection, embeddings=embeddings, distance_strategy="COSINE")
-        
         test_query = query.question
-        k= query.num_results
         model = query.model
         model_kwargs = query.llm_model_kwargs.model_dump()
-        min_score = query.score_threshold
-        docs = db_index.similarity_search_with_relevance_scores(test_query,k=k)
-        
-        docs_text = []
-        docs_response = []
-        for doc, score in docs:
-            page_content = doc.page_content
-            answer = doc.metadata["answer"]
-            score = score
-            if score > min_score: #TODO make this a setting
-                docs_text.append(f"{page_content} \n\n {answer}")
-                doc_dto = DocumentDTO(page_content=page_content, metadata=doc.metadata, score=score)
-                docs_response.append(doc_dto)
-        
-        context="\n".join(docs_text)
+        context, docs_response = retrieve_documents(client, collection, query)
         
         gen_query = { "context": context, "question": test_query}
         
@@ -92,7 +112,7 @@ def query_db(
         return DocumentQueyResponse(
             answer=answer,
             documents=docs_response,
-            **query.model_dump(),
+            **query.model_dump(exclude={"documents"}),
             )
     except Exception as e:
         print(e)
@@ -100,6 +120,51 @@ def query_db(
             status_code=500,
             detail=str(e))
         
+
+@router.post("/{collection}/query/stream")
+async def query_db_stream(
+    query: DocumentQuery, 
+    client: QdrantClient = Depends(get_client),
+    collection: str = "faqs"
+    ) -> StreamingResponse:
+    """
+    Streamed version of the query endpoint. Answers with newline-delimited JSON:
+    a "documents" event with the retrieved documents first, then "chunk" events
+    while the answer is generated and a final "end" event with the full answer.
+    Clients that only need the documents can close the stream after the first
+    event, which stops the generation.
+    """
+    if not client:
+        raise HTTPException(
+            status_code=500,
+            detail="No client found")
+    if collection not in collections_list:
+        raise HTTPException(
+            status_code=500,
+            detail="Collection not authorized")
+    try:
+        context, docs_response = await run_in_threadpool(retrieve_documents, client, collection, query)
+    except Exception as e:
+        print(e)
+        raise HTTPException(
+            status_code=500,
+            detail=str(e))
+
+    async def events():
+        documents = [doc.model_dump() for doc in docs_response]
+        yield ndjson({"type": "documents", "documents": documents})
+        if not query.generate:
+            yield ndjson({"type": "end", "answer": None})
+            return
+        chain = create_streaming_chain(
+            model=query.model,
+            model_kwargs=query.llm_model_kwargs.model_dump(),
+            )
+        async for event in stream_answer(chain, {"context": context, "question": query.question}):
+            yield event
+
+    return StreamingResponse(events(), media_type=NDJSON_MEDIA_TYPE)
+        
         
 @router.put("/{collection}", response_model=UpdateResponse)
 def update_db(
@@ -10,26 +10,51 @@ from v1.src.prompts import OPEN_AI_SYSTEM_PROMPT, OPEN_AI_USER_PROMPT
 
 from langchain.chat_models import ChatOpenAI
 from langchain.chains import LLMChain
+from langchain.schema.runnable import Runnable
 from core.settings import settings
 
 
-def create_chain(
-    model: str = settings.openai.MODEL,
-    api_key :str  = settings.openai.OPENAI_API_KEY,
-    model_kwargs: Dict = settings.openai_kwargs.model_dump(),
+def create_prompt(
     system_message_prompt: str = OPEN_AI_SYSTEM_PROMPT,
     human_message_prompt: str = OPEN_AI_USER_PROMPT,
-    ) -> LLMChain:
+    ) -> ChatPromptTemplate:
     lc_system_message_prompt = SystemMessagePromptTemplate.from_template(system_message_prompt)
     lc_human_message_prompt = HumanMessagePromptTemplate.from_template(human_message_prompt)
     
     chat_prompt = ChatPromptTemplate.from_messages(
         [lc_system_message_prompt, lc_human_message_prompt]
     )
+    return chat_prompt
+
+
+def create_chain(
+    model: str = settings.openai.MODEL,
+    api_key :str  = settings.openai.OPENAI_API_KEY,
+    model_kwargs: Dict = settings.openai_kwargs.model_dump(),
+    system_message_prompt: str = OPEN_AI_SYSTEM_PROMPT,
+    human_message_prompt: str = OPEN_AI_USER_PROMPT,
+    ) -> LLMChain:
+    chat_prompt = create_prompt(system_message_prompt, human_message_prompt)
     print("Chat Prompt: ", chat_prompt)
     model = ChatOpenAI(model=model, openai_api_key=api_key, **model_kwargs)
     llm_chain = LLMChain(
         llm=model,
         prompt=chat_prompt,
     )
-    return llm_chain
\ No newline at end of file
+    return llm_chain
+
+
+def create_streaming_chain(
+    model: str = settings.openai.MODEL,
+    api_key :str  = settings.openai.OPENAI_API_KEY,
+    model_kwargs: Dict = settings.openai_kwargs.model_dump(),
+    system_message_prompt: str = OPEN_AI_SYSTEM_PROMPT,
+    human_message_prompt: str = OPEN_AI_USER_PROMPT,
+    ) -> Runnable:
+    """
+    Same prompt and model as `create_chain`, composed as a runnable so
+    `chain.astream(inputs)` yields message chunks as the model produces tokens.
+    """
+    chat_prompt = create_prompt(system_message_prompt, human_message_prompt)
+    model = ChatOpenAI(model=model, openai_api_key=api_key, streaming=True, **model_kwargs)
+    return chat_prompt | model
@@ -0,0 +1,30 @@
+import json
+from typing import Any, AsyncIterator, Dict
+
+from langchain.schema.runnable import Runnable
+
+# Streamed endpoints answer with newline-delimited JSON events:
+#   {"type": "documents", "documents": [...]}   (knowledge base queries only)
+#   {"type": "chunk", "text": "..."}            one per generated token batch
+#   {"type": "end", "answer": "..."}            full answer, last event
+#   {"type": "error", "detail": "..."}          generation failed, last event
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson(event: Dict[str, Any]) -> str:
+    return json.dumps(event) + "\n"
+
+
+async def stream_answer(chain: Runnable, inputs: Dict[str, Any]) -> AsyncIterator[str]:
+    chunks = []
+    try:
+        async for chunk in chain.astream(inputs):
+            text = chunk.content
+            if text:
+                chunks.append(text)
+                yield ndjson({"type": "chunk", "text": text})
+    except Exception as e:
+        print(e)
+        yield ndjson({"type": "error", "detail": str(e)})
+        return
+    yield ndjson({"type": "end", "answer": "".join(chunks)})